@@ -1,5 +1,4 @@
 from pathlib import Path
-import time
 import os 
 from dotenv import load_dotenv
 
@@ -10,6 +9,7 @@ load_dotenv()
 BASE_DIR = Path(__file__).resolve().parent
 SANDBOX_NAME = "PlaygroundForCodingAssistant"  
 SANDBOX_PATH = BASE_DIR / SANDBOX_NAME
+SESSIONS_PATH = BASE_DIR / f"{SANDBOX_NAME}Sessions"  # Un sous-dossier par session WebSocket
 
 # LLM Settings
 OLLAMA_BASE_URL = "http://localhost:11434"
@@ -21,37 +21,104 @@ LLM_PROVIDER = os.getenv("LLM_PROVIDER", "OPENROUTER")
 OPEN_API_KEY = os.getenv("OPEN_API_KEY", "")
 OPEN_MODEL = os.getenv("OPEN_MODEL", "gemini-2.0-flash")
 
+# LLM HTTP Pool (clients partagés, keep-alive entre les étapes du graphe)
+LLM_REQUEST_TIMEOUT = 60
+LLM_POOL_MAX_CONNECTIONS = 20
+LLM_POOL_MAX_KEEPALIVE = 10
+LLM_POOL_KEEPALIVE_EXPIRY = 120
+
+# Caches persistants
+CACHE_DIR = BASE_DIR.parent / ".cache"
+
+# LLM Response Cache (optionnel, rejoue les réponses des appels déterministes)
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+LLM_CACHE_PATH = CACHE_DIR / "llm_responses.sqlite"
+LLM_CACHE_TTL = 7 * 24 * 3600           # 7 jours
+LLM_CACHE_MAX_BYTES = 50 * 1024 * 1024  # 50 Mo, éviction LRU au-delà
+LLM_CACHE_MAX_TEMPERATURE = 0.0         # au-dessus, les réponses ne sont pas mises en cache
+
+# Plan Cache (LRU + TTL, persistant entre redémarrages si activé)
+PLAN_CACHE_TTL = 3600
+PLAN_CACHE_MAXSIZE = 50
+PLAN_CACHE_PERSIST = os.getenv("PLAN_CACHE_PERSIST", "true").lower() in ("1", "true", "yes")
+PLAN_CACHE_PATH = CACHE_DIR / "plans.json"
+
+# Semantic Plan Index (réutilise le plan d'une demande quasi identique)
+PLAN_SIMILARITY_THRESHOLD = 0.9
+PLAN_INDEX_DIM = 1024
+PLAN_INDEX_MAXSIZE = 20000
+
 # Agent Limits
 MAX_RETRIES = 3
-MAX_CONTEXT_MESSAGES = 15
+MAX_CONTEXT_MESSAGES = 15          # mode "messages"
+# Fenêtre de contexte : "tokens" (budget par modèle) ou "messages" (MAX_CONTEXT_MESSAGES)
+CONTEXT_WINDOW_MODE = os.getenv("CONTEXT_WINDOW_MODE", "tokens").lower()
+CONTEXT_TOKEN_BUDGETS = {             # prompt complet (système + historique), en tokens
+    "llama3.2:3b": 4096,              # num_ctx par défaut d'Ollama : au-delà, le début est tronqué
+    "gemini-2.0-flash": 32000,        # plafond volontaire : coût et latence, pas la limite du modèle
+}
+CONTEXT_TOKEN_BUDGET_DEFAULT = 8000
+CONTEXT_RESPONSE_RESERVE = 1024       # tokens laissés à la réponse
+CONTEXT_TOOL_SHARE = 0.3              # part max du budget pour un seul résultat d'outil
 MAX_PLAN_STEPS = 5
 
 # Web Search
 WEB_SEARCH_MAX_RESULTS = 5
 WEB_PAGE_MAX_CHARS = 5000
+WEB_FETCH_TIMEOUT = 10
+WEB_FETCH_CANDIDATES = 3         # smart_web_fetch : URLs téléchargées en parallèle (1 = meilleure URL seule)
+WEB_MIN_CONTENT_CHARS = 200      # en dessous, la page est jugée inutilisable (paywall, page JS vide...)
+WEB_FETCH_MAX_BYTES = 2 * 1024 * 1024   # téléchargement interrompu au-delà (le HTML tronqué reste exploitable)
+WEB_EXTRACT_MAX_CHARS = 10 * WEB_PAGE_MAX_CHARS  # l'extraction s'arrête dès qu'elle a assez de texte
+WEB_PASSAGE_RANKING = True       # pages renvoyées = passages les plus pertinents (BM25) au lieu du début
+WEB_PASSAGE_CHARS = 600          # taille visée d'un passage
+WEB_POOL_MAX_CONNECTIONS = 20
+WEB_POOL_MAX_KEEPALIVE = 10
+WEB_POOL_KEEPALIVE_EXPIRY = 60
+
+# Cache HTTP des pages web (texte nettoyé + ETag/Last-Modified)
+WEB_CACHE_ENABLED = os.getenv("WEB_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+WEB_CACHE_PATH = CACHE_DIR / "web_pages.sqlite"
+WEB_CACHE_FRESHNESS = 3600               # servi sans réseau pendant 1 h, puis revalidation conditionnelle
+WEB_CACHE_MAX_BYTES = 50 * 1024 * 1024   # 50 Mo, éviction LRU au-delà
+
+# Cache des recherches DuckDuckGo (requêtes normalisées, en mémoire)
+WEB_SEARCH_TIMEOUT = 8                   # au-delà, erreur (ou résultat périmé s'il existe)
+WEB_SEARCH_CACHE_TTL = 15 * 60           # résultat frais : servi sans appel réseau
+WEB_SEARCH_STALE_TTL = 24 * 3600         # résultat périmé : servi tout de suite, rafraîchi en arrière-plan
+WEB_SEARCH_CACHE_MAXSIZE = 500
 
 # Tool Limits
 FILE_CONTENT_MAX_CHARS = 10000
+FILE_DIFF_CONTEXT = 2                # lignes de contexte des diffs renvoyés par les outils d'écriture
+FILE_DIFF_MAX_LINES = 60
+FS_BATCH_WORKERS = 8                 # écritures parallèles de write_files
+PATCH_FUZZY_THRESHOLD = 0.85        # similarité minimale pour appliquer un hunk dont le contexte a dérivé
+LINE_INDEX_CACHE_SIZE = 64          # index de lignes (mmap) gardés en mémoire pour read_file_content
+FILE_INDEX_WATCH_DEBOUNCE_MS = 100   # regroupement des évènements watchfiles de l'index du sandbox
+CODE_SEARCH_MAX_FILE_BYTES = 1_000_000  # fichiers plus gros (ou binaires) non indexés par search_code
+CODE_SEARCH_MAX_CHARS = 4000            # budget de la sortie de search_code
+CODE_SEARCH_HITS_PER_FILE = 5
 MIN_FILE_CONTENT_LENGTH = 10
 MAX_ITERATIONS = 30
-class PlanCache:
-    def __init__(self, ttl=300, maxsize=50):
-        self.cache = {}
-        self.ttl = ttl
-        self.maxsize = maxsize
-    
-    def get(self, query: str):
-        if query in self.cache:
-            plan, timestamp = self.cache[query]
-            if time.time() - timestamp < self.ttl:
-                return plan
-            del self.cache[query]
-        return None
-    
-    def set(self, query: str, plan: dict):
-        if len(self.cache) >= self.maxsize:
-            oldest_key = min(self.cache, key=lambda k: self.cache[k][1])
-            del self.cache[oldest_key]
-        self.cache[query] = (plan, time.time())
-
-plan_cache = PlanCache()
\ No newline at end of file
+
+# Terminal : capture bornée (tête + queue) et relais des lignes vers /ws pendant l'exécution
+TERMINAL_HEAD_CHARS = 3000
+TERMINAL_TAIL_CHARS = 3000
+TERMINAL_MAX_LINE_CHARS = 1000
+TERMINAL_STREAM_BATCH_LINES = 20     # lignes par évènement "terminal"...
+TERMINAL_STREAM_INTERVAL = 0.2       # ...ou au plus tard toutes les 200 ms
+TERMINAL_STREAM_MAX_LINES = 2000     # au-delà, seul le résumé final est envoyé
+# Shell persistant par session (export, venv, alias conservés entre deux run_terminal)
+TERMINAL_PERSISTENT_SHELL = os.getenv("TERMINAL_PERSISTENT_SHELL", "true").lower() in ("1", "true", "yes") and os.name == "posix"
+TERMINAL_SHELL = os.getenv("TERMINAL_SHELL", "bash")
+# Pool Python chaud : `python x.py`, `python -m ...`, `pytest` sans redémarrer l'interpréteur
+PYTHON_POOL_ENABLED = os.getenv("PYTHON_POOL_ENABLED", "true").lower() in ("1", "true", "yes") and os.name == "posix"
+PYTHON_POOL_PRELOAD = ("json", "re", "collections", "dataclasses", "typing", "pathlib", "unittest",
+                       "numpy", "requests", "flask", "pytest")  # absents = ignorés
+PYTHON_POOL_MAX_RUNS = 50          # le gabarit est recyclé après N exécutions
+PYTHON_POOL_START_TIMEOUT = 30     # secondes pour démarrer + précharger
+# Cache des commandes en lecture seule / déterministes (ls, cat, git status, pytest...)
+TERMINAL_CACHE_ENABLED = os.getenv("TERMINAL_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+TERMINAL_CACHE_SIZE = 128
+TERMINAL_CACHE_TTL = 600           # secondes
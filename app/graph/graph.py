@@ -1,21 +1,30 @@
 # app/graph/graph.py
 from langgraph.graph import StateGraph, END, START
 from langgraph.prebuilt import ToolNode
-from langchain_core.messages import ToolMessage
+from langgraph.types import Send
+from langchain_core.messages import ToolMessage, AIMessage, HumanMessage
+from langchain_core.runnables import RunnableLambda
 
 from app.state.dev_state import DevState
 from app.config import MAX_ITERATIONS
-from app.graph.nodes import call_assistant, coder_agent, research_agent
-from app.graph.planner import planner_node, should_plan
+from app.graph.nodes import (
+    call_assistant, coder_agent, research_agent,
+    acall_assistant, acoder_agent, aresearch_agent,
+)
+from app.graph.planner import planner_node, aplanner_node, should_plan, default_step_deps, READ_ONLY_STEP_TYPES
 from app.graph.reviewer import reviewer_node
 from app.graph.fallback import fallback_node
 from app.graph.optimizer import prompt_optimizer_node
 
-from app.tools.fs import list_project_structure, read_file_content, write_file, replace_lines
+from app.tools.fs import (
+    list_project_structure, read_file_content, write_file, replace_lines, search_code, apply_patch,
+    write_files, make_dirs, move_paths,
+)
 from app.tools.web import web_search, fetch_web_page, smart_web_fetch
 from app.tools.terminal import run_terminal
+from app.tools.sandbox import use_sandbox
 from app.logger import get_logger
-from app.tools.registry import VALID_TOOLS, SAFE_TOOLS_NO_REVIEW, TOOL_ALIASES
+from app.tools.registry import VALID_TOOLS, SAFE_TOOLS_NO_REVIEW, TOOL_ALIASES, READ_ONLY_TOOLS
 
 logger = get_logger("graph")
 
@@ -24,7 +33,8 @@ logger = get_logger("graph")
 # 1. OUTILS
 # ============================================================
 tools_list = [
-    list_project_structure, read_file_content, write_file, replace_lines,
+    list_project_structure, read_file_content, write_file, replace_lines, search_code, apply_patch,
+    write_files, make_dirs, move_paths,
     web_search, fetch_web_page, smart_web_fetch, run_terminal
 ]
 tool_node = ToolNode(tools_list)
@@ -34,6 +44,27 @@ tool_node = ToolNode(tools_list)
 # 2. FONCTIONS DE NŒUDS
 # ============================================================
 
+def _parallel_batch(state: DevState) -> list:
+    """
+    Étapes consécutives à partir de l'étape courante qui peuvent tourner en même temps :
+    en lecture seule et sans dépendance vers une étape pas encore terminée.
+    """
+    steps = state.get("plan_steps", [])
+    current = state.get("current_step", 0)
+    deps = state.get("step_deps") or default_step_deps(steps)
+
+    sequential = set(state.get("sequential_steps") or [])
+
+    batch = []
+    for i in range(current, len(steps)):
+        if steps[i].split(":")[0].lower() not in READ_ONLY_STEP_TYPES or i in sequential:
+            break
+        if any(d >= current for d in deps[i]):
+            break
+        batch.append(i)
+    return batch if len(batch) > 1 else []
+
+
 def dispatcher_node(state: DevState):
     """Nœud Python pur. Lit l'étape courante et prépare le routing."""
     steps = state.get("plan_steps", [])
@@ -42,6 +73,12 @@ def dispatcher_node(state: DevState):
     if current >= len(steps):
         logger.info("✅ DISPATCHER : Toutes les étapes terminées.")
         return {"step_type": "done"}
+
+    # Pas de fan-out pendant une correction (retry) : on rejoue l'étape seule
+    batch = _parallel_batch(state) if not state.get("retry_count") else []
+    if batch:
+        logger.info(f"⚡ DISPATCHER : Étapes {[i + 1 for i in batch]} indépendantes → exécution parallèle")
+        return {"step_type": "parallel", "parallel_batch": batch, "current_step": current}
     
     step = steps[current]
     step_type = step.split(":")[0].lower()
@@ -51,6 +88,123 @@ def dispatcher_node(state: DevState):
     return {"step_type": step_type, "current_step": current}
 
 
+# Agent utilisé par une branche parallèle selon le tag de l'étape
+PARALLEL_AGENTS = {
+    "research": (research_agent, aresearch_agent),
+    "read": (coder_agent, acoder_agent),
+}
+
+
+def _branch_input(state: DevState, idx: int) -> dict:
+    """État privé d'une branche : l'historique + une consigne ciblant UNE étape."""
+    tag = state["plan_steps"][idx].split(":")[0]
+    return {
+        "messages": state["messages"],
+        "root_dir": state.get("root_dir", ""),
+        "plan": state.get("plan"),
+        "plan_steps": state["plan_steps"],
+        "current_step": idx,
+        "step_type": tag.lower(),
+        "dynamic_guidelines": None,
+    }
+
+
+def _branch_messages(branch: dict) -> list:
+    tag, _, detail = branch["plan_steps"][branch["current_step"]].partition(":")
+    instruction = HumanMessage(content=f"Execute ONLY step {branch['current_step'] + 1} [{tag}]: {detail}")
+    return branch["messages"] + [instruction]
+
+
+def _review_branch(response: dict) -> tuple[AIMessage, str | None]:
+    """Passe la réponse de l'agent au reviewer. Retourne (message, raison du rejet)."""
+    ai_msg = response["messages"][-1]
+    if not getattr(ai_msg, "tool_calls", None):
+        return ai_msg, None
+    review = reviewer_node({"messages": [ai_msg]})
+    if review.get("code_quality_score") == 0:
+        return ai_msg, review.get("review_feedback") or "rejected"
+    return ai_msg, None
+
+
+def _branch_result(idx: int, messages: list, requeue: bool = False) -> dict:
+    return {"parallel_results": [{"step": idx, "messages": messages, "requeue": requeue}]}
+
+
+def _writes(ai_msg: AIMessage) -> list:
+    """Appels hors READ_ONLY_TOOLS : interdits dans une branche (sandbox et shell partagés)."""
+    return [tc["name"] for tc in ai_msg.tool_calls if tc["name"] not in READ_ONLY_TOOLS]
+
+
+def _requeue(idx: int, names: list) -> dict:
+    logger.warning(f"⚠️ Étape {idx + 1} en parallèle a demandé {names} (hors lecture seule) → rejouée seule")
+    return _branch_result(idx, [], requeue=True)
+
+
+def parallel_step_node(branch: dict):
+    """Exécute une étape lecture seule de bout en bout : agent → reviewer → outil."""
+    idx = branch["current_step"]
+    agent, _ = PARALLEL_AGENTS[branch["step_type"]]
+    response = agent({**branch, "messages": _branch_messages(branch)})
+    ai_msg, rejection = _review_branch(response)
+    if rejection:
+        return _branch_result(idx, [AIMessage(content=f"Step {idx + 1} skipped: {rejection}")])
+    if not getattr(ai_msg, "tool_calls", None):
+        return _branch_result(idx, [ai_msg])
+    if _writes(ai_msg):
+        return _requeue(idx, _writes(ai_msg))
+    tools_out = tool_node_with_counter({"messages": [ai_msg], "root_dir": branch.get("root_dir")})
+    return _branch_result(idx, [ai_msg] + tools_out["messages"])
+
+
+async def aparallel_step_node(branch: dict):
+    idx = branch["current_step"]
+    _, agent = PARALLEL_AGENTS[branch["step_type"]]
+    response = await agent({**branch, "messages": _branch_messages(branch)})
+    ai_msg, rejection = _review_branch(response)
+    if rejection:
+        return _branch_result(idx, [AIMessage(content=f"Step {idx + 1} skipped: {rejection}")])
+    if not getattr(ai_msg, "tool_calls", None):
+        return _branch_result(idx, [ai_msg])
+    if _writes(ai_msg):
+        return _requeue(idx, _writes(ai_msg))
+    tools_out = await atool_node_with_counter({"messages": [ai_msg], "root_dir": branch.get("root_dir")})
+    return _branch_result(idx, [ai_msg] + tools_out["messages"])
+
+
+def join_parallel_node(state: DevState):
+    """
+    Fusionne les branches dans `messages` dans l'ordre du plan (déterministe).
+    À la première étape en échec (erreur d'outil) ou à rejouer seule (appel hors lecture
+    seule), on s'arrête : elle et les suivantes repassent par le dispatcher.
+    """
+    results = sorted(state.get("parallel_results") or [], key=lambda r: r["step"])
+    batch = state.get("parallel_batch") or [r["step"] for r in results]
+    next_step = max(batch) + 1 if batch else state.get("current_step", 0) + 1
+    sequential = list(state.get("sequential_steps") or [])
+    messages, merged, failed = [], 0, None
+    for result in results:
+        if result.get("requeue"):
+            next_step = result["step"]
+            sequential.append(result["step"])
+            break
+        messages += result["messages"]
+        merged += 1
+        if any(isinstance(m, ToolMessage) and _is_tool_error(m) for m in result["messages"]):
+            next_step = failed = result["step"]
+            break
+    if failed is not None:
+        logger.warning(f"⚠️ JOIN : erreur outil à l'étape {failed + 1} → fallback")
+    logger.info(f"🔗 JOIN : {merged}/{len(results)} étapes parallèles fusionnées → étape {next_step + 1}")
+    return {
+        "messages": messages,
+        "parallel_results": None,
+        "parallel_batch": [],
+        "sequential_steps": sequential,
+        "current_step": next_step,
+        "iteration_count": state.get("iteration_count", 0) + merged,
+    }
+
+
 def advance_step_node(state: DevState):
     """Avance au step suivant après exécution réussie d'un outil."""
     current = state.get("current_step", 0)
@@ -63,10 +217,12 @@ def advance_step_node(state: DevState):
 # 3. FONCTIONS DE ROUTAGE
 # ============================================================
 
-def route_from_dispatcher(state: DevState) -> str:
-    """Dispatcher → quel agent appeler selon le tag du step."""
+def route_from_dispatcher(state: DevState):
+    """Dispatcher → quel agent appeler selon le tag du step (ou fan-out parallèle)."""
     step_type = state.get("step_type", "code")
     
+    if step_type == "parallel":
+        return [Send("parallel_step", _branch_input(state, i)) for i in state["parallel_batch"]]
     if step_type == "done":
         return "generator"
     elif step_type == "research":
@@ -134,6 +290,41 @@ def route_after_review(state: DevState) -> str:
 
 # app/graph/graph.py
 
+def _last_tool_messages(messages: list) -> list:
+    """ToolMessages produits par le dernier tour d'outils (après le dernier AIMessage)."""
+    tail = []
+    for m in reversed(messages):
+        if not isinstance(m, ToolMessage):
+            break
+        tail.append(m)
+    return tail[::-1]
+
+
+def _is_tool_error(msg: ToolMessage) -> bool:
+    """Le retour d'outil est-il une erreur technique (→ fallback) ?"""
+    content = msg.content.strip().lower()
+    tool_name = getattr(msg, 'name', '')
+
+    # Liste des préfixes d'erreur technique (générés par vos outils)
+    error_prefixes = ["error:", "erreur:", "erreur exécution", "traceback", "exception"]
+    
+    # Pour les outils Web, on ne regarde QUE le début du message
+    # (car le contenu de la page peut contenir n'importe quoi)
+    if tool_name in ["web_search", "fetch_web_page", "smart_web_fetch"]:
+        if any(content.startswith(p) for p in error_prefixes):
+            return True
+        # Cas spécial : HTTP errors souvent courtes
+        return "404 not found" in content[:50] or "403 forbidden" in content[:50]
+
+    # Pour les outils système (terminal, fs), on peut scanner un peu plus large
+    # "File not found" est informatif pour les outils de lecture
+    if tool_name in ("read_file_content", "list_project_structure", "search_code"):
+        return any(content.startswith(p) for p in ["erreur lecture", "erreur lors", "accès refusé", "error replacing"])
+    if any(content.startswith(p) for p in error_prefixes):
+        return True
+    return "interdits" in content  # Votre sécurité shell
+
+
 def route_after_tools(state: DevState) -> str:
     """
     Routeur post-exécution d'outil.
@@ -143,42 +334,13 @@ def route_after_tools(state: DevState) -> str:
         logger.error(f"🛑 ITERATION LIMIT ({iteration}) → END")
         return END
 
-    last_msg = state["messages"][-1]
     steps = state.get("plan_steps", [])
     
     # --- 1. DÉTECTION D'ERREUR INTELLIGENTE ---
-    if isinstance(last_msg, ToolMessage):
-        content = last_msg.content.strip().lower()
-        tool_name = getattr(last_msg, 'name', '')
-
-        # Liste des préfixes d'erreur technique (générés par vos outils)
-        error_prefixes = ["error:", "erreur:", "erreur exécution", "traceback", "exception"]
-        
-        # Est-ce une erreur technique ?
-        is_error = False
-        
-        # Pour les outils Web, on ne regarde QUE le début du message
-        # (car le contenu de la page peut contenir n'importe quoi)
-        if tool_name in ["web_search", "fetch_web_page", "smart_web_fetch"]:
-            if any(content.startswith(p) for p in error_prefixes):
-                is_error = True
-            # Cas spécial : HTTP errors souvent courtes
-            if "404 not found" in content[:50] or "403 forbidden" in content[:50]:
-                is_error = True
-
-        # Pour les outils système (terminal, fs), on peut scanner un peu plus large
-        else:
-            # "File not found" est informatif pour les outils de lecture
-            if tool_name in ("read_file_content", "list_project_structure"):
-                if any(content.startswith(p) for p in ["erreur lecture", "erreur lors", "accès refusé", "error replacing"]):
-                    is_error = True
-            elif any(content.startswith(p) for p in error_prefixes):
-                is_error = True
-            elif "interdits" in content:  # Votre sécurité shell
-                is_error = True
-
-        if is_error:
-            logger.warning(f"⚠️ Erreur outil détectée ({tool_name}) → Direction Fallback")
+    # Un tour peut contenir plusieurs appels : on vérifie tous les ToolMessages du tour
+    for msg in _last_tool_messages(state["messages"]):
+        if _is_tool_error(msg):
+            logger.warning(f"⚠️ Erreur outil détectée ({getattr(msg, 'name', '')}) → Direction Fallback")
             return "fallback"
     
     # --- 2. GESTION DU PLAN (Code existant inchangé) ---
@@ -195,12 +357,72 @@ def route_after_tools(state: DevState) -> str:
     # --- 3. MODE CONVERSATION ---
     logger.info("✅ Action unique terminée → Retour au Generator")
     return "generator"
+
+
+def _independent(a: dict, b: dict) -> bool:
+    """Deux appels d'un même tour peuvent-ils s'exécuter en même temps ?"""
+    if a["name"] in READ_ONLY_TOOLS and b["name"] in READ_ONLY_TOOLS:
+        return True
+    if "run_terminal" in (a["name"], b["name"]):
+        return False
+    # Écritures : indépendantes seulement si elles visent des fichiers différents
+    path_a, path_b = a["args"].get("file_path"), b["args"].get("file_path")
+    return bool(path_a and path_b and path_a != path_b)
+
+
+def _tool_waves(tool_calls: list) -> list:
+    """
+    Découpe les appels en vagues consécutives d'appels indépendants.
+    Les vagues s'exécutent dans l'ordre, les appels d'une vague en parallèle (ToolNode).
+    """
+    waves = []
+    for call in tool_calls:
+        if waves and all(_independent(call, other) for other in waves[-1]):
+            waves[-1].append(call)
+        else:
+            waves.append([call])
+    return waves
+
+
+def _wave_input(state: DevState, wave: list) -> dict:
+    return {**state, "messages": state["messages"][:-1] + [AIMessage(content="", tool_calls=wave)]}
+
+
 def tool_node_with_counter(state: DevState):
-    """Wrap ToolNode to increment iteration_count."""
-    result = tool_node.invoke(state)
+    """Wrap ToolNode to increment iteration_count (tools run in the session sandbox)."""
+    waves = _tool_waves(state["messages"][-1].tool_calls)
+    with use_sandbox(state.get("root_dir")):
+        if len(waves) == 1:
+            result = tool_node.invoke(state)
+        else:
+            logger.info(f"🛠️ TOOLS : {sum(map(len, waves))} appels en {len(waves)} vagues")
+            result = {"messages": [m for wave in waves for m in tool_node.invoke(_wave_input(state, wave))["messages"]]}
     result["iteration_count"] = state.get("iteration_count", 0) + 1
     return result
 
+
+async def atool_node_with_counter(state: DevState):
+    """Async variant: tools run via their coroutine (or a worker thread) off the event loop."""
+    waves = _tool_waves(state["messages"][-1].tool_calls)
+    with use_sandbox(state.get("root_dir")):
+        if len(waves) == 1:
+            result = await tool_node.ainvoke(state)
+        else:
+            logger.info(f"🛠️ TOOLS : {sum(map(len, waves))} appels en {len(waves)} vagues")
+            messages = []
+            for wave in waves:
+                messages += (await tool_node.ainvoke(_wave_input(state, wave)))["messages"]
+            result = {"messages": messages}
+    result["iteration_count"] = state.get("iteration_count", 0) + 1
+    return result
+
+def route_after_join(state: DevState) -> str:
+    """Join → fallback si la branche fusionnée en dernier a échoué (comme route_after_tools), sinon dispatcher."""
+    if any(_is_tool_error(m) for m in _last_tool_messages(state["messages"])):
+        return "fallback"
+    return "dispatcher"
+
+
 def entry_router(state: DevState) -> str:
     return "generator" if not should_plan(state) else "planner"
 
@@ -227,16 +449,19 @@ def route_after_fallback(state: DevState) -> str:
 workflow = StateGraph(DevState)
 
 # --- Ajout des nœuds ---
-workflow.add_node("planner", planner_node)
+# Les nœuds LLM / outils ont une version sync (app.stream, CLI) et async (app.astream, serveur)
+workflow.add_node("planner", RunnableLambda(planner_node, aplanner_node, name="planner"))
 workflow.add_node("dispatcher", dispatcher_node)
-workflow.add_node("research_agent", research_agent)
-workflow.add_node("coder_agent", coder_agent)
-workflow.add_node("generator", call_assistant)
+workflow.add_node("research_agent", RunnableLambda(research_agent, aresearch_agent, name="research_agent"))
+workflow.add_node("coder_agent", RunnableLambda(coder_agent, acoder_agent, name="coder_agent"))
+workflow.add_node("generator", RunnableLambda(call_assistant, acall_assistant, name="generator"))
 workflow.add_node("reviewer", reviewer_node)
-workflow.add_node("tools", tool_node_with_counter)
+workflow.add_node("tools", RunnableLambda(tool_node_with_counter, atool_node_with_counter, name="tools"))
 workflow.add_node("fallback", fallback_node)
 workflow.add_node("optimizer", prompt_optimizer_node)
 workflow.add_node("advance_step", advance_step_node)
+workflow.add_node("parallel_step", RunnableLambda(parallel_step_node, aparallel_step_node, name="parallel_step"))
+workflow.add_node("join_steps", join_parallel_node)
 
 # --- Entry point ---
 workflow.add_conditional_edges(START, entry_router)
@@ -253,6 +478,8 @@ workflow.add_conditional_edges("reviewer", route_after_review)
 workflow.add_conditional_edges("tools", route_after_tools)
 
 workflow.add_edge("advance_step", "dispatcher")
+workflow.add_edge("parallel_step", "join_steps")
+workflow.add_conditional_edges("join_steps", route_after_join)
 workflow.add_conditional_edges("fallback", route_after_fallback)
 workflow.add_edge("optimizer", "dispatcher")
 
@@ -4,6 +4,7 @@ import re
 import time
 import json
 from app.llm.llm_client import get_llm, get_llm_constrained
+from app.llm.response_cache import cached_invoke, acached_invoke
 from langchain_core.messages import SystemMessage, ToolMessage, AIMessage, HumanMessage
 from app.state.dev_state import DevState
 from app.config import MAX_CONTEXT_MESSAGES
@@ -11,7 +12,7 @@ from app.tools.terminal import run_terminal
 from app.tools.fs import list_project_structure, read_file_content, write_file, replace_lines
 from app.logger import get_logger
 from app.llm.robust_parser import parser
-from app.utils.smart_context_window import smart_context_window
+from app.utils.smart_context_window import smart_context_window, estimate_tokens
 from app.tools.registry import TOOLS_MANIFEST, TOOL_ALIASES
 
 logger = get_logger("nodes")
@@ -20,25 +21,22 @@ logger = get_logger("nodes")
 
 
 def _build_tool_call_msg(parsed_result: dict) -> AIMessage:
-    """Helper to build an AIMessage with tool_calls from a parsed result."""
-    tool_name = parsed_result["tool"]
-    tool_args = parsed_result.get("args", {})
-    
+    """Helper to build an AIMessage with tool_calls (one per parsed call) from a parsed result."""
     # Common hallucination fixes
     QUICK_FIXES = {
         "run_command": "run_terminal",
         "read_file": "read_file_content",
     }
-    tool_name = QUICK_FIXES.get(tool_name, tool_name)
-    
-    return AIMessage(
-        content="",
-        tool_calls=[{
-            "name": tool_name,
+    stamp = int(time.time())
+    tool_calls = []
+    for i, call in enumerate(parsed_result.get("calls") or [parsed_result]):
+        tool_args = call.get("args", {})
+        tool_calls.append({
+            "name": QUICK_FIXES.get(call["tool"], call["tool"]),
             "args": tool_args,
-            "id": f"call_{int(time.time())}_{id(tool_args) % 10000}"
-        }]
-    )
+            "id": f"call_{stamp}_{i}_{id(tool_args) % 10000}",
+        })
+    return AIMessage(content="", tool_calls=tool_calls)
 
 
 def _parse_llm_response(response_content: str, context_label: str = "AGENT") -> dict:
@@ -54,11 +52,29 @@ def _parse_llm_response(response_content: str, context_label: str = "AGENT") ->
     return parsed
 
 
+def _invoke_llm(llm, msg_history: list):
+    logger.debug(f"⏳ Envoi au LLM... (context: {len(msg_history)} messages)")
+    start = time.time()
+    response = cached_invoke(llm, msg_history)
+    elapsed = time.time() - start
+    logger.debug(f"✅ LLM a répondu en {elapsed:.1f}s : {response.content[:100]}...")
+    return response
+
+
+async def _ainvoke_llm(llm, msg_history: list):
+    logger.debug(f"⏳ Envoi au LLM (async)... (context: {len(msg_history)} messages)")
+    start = time.time()
+    response = await acached_invoke(llm, msg_history)
+    elapsed = time.time() - start
+    logger.debug(f"✅ LLM a répondu en {elapsed:.1f}s : {response.content[:100]}...")
+    return response
+
+
 def _build_fetch_trap(state: DevState) -> dict | None:
     """If we just searched and need to fetch, return a forced fetch tool call."""
     messages = state["messages"]
     last_message = messages[-1]
-    guidelines = state.get("dynamic_guidelines", "")
+    guidelines = state.get("dynamic_guidelines") or ""
 
     just_searched = isinstance(last_message, ToolMessage) and getattr(last_message, 'name', '') == "web_search"
     optimizer_forces_click = "fetch_web_page" in guidelines and "URGENT FIX" in guidelines
@@ -67,34 +83,35 @@ def _build_fetch_trap(state: DevState) -> dict | None:
         return None
 
     search_content = ""
+    search_call_id = None
     for m in reversed(messages):
         if isinstance(m, ToolMessage) and getattr(m, 'name', '') == "web_search":
             search_content = m.content
+            search_call_id = m.tool_call_id
             break
 
+    # La requête de la recherche sert à extraire les passages pertinents de la page
+    query = ""
+    for m in reversed(messages):
+        for tc in getattr(m, "tool_calls", None) or []:
+            if tc.get("id") == search_call_id:
+                query = tc["args"].get("query", "")
+
     urls = re.findall(r'https?://[^\s\n,)]+', search_content)
     if urls:
         return {"messages": [AIMessage(content="", tool_calls=[{
             "id": f"fetch_trap_{int(time.time())}",
             "name": "fetch_web_page",
-            "args": {"url": urls[0]}
+            "args": {"url": urls[0], "query": query}
         }])]}
     return None
 
 
-def call_assistant(state: DevState):
-    logger.info("🤖 GENERATOR : Analyse du contexte...")
-
-    # Trap mode: auto-fetch after search
-    trap_result = _build_fetch_trap(state)
-    if trap_result:
-        logger.warning("⚡ TRAP: Auto-fetching best URL from search results")
-        return trap_result
-    
+def _generator_prompt(state: DevState) -> list:
     current_dir = state.get("root_dir", ".")
     plan = state.get("plan", "No plan provided.")
     messages = state["messages"]
-    guidelines = state.get("dynamic_guidelines", "")
+    guidelines = state.get("dynamic_guidelines") or ""
 
     # MODE NORMAL
     feedback = f"\n### FEEDBACK ###\n{guidelines}\n" if guidelines else ""
@@ -111,29 +128,19 @@ def call_assistant(state: DevState):
 
         "### RESPONSE FORMAT (JSON ONLY) ###\n"
         "Tool call:  {\"tool\": \"write_file\", \"args\": {\"file_path\": \"calc.py\", \"content\": \"...\"}}\n"
+        "Several independent tool calls (e.g. reading several files):\n"
+        "            {\"tool_calls\": [{\"tool\": \"read_file_content\", \"args\": {\"file_path\": \"a.py\"}}, {\"tool\": \"read_file_content\", \"args\": {\"file_path\": \"b.py\"}}]}\n"
         "Answer:     {\"answer\": \"I have finished creating the files. Here is the summary...\"}\n\n"
 
         "Respond with ONLY a JSON object."
     )
 
-    llm = get_llm_constrained()
-
     # --- SLIDING WINDOW ---
-    filtered_messages = smart_context_window(messages)
-    msg_history = [SystemMessage(content=system_content)] + filtered_messages
+    filtered_messages = smart_context_window(messages, reserved_tokens=estimate_tokens(system_content))
+    return [SystemMessage(content=system_content)] + filtered_messages
 
-    
-    # --- APPEL LLM ---
-    logger.debug(f"⏳ Envoi au LLM... (context: {len(msg_history)} messages)")
-    start = time.time()
-    try:
-        response = llm.invoke(msg_history)
-        elapsed = time.time() - start
-        logger.debug(f"✅ LLM a répondu en {elapsed:.1f}s")
-    except Exception as e:
-        logger.error(f"❌ Erreur Invocation LLM : {e}")
-        return {"messages": [AIMessage(content="Error calling LLM.")]}
-    
+
+def _generator_result(response) -> dict:
     # --- PARSING ROBUSTE ---
     parsed_result = _parse_llm_response(response.content, "GENERATOR")
     
@@ -147,21 +154,65 @@ def call_assistant(state: DevState):
         
     if "tool" in parsed_result:
         ai_msg = _build_tool_call_msg(parsed_result)
-        logger.info(f"🤖 ACTION : {ai_msg.tool_calls[0]['name']}")
+        logger.info(f"🤖 ACTION : {', '.join(tc['name'] for tc in ai_msg.tool_calls)}")
         return {"messages": [ai_msg]}
 
     return {"messages": [AIMessage(content=response.content)]}
 
 
+def call_assistant(state: DevState):
+    logger.info("🤖 GENERATOR : Analyse du contexte...")
 
-def coder_agent(state: DevState):
-    """Sous-agent spécialisé code : write_file, replace_lines, read_file_content, list_project_structure, run_terminal."""
-    logger.info("💻 CODER AGENT activé")
+    # Trap mode: auto-fetch after search
+    trap_result = _build_fetch_trap(state)
+    if trap_result:
+        logger.warning("⚡ TRAP: Auto-fetching best URL from search results")
+        return trap_result
+
+    llm = get_llm_constrained()
+    msg_history = _generator_prompt(state)
     
+    # --- APPEL LLM ---
+    try:
+        response = _invoke_llm(llm, msg_history)
+    except Exception as e:
+        logger.error(f"❌ Erreur Invocation LLM : {e}")
+        return {"messages": [AIMessage(content="Error calling LLM.")]}
+    return _generator_result(response)
+
+
+async def acall_assistant(state: DevState):
+    """Version async de call_assistant (ne bloque pas l'event loop du serveur)."""
+    logger.info("🤖 GENERATOR : Analyse du contexte...")
+
+    trap_result = _build_fetch_trap(state)
+    if trap_result:
+        logger.warning("⚡ TRAP: Auto-fetching best URL from search results")
+        return trap_result
+
+    llm = get_llm_constrained()
+    msg_history = _generator_prompt(state)
+
+    try:
+        response = await _ainvoke_llm(llm, msg_history)
+    except Exception as e:
+        logger.error(f"❌ Erreur Invocation LLM : {e}")
+        return {"messages": [AIMessage(content="Error calling LLM.")]}
+    return _generator_result(response)
+
+
+
+CODER_TOOL_NAMES = [
+    "write_file", "write_files", "replace_lines", "apply_patch", "make_dirs", "move_paths",
+    "read_file_content", "list_project_structure", "search_code", "run_terminal",
+]
+
+
+def _coder_prompt(state: DevState) -> list:
     messages = state["messages"]
     current_dir = state.get("root_dir", os.getcwd())
     plan = state.get("plan", "")
-    guidelines = state.get("dynamic_guidelines", "")
+    guidelines = state.get("dynamic_guidelines") or ""
     feedback = f"\n### FEEDBACK ###\n{guidelines}\n" if guidelines else ""
     
     system_content = (
@@ -175,24 +226,23 @@ def coder_agent(state: DevState):
         "### EXAMPLES ###\n"
         "Read a file:  {\"tool\": \"read_file_content\", \"args\": {\"file_path\": \"main.py\"}}\n"
         "Create file:  {\"tool\": \"write_file\", \"args\": {\"file_path\": \"app.py\", \"content\": \"from flask import Flask\\n\"}}\n"
+        "Create files: {\"tool\": \"write_files\", \"args\": {\"files\": [{\"file_path\": \"app.py\", \"content\": \"...\"}, {\"file_path\": \"models.py\", \"content\": \"...\"}]}}\n"
         "Edit file:    {\"tool\": \"replace_lines\", \"args\": {\"file_path\": \"app.py\", \"start_line\": 10, \"end_line\": 12, \"new_content\": \"return 42\"}}\n"
+        "Patch files:  {\"tool\": \"apply_patch\", \"args\": {\"patch\": \"app.py\\n<<<<<<< SEARCH\\n    return 41\\n=======\\n    return 42\\n>>>>>>> REPLACE\"}}\n"
         "Run command:  {\"tool\": \"run_terminal\", \"args\": {\"command\": \"cat main.py\"}}\n"
-        "List files:   {\"tool\": \"list_project_structure\", \"args\": {}}\n\n"
+        "List files:   {\"tool\": \"list_project_structure\", \"args\": {}}\n"
+        "Search code:  {\"tool\": \"search_code\", \"args\": {\"query\": \"def main\"}}\n"
+        "Read several files at once:\n"
+        "  {\"tool_calls\": [{\"tool\": \"read_file_content\", \"args\": {\"file_path\": \"a.py\"}}, {\"tool\": \"read_file_content\", \"args\": {\"file_path\": \"b.py\"}}]}\n\n"
         
-        "Respond with JSON only. ONE tool call."
+        "Respond with JSON only. ONE tool call, or a \"tool_calls\" list when the calls are independent."
     )
     
-    tool_names = ["write_file", "replace_lines", "read_file_content", "list_project_structure", "run_terminal"]
-    llm = get_llm_constrained(tool_names=tool_names)
-    filtered = smart_context_window(messages)
-    msg_history = [SystemMessage(content=system_content)] + filtered
-    
-    logger.debug(f"⏳ Envoi au LLM... (context: {len(msg_history)} messages)")
-    start = time.time()
-    response = llm.invoke(msg_history)
-    elapsed = time.time() - start
-    logger.debug(f"✅ LLM a répondu en {elapsed:.1f}s : {response.content[:100]}...")
-    
+    filtered = smart_context_window(messages, reserved_tokens=estimate_tokens(system_content))
+    return [SystemMessage(content=system_content)] + filtered
+
+
+def _coder_result(response) -> dict:
     # ═══ FIX: Use RobustParser instead of tool_parser ═══
     parsed_result = _parse_llm_response(response.content, "CODER")
     
@@ -207,10 +257,23 @@ def coder_agent(state: DevState):
     return {"messages": [AIMessage(content=f"Parse error: {error_msg}")]}
 
 
-def research_agent(state: DevState):
-    """Agent spécialisé web : utilise smart_web_fetch."""
-    logger.info("🔬 RESEARCH AGENT activé")
-    
+def coder_agent(state: DevState):
+    """Sous-agent spécialisé code : écriture (unitaire ou groupée), édition, lecture, recherche et terminal."""
+    logger.info("💻 CODER AGENT activé")
+    llm = get_llm_constrained(tool_names=CODER_TOOL_NAMES)
+    response = _invoke_llm(llm, _coder_prompt(state))
+    return _coder_result(response)
+
+
+async def acoder_agent(state: DevState):
+    """Version async de coder_agent."""
+    logger.info("💻 CODER AGENT activé")
+    llm = get_llm_constrained(tool_names=CODER_TOOL_NAMES)
+    response = await _ainvoke_llm(llm, _coder_prompt(state))
+    return _coder_result(response)
+
+
+def _research_prompt(state: DevState) -> list:
     messages = state["messages"]
     
     user_request = ""
@@ -228,17 +291,11 @@ def research_agent(state: DevState):
         "Respond with JSON only."
     )
     
-    llm = get_llm_constrained(tool_names=["smart_web_fetch"])
-    
-    filtered = smart_context_window(messages, max_messages=10)
-    msg_history = [SystemMessage(content=system_content)] + filtered
-    
-    logger.debug(f"⏳ Envoi au LLM... (context: {len(msg_history)} messages)")
-    start = time.time()
-    response = llm.invoke(msg_history)
-    elapsed = time.time() - start
-    logger.debug(f"✅ LLM a répondu en {elapsed:.1f}s : {response.content[:100]}...")
-    
+    filtered = smart_context_window(messages, max_messages=10, reserved_tokens=estimate_tokens(system_content))
+    return [SystemMessage(content=system_content)] + filtered
+
+
+def _research_result(response) -> dict:
     # ═══ FIX: Use RobustParser instead of tool_parser ═══
     parsed_result = _parse_llm_response(response.content, "RESEARCH")
     
@@ -248,3 +305,18 @@ def research_agent(state: DevState):
     content = parsed_result.get("answer", response.content)
     return {"messages": [AIMessage(content=str(content))]}
 
+
+def research_agent(state: DevState):
+    """Agent spécialisé web : utilise smart_web_fetch."""
+    logger.info("🔬 RESEARCH AGENT activé")
+    llm = get_llm_constrained(tool_names=["smart_web_fetch"])
+    response = _invoke_llm(llm, _research_prompt(state))
+    return _research_result(response)
+
+
+async def aresearch_agent(state: DevState):
+    """Version async de research_agent."""
+    logger.info("🔬 RESEARCH AGENT activé")
+    llm = get_llm_constrained(tool_names=["smart_web_fetch"])
+    response = await _ainvoke_llm(llm, _research_prompt(state))
+    return _research_result(response)
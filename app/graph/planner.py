@@ -2,7 +2,10 @@
 from langchain_core.messages import SystemMessage, HumanMessage
 from app.state.dev_state import DevState
 from app.llm.llm_client import get_llm
-from app.config import MAX_PLAN_STEPS, plan_cache
+from app.llm.response_cache import cached_invoke, acached_invoke
+from app.config import MAX_PLAN_STEPS
+from app.utils.plan_cache import plan_cache
+from app.utils.plan_index import plan_index
 from app.logger import get_logger
 import re
 
@@ -28,27 +31,75 @@ PLAN_TEMPLATES = {
 }
 
 
+# Étapes en lecture seule : pas d'effet de bord, elles peuvent tourner en parallèle
+READ_ONLY_STEP_TYPES = {"research", "read"}
+
+_DEPS_RE = re.compile(r'\(\s*(?:after|deps?|depends(?:\s+on)?)\s*:?\s*([^)]*)\)\s*$', re.IGNORECASE)
+
+
+def default_step_deps(steps: list) -> list:
+    """
+    Dépendances implicites (indices 0-based) quand le plan n'en déclare pas :
+    une étape [CODE] dépend de toutes les précédentes, une étape en lecture seule
+    ([RESEARCH]/[READ]) dépend seulement de la dernière étape [CODE] qui la précède.
+    """
+    deps = []
+    last_code = None
+    for i, step in enumerate(steps):
+        tag = step.split(":")[0].lower()
+        if tag in READ_ONLY_STEP_TYPES:
+            deps.append([last_code] if last_code is not None else [])
+        else:
+            deps.append(list(range(i)))
+            last_code = i
+    return deps
+
+
+def _parse_steps(plan_text: str) -> tuple[list, list]:
+    """Parse les lignes taguées → (["TAG:detail", ...], dépendances 0-based par étape)."""
+    steps = []
+    declared = []
+    for line in plan_text.split("\n"):
+        line = line.strip()
+        match = re.match(r'\[?(RESEARCH|CODE|READ)\]?\s*(.*)', line, re.IGNORECASE)
+        if match:
+            tag = match.group(1).upper()
+            detail = match.group(2).strip()
+            deps = None
+            deps_match = _DEPS_RE.search(detail)
+            if deps_match:
+                detail = detail[:deps_match.start()].strip()
+                deps = [int(n) - 1 for n in re.findall(r'\d+', deps_match.group(1))]
+            if detail:  # Skip empty steps
+                steps.append(f"{tag}:{detail}")
+                declared.append(deps)
+
+    deps = default_step_deps(steps)
+    for i, d in enumerate(declared):
+        if d is not None:
+            # On ne garde que des références vers des étapes antérieures
+            deps[i] = sorted({n for n in d if 0 <= n < i})
+    return steps, deps
+
+
 def _match_template(user_request: str) -> dict | None:
     lower = user_request.lower().strip()
     words = lower.split()
     for _, tmpl in PLAN_TEMPLATES.items():
         if tmpl["pattern"](lower, words):
             plan_text = tmpl["plan"](user_request)
-            steps = []
-            for line in plan_text.split("\n"):
-                match = re.match(r'\[?(RESEARCH|CODE|READ)\]?\s*(.*)', line, re.IGNORECASE)
-                if match:
-                    steps.append(f"{match.group(1).upper()}:{match.group(2).strip()}")
+            steps, deps = _parse_steps(plan_text)
             if steps:
                 return {
                     "plan": plan_text,
                     "plan_steps": steps,
+                    "step_deps": deps,
                     "current_step": 0,
                     "step_type": steps[0].split(":")[0].lower(),
                 }
     return None
 
-def planner_node(state: DevState):
+def _get_user_request(state: DevState) -> str:
     messages = state["messages"]
     
     # --- 1. RÉCUPÉRATION DE LA DEMANDE UTILISATEUR ---
@@ -60,7 +111,11 @@ def planner_node(state: DevState):
             
     if not user_request:
         user_request = messages[-1].content
+    return user_request
+
 
+def _plan_without_llm(state: DevState, user_request: str) -> dict | None:
+    """Cache puis templates : retourne un plan sans appel LLM si possible."""
     # --- 2. CHECK CACHE ---
     cache_key = user_request.strip().lower()
     
@@ -69,7 +124,8 @@ def planner_node(state: DevState):
     retry_count = state.get("retry_count", 0)
     if retry_count > 0:
         logger.info("🗑️ Cache invalidé (arrivée post-fallback)")
-        plan_cache.cache.pop(cache_key, None)
+        plan_cache.invalidate(cache_key)
+        plan_index.remove(cache_key)
     else:
         cached = plan_cache.get(cache_key)
         if cached:
@@ -83,67 +139,78 @@ def planner_node(state: DevState):
         plan_cache.set(cache_key, template_result)
         return template_result
 
-    # --- 3. GÉNÉRATION DU PLAN ---
-    logger.info(f"🗺️ PLANNER : Élaboration du plan technique pour '{user_request[:50]}...'")
-    
-    llm = get_llm()
-    
+    # --- 2c. CHECK SEMANTIC INDEX (demande quasi identique déjà planifiée) ---
+    if retry_count == 0:
+        plan, score, matched = plan_index.lookup(user_request)
+        if plan:
+            logger.info(f"🧲 SEMANTIC HIT (similarité {score:.3f}) : '{matched[:50]}'")
+            plan_cache.set(cache_key, plan)
+            return plan
+        if matched:
+            logger.debug(f"🧲 Semantic miss (meilleure similarité {score:.3f}, seuil {plan_index.threshold}, mêmes termes clés exigés)")
+    return None
+
+
+def _planner_prompt(user_request: str) -> list:
     system_msg = SystemMessage(content=(
         "You are a Technical Lead. Create a step-by-step plan.\n"
-        "Each step MUST start with a tag: [RESEARCH], [CODE], or [READ].\n\n"
+        "Each step MUST start with a tag: [RESEARCH], [CODE], or [READ].\n"
+        "Each step MUST end with its dependencies: (after: N, M) lists the earlier step numbers "
+        "whose result it needs, (after: none) if it is independent.\n\n"
         
         "### AVAILABLE TOOLS ###\n"
-        "- [READ] → uses read_file_content or run_terminal (cat)\n"
-        "- [CODE] → uses write_file, replace_lines, or run_terminal\n"
+        "- [READ] → uses read_file_content, search_code or run_terminal (cat)\n"
+        "- [CODE] → uses write_file, write_files (several files at once), apply_patch, replace_lines, or run_terminal\n"
         "- [RESEARCH] → uses smart_web_fetch or web_search\n\n"
         
         "### EXAMPLE 1: Web task ###\n"
         "Request: 'Find how to use React hooks'\n"
         "Plan:\n"
-        "[RESEARCH] search for React hooks tutorial\n"
-        "[CODE] write summary to hooks.md\n\n"
+        "[RESEARCH] search for React hooks tutorial (after: none)\n"
+        "[CODE] write summary to hooks.md (after: 1)\n\n"
         
         "### EXAMPLE 2: Code task ###\n"
         "Request: 'Create a calculator class'\n"
         "Plan:\n"
-        "[CODE] create calculator.py with Calculator class\n\n"
+        "[CODE] create calculator.py with Calculator class (after: none)\n\n"
         
         "### EXAMPLE 3: Read + generate task ###\n"
         "Request: 'Generate requirements.txt for my app'\n"
         "Plan:\n"
-        "[READ] read the source file to identify imports\n"
-        "[CODE] write requirements.txt with the identified dependencies\n\n"
+        "[READ] read the source file to identify imports (after: none)\n"
+        "[CODE] write requirements.txt with the identified dependencies (after: 1)\n\n"
         
         "### EXAMPLE 4: Fix task ###\n"
         "Request: 'Fix the bug in main.py'\n"
         "Plan:\n"
-        "[READ] read main.py to understand the code\n"
-        "[CODE] fix the bug using replace_lines\n\n"
+        "[READ] read main.py to understand the code (after: none)\n"
+        "[CODE] fix the bug using replace_lines (after: 1)\n\n"
+        
+        "### EXAMPLE 5: Independent steps ###\n"
+        "Request: 'Compare FastAPI and Flask, then write a comparison of my app.py options'\n"
+        "Plan:\n"
+        "[RESEARCH] search FastAPI features and performance (after: none)\n"
+        "[RESEARCH] search Flask features and performance (after: none)\n"
+        "[READ] read app.py to see the current framework usage (after: none)\n"
+        "[CODE] write comparison.md using the research and app.py (after: 1, 2, 3)\n\n"
         
         "### RULES ###\n"
         f"- Max {MAX_PLAN_STEPS} steps\n"
         "- One tag per line\n"
+        "- Independent steps run in parallel: only declare the dependencies you really need\n"
+        "- Creating several files is ONE [CODE] step (write_files), not one step per file\n"
         "- Be specific about WHAT each step does\n"
     ))
     
-    msg_payload = [
+    return [
         system_msg,
         HumanMessage(content=f"Create a plan for: {user_request}")
     ]
-    
-    response = llm.invoke(msg_payload)
-    plan_text = response.content
-    
+
+
+def _plan_from_response(user_request: str, plan_text: str) -> dict:
     # --- 4. PARSING DU PLAN EN STEPS ---
-    steps = []
-    for line in plan_text.split("\n"):
-        line = line.strip()
-        match = re.match(r'\[?(RESEARCH|CODE|READ)\]?\s*(.*)', line, re.IGNORECASE)
-        if match:
-            tag = match.group(1).upper()
-            detail = match.group(2).strip()
-            if detail:  # Skip empty steps
-                steps.append(f"{tag}:{detail}")
+    steps, deps = _parse_steps(plan_text)
 
     # Fallback si le LLM n'a pas suivi le format
     if not steps:
@@ -154,22 +221,52 @@ def planner_node(state: DevState):
             steps = [f"READ:{user_request}", f"CODE:complete the task based on what was read"]
         else:
             steps = [f"CODE:{user_request}"]
+        deps = default_step_deps(steps)
         
-    logger.debug(f"📋 Steps parsées : {steps}")
+    logger.debug(f"📋 Steps parsées : {steps} (deps: {deps})")
     
     # --- 5. CONSTRUCTION DU RÉSULTAT ---
     result = {
         "plan": plan_text,
         "plan_steps": steps,
+        "step_deps": deps,
         "current_step": 0,
         "step_type": steps[0].split(":")[0].lower() if steps else "code"
     }
 
     # --- 6. SAUVEGARDE ET RETOUR ---
+    cache_key = user_request.strip().lower()
     plan_cache.set(cache_key, result)
+    plan_index.add(cache_key, result)
     return result
 
 
+def planner_node(state: DevState):
+    user_request = _get_user_request(state)
+    shortcut = _plan_without_llm(state, user_request)
+    if shortcut:
+        return shortcut
+
+    # --- 3. GÉNÉRATION DU PLAN ---
+    logger.info(f"🗺️ PLANNER : Élaboration du plan technique pour '{user_request[:50]}...'")
+    llm = get_llm()
+    response = cached_invoke(llm, _planner_prompt(user_request))
+    return _plan_from_response(user_request, response.content)
+
+
+async def aplanner_node(state: DevState):
+    """Version async de planner_node."""
+    user_request = _get_user_request(state)
+    shortcut = _plan_without_llm(state, user_request)
+    if shortcut:
+        return shortcut
+
+    logger.info(f"🗺️ PLANNER : Élaboration du plan technique pour '{user_request[:50]}...'")
+    llm = get_llm()
+    response = await acached_invoke(llm, _planner_prompt(user_request))
+    return _plan_from_response(user_request, response.content)
+
+
 def should_plan(state: DevState) -> bool:
     msg = state["messages"][-1]
     if not hasattr(msg, 'content'):
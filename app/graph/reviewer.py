@@ -10,18 +10,27 @@ logger = get_logger("reviewer")
 
 
 
-def reviewer_node(state: DevState):
-    logger.info("\n🧐 REVIEWER : Vérification du code...")
-    
-    messages = state["messages"]
-    last_message = messages[-1]
-    
-    # Sécurité : Si pas d'appel d'outil, on valide par défaut
-    if not hasattr(last_message, 'tool_calls') or not last_message.tool_calls:
-        return {"review_feedback": None, "code_quality_score": 10}
+def _check_file_content(content: str) -> str | None:
+    """Garde-fous du contenu d'un fichier à écrire. Retourne le motif de rejet ou None."""
+    # 1. Check de taille
+    if len(content) < MIN_FILE_CONTENT_LENGTH:
+        return f"REJECTED: Content too short ({len(content)} chars)."
+
+    # 2. Check de format (JSON dans string)
+    if content.strip().startswith("{") and "class" in content:
+        return (
+            "REJECTED: You wrapped the Python code inside a JSON object (starts with '{'). "
+            "Send ONLY the raw Python code string. Do not wrap it."
+        )
+
+    # 3. Check de snippet ($1)
+    if "$1" in content or "${1" in content:
+        return "REJECTED: You used snippet placeholders like '$1'. Use valid Python syntax."
+    return None
+
 
-    # Récupération propre
-    tool_call = last_message.tool_calls[0]
+def _review_call(tool_call: dict) -> str | None:
+    """Vérifie UN appel d'outil (corrige son nom en place si besoin). Retourne l'erreur ou None."""
     tool_name = tool_call["name"]
     args = tool_call["args"]
 
@@ -34,7 +43,7 @@ def reviewer_node(state: DevState):
         if corrected:
             logger.warning(f"🔧 REVIEWER : Auto-correction '{tool_name}' → '{corrected}'")
             # Modifier le tool_call in-place pour que le ToolNode reçoive le bon nom
-            last_message.tool_calls[0]["name"] = corrected
+            tool_call["name"] = corrected
             tool_name = corrected
         else:
             error_msg = (
@@ -42,38 +51,61 @@ def reviewer_node(state: DevState):
                 f"Valid tools: {', '.join(sorted(VALID_TOOLS))}"
             )
             logger.error(f"❌ REVIEWER: {error_msg}")
-            return {"review_feedback": error_msg, "code_quality_score": 0}
+            return error_msg
 
     # ═══ PASS-DROIT POUR LES OUTILS SAFE ═══
     if tool_name in SAFE_TOOLS_NO_REVIEW:
         logger.info(f"✅ REVIEWER : Outil '{tool_name}' autorisé sans review.")
-        return {"code_quality_score": 10, "review_feedback": None}
+        return None
 
-    # ═══ GUARDRAILS HARDCODED pour write_file ═══
+    # ═══ GUARDRAILS HARDCODED pour write_file / write_files ═══
     if tool_name == "write_file":
-        content = args.get("content", "")
-        
-        # 1. Check de taille
-        if len(content) < MIN_FILE_CONTENT_LENGTH: 
-            error_msg = f"REJECTED: Content too short ({len(content)} chars)."
+        error_msg = _check_file_content(args.get("content", ""))
+        if error_msg:
             logger.error(f"❌ REVIEWER (Auto): {error_msg}")
-            return {"review_feedback": error_msg, "code_quality_score": 0}
+            return error_msg
 
-        # 2. Check de format (JSON dans string)
-        if content.strip().startswith("{") and "class" in content:
-            error_msg = (
-                "REJECTED: You wrapped the Python code inside a JSON object (starts with '{'). "
-                "Send ONLY the raw Python code string. Do not wrap it."
-            )
+    if tool_name == "write_files":
+        files = args.get("files")
+        if not isinstance(files, list) or not files:
+            error_msg = "REJECTED: write_files needs a non-empty 'files' list of {file_path, content}."
             logger.error(f"❌ REVIEWER (Auto): {error_msg}")
-            return {"review_feedback": error_msg, "code_quality_score": 0}
+            return error_msg
+        for i, entry in enumerate(files):
+            if not isinstance(entry, dict):
+                error_msg = f"REJECTED: files[{i}] must be an object {{file_path, content}}."
+            else:
+                path = entry.get("file_path") or entry.get("path") or "?"
+                error_msg = _check_file_content(entry.get("content", ""))
+                if error_msg:
+                    error_msg = f"{error_msg} (files[{i}]: {path})"
+            if error_msg:
+                logger.error(f"❌ REVIEWER (Auto): {error_msg}")
+                return error_msg
 
-        # 3. Check de snippet ($1)
-        if "$1" in content or "${1" in content:
-            error_msg = "REJECTED: You used snippet placeholders like '$1'. Use valid Python syntax."
-            logger.error(f"❌ REVIEWER (Auto): {error_msg}")
+    logger.info(f"✅ Code Validé ('{tool_name}' - no LLM review needed).")
+    return None
+
+
+def reviewer_node(state: DevState):
+    logger.info("\n🧐 REVIEWER : Vérification du code...")
+    
+    messages = state["messages"]
+    last_message = messages[-1]
+    
+    # Sécurité : Si pas d'appel d'outil, on valide par défaut
+    if not hasattr(last_message, 'tool_calls') or not last_message.tool_calls:
+        return {"review_feedback": None, "code_quality_score": 10}
+
+    # Chaque appel est vérifié : un seul rejet rejette le tour entier
+    # (le ToolNode exécute tous les appels d'un message ou aucun)
+    tool_calls = last_message.tool_calls
+    for i, tool_call in enumerate(tool_calls):
+        error_msg = _review_call(tool_call)
+        if error_msg:
+            if len(tool_calls) > 1:
+                error_msg = f"Tool call {i + 1}/{len(tool_calls)} ({tool_call['name']}): {error_msg}"
             return {"review_feedback": error_msg, "code_quality_score": 0}
 
     # ═══ APPROUVÉ ═══
-    logger.info(f"✅ Code Validé ('{tool_name}' - no LLM review needed).")
-    return {"review_feedback": None, "code_quality_score": 10}
\ No newline at end of file
+    return {"review_feedback": None, "code_quality_score": 10}
@@ -1,98 +1,212 @@
 # app/llm/ollama_client.py
+import asyncio
+import threading
+import httpx
 from langchain_ollama import ChatOllama
 from langchain_openai import ChatOpenAI  # <--- On remplace Google par OpenAI (standard OpenRouter)
 from app.config import (
     MODEL_NAME, MODEL_TEMPERATURE, OLLAMA_BASE_URL, MODEL_KEEP_ALIVE,
-    OPEN_API_KEY, OPEN_MODEL, LLM_PROVIDER
+    OPEN_API_KEY, OPEN_MODEL, LLM_PROVIDER,
+    LLM_REQUEST_TIMEOUT, LLM_POOL_MAX_CONNECTIONS, LLM_POOL_MAX_KEEPALIVE, LLM_POOL_KEEPALIVE_EXPIRY,
 )
 from app.logger import get_logger
+from app.utils.http_stats import ConnectionStats
 
 logger = get_logger("llm_client")
 
-def _get_openrouter(model_name=None, temperature=MODEL_TEMPERATURE):
+OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
+OPENROUTER_HEADERS = {
+    "HTTP-Referer": "http://localhost:3000", # Requis par OpenRouter pour les stats
+    "X-Title": "DevAssistant"
+}
+
+
+# ============================================================
+# POOL DE CLIENTS (un client long-lived par configuration)
+# ============================================================
+# Clé : (provider, model, temperature, format) → instance ChatOpenAI / ChatOllama
+_CLIENTS: dict = {}
+_CLIENTS_LOCK = threading.Lock()
+
+_STATS = ConnectionStats(
+    "pool_hits",    # get_llm*() servi depuis le registre
+    "pool_misses",  # nouveau client construit
+)
+
+
+def _pool_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=LLM_POOL_MAX_CONNECTIONS,
+        max_keepalive_connections=LLM_POOL_MAX_KEEPALIVE,
+        keepalive_expiry=LLM_POOL_KEEPALIVE_EXPIRY,
+    )
+
+
+def _sync_client_kwargs() -> dict:
+    return {"limits": _pool_limits(), "event_hooks": {"request": [_STATS.on_request]}}
+
+
+def _async_client_kwargs() -> dict:
+    return {"limits": _pool_limits(), "event_hooks": {"request": [_STATS.on_request_async]}}
+
+
+# Clients HTTP partagés par tous les modèles OpenRouter (même hôte → même pool keep-alive)
+_http_client = None
+_http_async_client = None
+_CLOSING: set = set()  # fermetures async en cours (reset_pool appelé depuis une coroutine)
+
+
+def _get_http_clients() -> tuple:
+    global _http_client, _http_async_client
+    if _http_client is None:
+        _http_client = httpx.Client(timeout=LLM_REQUEST_TIMEOUT, **_sync_client_kwargs())
+        _http_async_client = httpx.AsyncClient(timeout=LLM_REQUEST_TIMEOUT, **_async_client_kwargs())
+    return _http_client, _http_async_client
+
+
+def _get_or_create(key: tuple, factory):
+    """Retourne le client mémorisé pour `key`, ou le construit une seule fois."""
+    client = _CLIENTS.get(key)
+    if client is not None:
+        _STATS.incr("pool_hits")
+        return client
+
+    with _CLIENTS_LOCK:
+        client = _CLIENTS.get(key)
+        if client is None:
+            client = factory()
+            _CLIENTS[key] = client
+            _STATS.incr("pool_misses")
+            logger.debug(f"🆕 LLM pool : nouveau client {key}")
+            return client
+    _STATS.incr("pool_hits")
+    return client
+
+
+def get_pool_stats() -> dict:
+    """Compteurs du pool : hits/misses du registre et réutilisation des connexions HTTP."""
+    stats = _STATS.snapshot()
+    stats["clients"] = len(_CLIENTS)
+    return stats
+
+
+def reset_pool():
+    """Ferme les clients HTTP partagés et vide le registre (tests / rechargement de config)."""
+    global _http_client, _http_async_client
+    with _CLIENTS_LOCK:
+        _CLIENTS.clear()
+        if _http_client is not None:
+            _http_client.close()
+        if _http_async_client is not None:
+            _close_async_client(_http_async_client)
+        _http_client = None
+        _http_async_client = None
+
+
+def _close_async_client(client: httpx.AsyncClient):
+    """aclose() sur la loop courante si elle tourne (tâche planifiée), sinon dans une loop dédiée."""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        asyncio.run(client.aclose())
+        return
+    task = loop.create_task(client.aclose())
+    _CLOSING.add(task)  # référence forte jusqu'à la fin de la fermeture
+    task.add_done_callback(_CLOSING.discard)
+
+
+# ============================================================
+# FABRIQUES
+# ============================================================
+
+def _get_openrouter(model_name=None, temperature=MODEL_TEMPERATURE, json_mode=False):
     """Retourne un LLM via OpenRouter (compatible API OpenAI)."""
+    http_client, http_async_client = _get_http_clients()
+    extra = {}
+    if json_mode:
+        # OpenRouter (via OpenAI standard) utilise response_format={"type": "json_object"}
+        extra["model_kwargs"] = {"response_format": {"type": "json_object"}}
     return ChatOpenAI(
         model=model_name or OPEN_MODEL,
         temperature=temperature,
         api_key=OPEN_API_KEY,
-        base_url="https://openrouter.ai/api/v1", # <--- L'URL magique
-        request_timeout=60,
-        default_headers={
-            "HTTP-Referer": "http://localhost:3000", # Requis par OpenRouter pour les stats
-            "X-Title": "DevAssistant"
-        }
+        base_url=OPENROUTER_BASE_URL, # <--- L'URL magique
+        request_timeout=LLM_REQUEST_TIMEOUT,
+        default_headers=OPENROUTER_HEADERS,
+        http_client=http_client,
+        http_async_client=http_async_client,
+        **extra,
     )
 
-def _get_ollama(model_name=None, temperature=MODEL_TEMPERATURE):
-    """Retourne un LLM Ollama local."""
+def _get_ollama(model_name=None, temperature=MODEL_TEMPERATURE, json_mode=False):
+    """Retourne un LLM Ollama local (sortie JSON forcée si json_mode)."""
+    extra = {"format": "json"} if json_mode else {}
     return ChatOllama(
         model=model_name or MODEL_NAME,
         temperature=temperature,
         base_url=OLLAMA_BASE_URL,
         keep_alive=MODEL_KEEP_ALIVE,
-        timeout=60,
+        timeout=LLM_REQUEST_TIMEOUT,
+        sync_client_kwargs=_sync_client_kwargs(),
+        async_client_kwargs=_async_client_kwargs(),
+        **extra,
     )
 
-def _get_ollama_constrained(model_name=None, temperature=MODEL_TEMPERATURE, tool_names=None):
-    """Ollama avec sortie JSON forcée (votre logique existante)."""
-    if tool_names is None:
-        tool_names = [
-            "web_search", "fetch_web_page", "smart_web_fetch",
-            "write_file", "read_file_content", "replace_lines",
-            "list_project_structure", "run_terminal"
-        ]
-    return ChatOllama(
-        model=model_name or MODEL_NAME,
-        temperature=temperature,
-        base_url=OLLAMA_BASE_URL,
-        keep_alive=MODEL_KEEP_ALIVE,
-        timeout=60,
-        format="json" # Simplifié, ou gardez votre structure complexe si nécessaire
-    )
+
+def _use_remote() -> bool:
+    return bool((LLM_PROVIDER.lower() == "openrouter" or LLM_PROVIDER.lower() == "gemini") and OPEN_API_KEY)
+
+
+def current_model_name() -> str:
+    """Modèle utilisé par défaut par get_llm / get_llm_constrained (budget de contexte)."""
+    return OPEN_MODEL if _use_remote() else MODEL_NAME
+
 
 def get_llm(model_name=None, temperature=MODEL_TEMPERATURE):
     """
     Retourne le LLM configuré. OpenRouter par défaut si clé présente, sinon Ollama.
+    Les instances sont mémorisées par (provider, model, temperature, format).
     """
-    # On vérifie si on doit utiliser OpenRouter
-    use_remote = (LLM_PROVIDER.lower() == "openrouter" or LLM_PROVIDER.lower() == "gemini") and OPEN_API_KEY
-    
-    if use_remote:
+    if _use_remote():
+        model = model_name or OPEN_MODEL
         try:
-            llm = _get_openrouter(model_name, temperature)
-            logger.info(f"🌐 LLM : OpenRouter ({model_name or OPEN_MODEL})")
+            llm = _get_or_create(
+                ("openrouter", model, temperature, "text"),
+                lambda: _get_openrouter(model, temperature),
+            )
+            logger.info(f"🌐 LLM : OpenRouter ({model})")
             return llm
         except Exception as e:
             logger.warning(f"⚠️ OpenRouter indisponible ({e}), fallback Ollama...")
-    
-    logger.info(f"🏠 LLM : Ollama ({model_name or MODEL_NAME})")
-    return _get_ollama(model_name, temperature, request_timeout=60)
+
+    model = model_name or MODEL_NAME
+    logger.info(f"🏠 LLM : Ollama ({model})")
+    return _get_or_create(
+        ("ollama", model, temperature, "text"),
+        lambda: _get_ollama(model, temperature),
+    )
 
 
 def get_llm_constrained(model_name=None, temperature=MODEL_TEMPERATURE, tool_names=None):
     """
     LLM avec sortie JSON contrainte.
+    `tool_names` n'influence pas le format (JSON libre) : il ne fait donc pas partie de la clé.
     """
-    use_remote = (LLM_PROVIDER.lower() == "openrouter" or LLM_PROVIDER.lower() == "gemini") and OPEN_API_KEY
-
-    if use_remote:
+    if _use_remote():
+        model = model_name or OPEN_MODEL
         try:
-            # OpenRouter (via OpenAI standard) utilise response_format={"type": "json_object"}
-            llm = ChatOpenAI(
-                model=model_name or OPEN_MODEL,
-                temperature=temperature,
-                api_key=OPEN_API_KEY,
-                base_url="https://openrouter.ai/api/v1",
-                model_kwargs={"response_format": {"type": "json_object"}},
-                default_headers={
-                    "HTTP-Referer": "http://localhost:3000",
-                    "X-Title": "DevAssistant"
-                }
+            llm = _get_or_create(
+                ("openrouter", model, temperature, "json"),
+                lambda: _get_openrouter(model, temperature, json_mode=True),
             )
-            logger.info(f"🌐 LLM contraint : OpenRouter ({model_name or OPEN_MODEL})")
+            logger.info(f"🌐 LLM contraint : OpenRouter ({model})")
             return llm
         except Exception as e:
             logger.warning(f"⚠️ OpenRouter contraint indisponible ({e}), fallback Ollama...")
-    
-    logger.info(f"🏠 LLM contraint : Ollama ({model_name or MODEL_NAME})")
-    return _get_ollama_constrained(model_name, temperature, tool_names)
\ No newline at end of file
+
+    model = model_name or MODEL_NAME
+    logger.info(f"🏠 LLM contraint : Ollama ({model})")
+    return _get_or_create(
+        ("ollama", model, temperature, "json"),
+        lambda: _get_ollama(model, temperature, json_mode=True),
+    )
@@ -0,0 +1,145 @@
+# app/llm/response_cache.py
+import hashlib
+import json
+import threading
+import time
+from pathlib import Path
+from langchain_core.messages import AIMessage
+from app.config import (
+    LLM_CACHE_ENABLED, LLM_CACHE_PATH, LLM_CACHE_TTL, LLM_CACHE_MAX_BYTES, LLM_CACHE_MAX_TEMPERATURE,
+)
+from app.logger import get_logger
+from app.utils.sqlite_store import SQLiteLRUStore
+
+logger = get_logger("llm_cache")
+
+
+class ResponseCache(SQLiteLRUStore):
+    """
+    Cache persistant (SQLite) des réponses LLM.
+    Clé = hash stable de (modèle, température, format, messages). TTL à la lecture,
+    éviction LRU et budget en octets gérés par SQLiteLRUStore.
+    """
+
+    table = "responses"
+    key_column = "key"
+    columns = "content TEXT NOT NULL, created REAL NOT NULL"
+
+    def __init__(self, path: Path, ttl: int = LLM_CACHE_TTL, max_bytes: int = LLM_CACHE_MAX_BYTES):
+        super().__init__(path, max_bytes, counters=("hits", "misses", "expired"))
+        self.ttl = ttl
+
+    @staticmethod
+    def _messages_payload(messages: list) -> list:
+        """
+        Un AIMessage d'appel d'outil a un content vide : ce qui le distingue, ce sont ses
+        tool_calls (nom + args). Les ToolMessages gardent leur tool_call_id et leur name.
+        Les identifiants d'appel (horodatés) sont remplacés par leur rang dans l'historique :
+        l'appariement appel/résultat compte, pas la valeur de l'identifiant.
+        """
+        ranks: dict[str, int] = {}
+        payload = []
+        for m in messages:
+            tool_calls = []
+            for call in getattr(m, "tool_calls", None) or []:
+                rank = ranks.setdefault(call.get("id") or f"#{len(ranks)}", len(ranks))
+                tool_calls.append([call.get("name"), call.get("args"), rank])
+            call_id = getattr(m, "tool_call_id", None)
+            payload.append([m.type, m.content, tool_calls,
+                            ranks.get(call_id, call_id), getattr(m, "name", None)])
+        return payload
+
+    @classmethod
+    def make_key(cls, identity: tuple, messages: list) -> str:
+        payload = {
+            "llm": list(identity),
+            "messages": cls._messages_payload(messages),
+        }
+        raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> str | None:
+        now = time.time()
+        with self._lock:
+            row = self._select(key, "content, created, size")
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            content, created, size = row
+            if now - created >= self.ttl:
+                self._delete(key, size)
+                self.stats["expired"] += 1
+                self.stats["misses"] += 1
+                return None
+            self._mark_used(key, now)
+            self.stats["hits"] += 1
+            return content
+
+    def set(self, key: str, content: str):
+        now = time.time()
+        with self._lock:
+            self._write(key, len(content.encode("utf-8")), now, content=content, created=now)
+
+
+_cache: ResponseCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache | None:
+    """Instance partagée, ou None si le cache est désactivé (LLM_CACHE_ENABLED)."""
+    global _cache
+    if not LLM_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache(LLM_CACHE_PATH)
+    return _cache
+
+
+def _llm_identity(llm) -> tuple:
+    model = getattr(llm, "model_name", None) or getattr(llm, "model", None)
+    temperature = getattr(llm, "temperature", None)
+    fmt = getattr(llm, "format", None) or (getattr(llm, "model_kwargs", None) or {}).get("response_format")
+    return (type(llm).__name__, model, temperature, fmt)
+
+
+def _cache_key(llm, messages: list) -> tuple[ResponseCache | None, str | None]:
+    cache = get_response_cache()
+    if cache is None:
+        return None, None
+    identity = _llm_identity(llm)
+    # Seules les réponses déterministes sont rejouables
+    if identity[2] is None or identity[2] > LLM_CACHE_MAX_TEMPERATURE:
+        return None, None
+    return cache, cache.make_key(identity, messages)
+
+
+def cached_invoke(llm, messages: list):
+    """llm.invoke(messages) avec lecture/écriture du cache de réponses."""
+    cache, key = _cache_key(llm, messages)
+    if cache is not None:
+        content = cache.get(key)
+        if content is not None:
+            logger.debug(f"♻️ LLM CACHE HIT ({key[:10]})")
+            return AIMessage(content=content)
+
+    response = llm.invoke(messages)
+    if cache is not None and isinstance(response.content, str) and response.content:
+        cache.set(key, response.content)
+    return response
+
+
+async def acached_invoke(llm, messages: list):
+    """Version async de cached_invoke (les accès SQLite sont sub-millisecondes)."""
+    cache, key = _cache_key(llm, messages)
+    if cache is not None:
+        content = cache.get(key)
+        if content is not None:
+            logger.debug(f"♻️ LLM CACHE HIT ({key[:10]})")
+            return AIMessage(content=content)
+
+    response = await llm.ainvoke(messages)
+    if cache is not None and isinstance(response.content, str) and response.content:
+        cache.set(key, response.content)
+    return response
@@ -53,23 +53,47 @@ class RobustParser:
         # ÉTAPE 4 : Validation Stricte (Pydantic)
         # C'est ici qu'on vérifie que les args sont cohérents
         try:
-            valid_tool = ToolCall(**normalized)
-            return valid_tool.model_dump()
+            calls = [ToolCall(**call).model_dump() for call in normalized.get("calls", [normalized])]
         except ValidationError as e:
             # Si le LLM a oublié des arguments obligatoires, on renvoie une erreur expliquée
             # C'est utile pour le mécanisme de Retry
             return {"error": f"Validation Error: {e}", "raw": text}
 
+        # "tool"/"args" = premier appel (compatibilité), "calls" = tous les appels si plusieurs
+        result = dict(calls[0])
+        if len(calls) > 1:
+            result["calls"] = calls
+        return result
+
     def _normalize(self, data: Any) -> Dict[str, Any]:
         """Transforme les dialectes (OpenAI, Trinity...) en standard interne."""
+        # Plusieurs appels : [{...}, {...}] ou {"tool_calls": [{...}, {...}]}
+        if isinstance(data, dict):
+            for key in ("tool_calls", "calls", "tools"):
+                if isinstance(data.get(key), list):
+                    data = data[key]
+                    break
+
         if isinstance(data, list):
-            # Parfois le LLM renvoie une liste de tools, on prend le premier
-            if data: data = data[0]
-            else: raise ValueError("Empty list")
-            
+            calls = []
+            for item in data:
+                try:
+                    normalized = self._normalize(item)
+                except ValueError:
+                    continue
+                if "answer" not in normalized:
+                    calls.extend(normalized.get("calls", [normalized]))
+            if not calls:
+                raise ValueError("No tool call in list")
+            return calls[0] if len(calls) == 1 else {**calls[0], "calls": calls}
+
         if not isinstance(data, dict):
             raise ValueError("Not a dictionary")
 
+        # Dialecte OpenAI : {"type": "function", "function": {"name": ..., "arguments": ...}}
+        if isinstance(data.get("function"), dict):
+            data = data["function"]
+
         normalized = {}
 
         # MAPPING DES CLÉS (Extensible)
@@ -3,6 +3,14 @@ from typing import Annotated, TypedDict, List, Optional
 from langchain_core.messages import BaseMessage
 from langgraph.graph.message import add_messages
 
+
+def merge_parallel_results(left: list, right: list | None) -> list:
+    """Reducer : les branches parallèles ajoutent leurs résultats, None vide la liste."""
+    if right is None:
+        return []
+    return (left or []) + right
+
+
 class DevState(TypedDict):
     # --- CHAMPS EXISTANTS (On les garde) ---
     messages: Annotated[List[BaseMessage], add_messages]
@@ -29,6 +37,13 @@ class DevState(TypedDict):
     plan_steps: list                  # Liste des étapes parsées ["SEARCH:query", "FETCH", "CODE:description"]
     current_step: int                 # Index de l'étape en cours
     step_type: Optional[str]  
+    iteration_count: int              # Garde-fou global (MAX_ITERATIONS)
+
+    # 5. Pour l'EXÉCUTION PARALLÈLE
+    step_deps: list                   # Dépendances par étape (indices 0-based), émises par le planner
+    parallel_batch: list              # Indices des étapes lancées en parallèle par le dispatcher
+    parallel_results: Annotated[list, merge_parallel_results]  # [{"step": i, "messages": [...], "requeue": bool}]
+    sequential_steps: list            # Étapes à rejouer seules (une branche a voulu écrire)
 
 def make_initial_state(messages, root_dir: str = "", **overrides) -> dict:
     """Crée un état initial avec des valeurs par défaut saines."""
@@ -46,6 +61,11 @@ def make_initial_state(messages, root_dir: str = "", **overrides) -> dict:
         "plan_steps": [],
         "current_step": 0,
         "step_type": None,
+        "iteration_count": 0,
+        "step_deps": [],
+        "parallel_batch": [],
+        "parallel_results": [],
+        "sequential_steps": [],
     }
     defaults.update(overrides)
     return defaults
\ No newline at end of file
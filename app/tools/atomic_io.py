@@ -0,0 +1,145 @@
+# app/tools/atomic_io.py
+import difflib
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from app.config import FILE_DIFF_CONTEXT, FILE_DIFF_MAX_LINES
+
+# (chemin, mtime_ns, taille) → empreinte : évite de relire un fichier qu'on vient d'écrire
+_DIGESTS: OrderedDict = OrderedDict()
+_DIGESTS_MAX = 512
+_LOCK = threading.Lock()
+
+
+def _digest(data: bytes) -> bytes:
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def _stat_key(path: Path, st: os.stat_result) -> tuple:
+    return str(path), st.st_mtime_ns, st.st_size
+
+
+def _remember(key: tuple, digest: bytes):
+    with _LOCK:
+        _DIGESTS[key] = digest
+        _DIGESTS.move_to_end(key)
+        while len(_DIGESTS) > _DIGESTS_MAX:
+            _DIGESTS.popitem(last=False)
+
+
+def file_digest(path: Path) -> bytes:
+    st = os.stat(path)
+    key = _stat_key(path, st)
+    with _LOCK:
+        digest = _DIGESTS.get(key)
+    if digest is None:
+        h = hashlib.blake2b(digest_size=16)
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        digest = h.digest()
+        _remember(key, digest)
+    return digest
+
+
+def is_unchanged(path: Path, data: bytes) -> bool:
+    """Le fichier contient-il déjà exactement `data` ? (taille d'abord, empreinte ensuite)"""
+    try:
+        if os.stat(path).st_size != len(data):
+            return False
+        return file_digest(path) == _digest(data)
+    except OSError:
+        return False
+
+
+def write_atomic(path: Path, content: str | bytes) -> bool:
+    """
+    Écrit via un fichier temporaire du même dossier + fsync + os.replace : un crash laisse
+    l'ancienne ou la nouvelle version, jamais un fichier tronqué. Les permissions existantes
+    sont conservées. Retourne False (sans rien écrire) si le contenu est identique.
+    """
+    path = Path(path)
+    data = content.encode("utf-8") if isinstance(content, str) else content
+    if is_unchanged(path, data):
+        return False
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            os.chmod(tmp, os.stat(path).st_mode & 0o7777)
+        except FileNotFoundError:
+            os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+    _fsync_dir(path.parent)
+    _remember(_stat_key(path, os.stat(path)), _digest(data))
+    return True
+
+
+def _fsync_dir(directory: Path):
+    # Rend le rename durable (POSIX) ; sans objet sous Windows
+    if os.name != "posix":
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+# ============================================================
+# DIFF
+# ============================================================
+
+def unified_diff(old: str, new: str, name: str, context: int = FILE_DIFF_CONTEXT,
+                 max_lines: int = FILE_DIFF_MAX_LINES) -> tuple[str, int, int]:
+    """
+    Diff unifié compact → (texte, lignes ajoutées, lignes supprimées).
+    Préfixe et suffixe communs sont écartés avant difflib : modifier 3 lignes d'un fichier
+    de 10 000 lignes ne compare que ces lignes (plus le contexte).
+    """
+    a, b = old.splitlines(), new.splitlines()
+    prefix = 0
+    limit = min(len(a), len(b))
+    while prefix < limit and a[prefix] == b[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and a[-1 - suffix] == b[-1 - suffix]:
+        suffix += 1
+
+    lo = max(prefix - context, 0)
+    a_mid = a[lo:len(a) - max(suffix - context, 0)]
+    b_mid = b[lo:len(b) - max(suffix - context, 0)]
+
+    out = [f"--- a/{name}", f"+++ b/{name}"]
+    added = removed = 0
+    matcher = difflib.SequenceMatcher(None, a_mid, b_mid, autojunk=False)
+    for group in matcher.get_grouped_opcodes(context):
+        i1, i2, j1, j2 = group[0][1], group[-1][2], group[0][3], group[-1][4]
+        out.append(f"@@ -{lo + i1 + 1},{i2 - i1} +{lo + j1 + 1},{j2 - j1} @@")
+        for tag, x1, x2, y1, y2 in group:
+            if tag == "equal":
+                out.extend(" " + line for line in a_mid[x1:x2])
+                continue
+            if tag in ("replace", "delete"):
+                out.extend("-" + line for line in a_mid[x1:x2])
+                removed += x2 - x1
+            if tag in ("replace", "insert"):
+                out.extend("+" + line for line in b_mid[y1:y2])
+                added += y2 - y1
+    if old.endswith("\n") != new.endswith("\n") and old and new:
+        out.append("\\ No newline at end of file")
+
+    if len(out) > max_lines + 2:
+        hidden = len(out) - max_lines - 2
+        out = out[:max_lines + 2] + [f"... ({hidden} more diff lines)"]
+    return "\n".join(out), added, removed
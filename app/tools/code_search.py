@@ -0,0 +1,311 @@
+# app/tools/code_search.py
+import re
+import threading
+from array import array
+from pathlib import Path
+import numpy as np
+from app.config import CODE_SEARCH_MAX_FILE_BYTES, CODE_SEARCH_MAX_CHARS, CODE_SEARCH_HITS_PER_FILE
+from app.logger import get_logger
+from app.tools.file_index import FileIndex
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+logger = get_logger("code_search")
+
+# Lignes de définition : un hit dessus compte plus (la définition est souvent ce qu'on cherche)
+_DEFINITION_RE = re.compile(
+    r"^\s*(?:export\s+)?(?:async\s+)?(?:def|class|function|interface|type|struct|enum|fn|func|const|let|var)\b"
+)
+
+
+# ============================================================
+# TRIGRAMMES
+# ============================================================
+
+def _trigrams(data: bytes) -> np.ndarray:
+    """Trigrammes distincts (octets consécutifs empaquetés en uint32), triés."""
+    if len(data) < 3:
+        return np.empty(0, dtype=np.uint32)
+    b = np.frombuffer(data, dtype=np.uint8).astype(np.uint32)
+    return np.unique((b[:-2] << 16) | (b[1:-1] << 8) | b[2:])
+
+
+def _literal_runs(parsed) -> list[str]:
+    """
+    Littéraux qu'une correspondance de la regex contient forcément : suites de caractères
+    du niveau séquence (groupes simples compris). Alternatives, classes, répétitions
+    coupent la suite — on reste correct, simplement moins sélectif.
+    """
+    runs, current = [], []
+
+    def flush():
+        if current:
+            runs.append("".join(current))
+            current.clear()
+
+    for op, arg in parsed:
+        if op is sre_parse.LITERAL:
+            current.append(chr(arg))
+        elif op is sre_parse.SUBPATTERN:
+            flush()
+            runs.extend(_literal_runs(arg[-1]))
+        elif op is sre_parse.AT:
+            continue  # ^, $, \b : largeur nulle, n'interrompt pas la suite
+        else:
+            flush()
+    flush()
+    return runs
+
+
+def _required_literals(query: str, is_regex: bool) -> list[str]:
+    if not is_regex:
+        return [query]
+    try:
+        return _literal_runs(sre_parse.parse(query))
+    except Exception:
+        return []
+
+
+def _query_trigrams(literals: list[str]) -> np.ndarray:
+    grams = [_trigrams(lit.lower().encode("utf-8")) for lit in literals]
+    grams = [g for g in grams if g.size]
+    return np.unique(np.concatenate(grams)) if grams else np.empty(0, dtype=np.uint32)
+
+
+# ============================================================
+# INDEX INVERSÉ
+# ============================================================
+
+class CodeSearchIndex:
+    """
+    Index trigrammes (insensible à la casse) des fichiers texte d'un sandbox.
+
+    - Postings : trigramme → array('I') d'identifiants de documents, triés (un document
+      ré-indexé reçoit un nouvel identifiant, plus grand ; l'ancien devient une tombe).
+    - Construction en lot avec NumPy (tri des couples trigramme/doc), puis mises à jour
+      fichier par fichier via les évènements du FileIndex.
+    - Requête : intersection des postings des trigrammes obligatoires, puis vérification
+      ligne à ligne des seuls candidats. Sans trigramme exploitable (requête < 3 caractères),
+      tous les fichiers sont candidats.
+    """
+
+    def __init__(self, file_index: FileIndex):
+        self.files = file_index
+        self.root = file_index.root
+        self._postings: dict[int, array] = {}
+        self._docs: list[str | None] = []   # id → chemin relatif (None = supprimé)
+        self._ids: dict[str, int] = {}      # chemin relatif → id vivant
+        self._dead = 0
+        self._built = False
+        self._lock = threading.RLock()
+        file_index.add_listener(self._on_change)
+
+    # ── indexation ──
+
+    def _read(self, rel: str) -> bytes | None:
+        try:
+            data = (self.root / rel).read_bytes()
+        except OSError:
+            return None
+        if len(data) > CODE_SEARCH_MAX_FILE_BYTES or b"\0" in data[:8192]:
+            return None  # trop gros ou binaire
+        return data
+
+    @staticmethod
+    def _fold(data: bytes) -> bytes:
+        return data.decode("utf-8", errors="replace").lower().encode("utf-8")
+
+    def _build(self):
+        docs, gram_chunks, id_chunks = [], [], []
+        for rel, size in self.files.iter_files():
+            if size > CODE_SEARCH_MAX_FILE_BYTES:
+                continue
+            data = self._read(rel)
+            if data is None:
+                continue
+            grams = _trigrams(self._fold(data))
+            gram_chunks.append(grams)
+            id_chunks.append(np.full(grams.size, len(docs), dtype=np.uint32))
+            docs.append(rel)
+
+        postings = {}
+        if gram_chunks:
+            grams = np.concatenate(gram_chunks)
+            ids = np.concatenate(id_chunks)
+            order = np.argsort(grams, kind="stable")  # stable : ids croissants par trigramme
+            grams, ids = grams[order], ids[order]
+            bounds = np.flatnonzero(np.diff(grams)) + 1
+            starts = np.concatenate(([0], bounds))
+            ends = np.concatenate((bounds, [grams.size]))
+            for gram, start, end in zip(grams[starts].tolist(), starts.tolist(), ends.tolist()):
+                posting = array("I")
+                posting.frombytes(ids[start:end].tobytes())
+                postings[gram] = posting
+
+        self._postings = postings
+        self._docs = docs
+        self._ids = {rel: i for i, rel in enumerate(docs)}
+        self._dead = 0
+        self._built = True
+        logger.info(f"🔎 Index de code construit : {len(docs)} fichiers, {len(postings)} trigrammes")
+
+    def _add(self, rel: str):
+        self._remove(rel)
+        data = self._read(rel)
+        if data is None:
+            return
+        doc_id = len(self._docs)
+        self._docs.append(rel)
+        self._ids[rel] = doc_id
+        for gram in _trigrams(self._fold(data)).tolist():
+            posting = self._postings.get(gram)
+            if posting is None:
+                posting = self._postings[gram] = array("I")
+            posting.append(doc_id)
+
+    def _remove(self, rel: str):
+        doc_id = self._ids.pop(rel, None)
+        if doc_id is not None:
+            self._docs[doc_id] = None
+            self._dead += 1
+
+    def _compact(self):
+        """Retire les tombes des postings quand elles dominent (ré-éditions répétées)."""
+        alive = np.array([d is not None for d in self._docs], dtype=bool)
+        for gram, posting in list(self._postings.items()):
+            ids = np.frombuffer(posting.tobytes(), dtype=np.uint32)
+            kept = ids[alive[ids]]
+            if kept.size:
+                posting = array("I")
+                posting.frombytes(kept.tobytes())
+                self._postings[gram] = posting
+            else:
+                del self._postings[gram]
+        self._dead = 0
+
+    def _on_change(self, rel: str):
+        with self._lock:
+            if not self._built:
+                return
+            if not rel:
+                self._built = False  # arbre reconstruit : on ré-indexera à la prochaine requête
+                return
+            path = self.root / rel
+            if path.is_file():
+                self._add(rel)
+            else:
+                prefix = rel + "/"
+                for old in [r for r in self._ids if r == rel or r.startswith(prefix)]:
+                    self._remove(old)
+                if path.is_dir():
+                    for child, _ in self.files.iter_files(rel):
+                        self._add(child)
+            if self._dead > 1000 and self._dead > len(self._ids):
+                self._compact()
+
+    # ── recherche ──
+
+    def candidates(self, query: str, is_regex: bool) -> list[str]:
+        grams = _query_trigrams(_required_literals(query, is_regex))
+        with self._lock:
+            if not self._built:
+                self._build()
+            if grams.size == 0:
+                return [rel for rel in self._docs if rel is not None]
+            postings = []
+            for gram in grams.tolist():
+                posting = self._postings.get(gram)
+                if posting is None:
+                    return []
+                postings.append(posting)
+            postings.sort(key=len)
+            ids = np.frombuffer(postings[0].tobytes(), dtype=np.uint32)
+            for posting in postings[1:]:
+                ids = np.intersect1d(ids, np.frombuffer(posting.tobytes(), dtype=np.uint32), assume_unique=True)
+                if ids.size == 0:
+                    return []
+            return [rel for rel in (self._docs[i] for i in ids.tolist()) if rel is not None]
+
+    def search(self, query: str, is_regex: bool = False, path: str = "", case_sensitive: bool = False,
+               context: int = 1) -> tuple[list[dict], int]:
+        """Retourne (fichiers classés avec leurs lignes, nombre total de lignes trouvées)."""
+        flags = 0 if case_sensitive else re.IGNORECASE
+        pattern = re.compile(query if is_regex else re.escape(query), flags)
+        prefix = path.strip("/")
+        lowered = query.lower()
+
+        results, total = [], 0
+        for rel in self.candidates(query, is_regex):
+            if prefix and rel != prefix and not rel.startswith(prefix + "/"):
+                continue
+            data = self._read(rel)
+            if data is None:
+                continue
+            lines = data.decode("utf-8", errors="replace").splitlines()
+            hits = [i for i, line in enumerate(lines) if pattern.search(line)]
+            if not hits:
+                continue
+            total += len(hits)
+            score = sum(3 if _DEFINITION_RE.match(lines[i]) else 1 for i in hits)
+            if not is_regex and lowered in rel.lower():
+                score += 5
+            results.append({"path": rel, "score": score, "hits": hits, "lines": lines, "context": context})
+        results.sort(key=lambda r: (-r["score"], r["path"]))
+        return results, total
+
+
+def format_results(results: list[dict], total: int, budget: int = CODE_SEARCH_MAX_CHARS) -> str:
+    """Sortie façon grep (`n:` ligne trouvée, `n-` contexte), tronquée au budget de caractères."""
+    out, used, shown_files, shown_hits = [], 0, 0, 0
+    for result in results:
+        lines, context = result["lines"], max(0, result["context"])
+        hits = result["hits"][:CODE_SEARCH_HITS_PER_FILE]
+        count = len(result["hits"])
+        block = [f"{result['path']} ({count} hit{'s' if count > 1 else ''})"]
+        last = -1
+        for hit in hits:
+            start = max(hit - context, last + 1)
+            if last >= 0 and start > last + 1:
+                block.append("  --")
+            for i in range(start, min(hit + context, len(lines) - 1) + 1):
+                marker = ":" if i == hit or i in hits else "-"
+                block.append(f"  {i + 1}{marker} {lines[i][:200]}")
+                last = i
+        if len(result["hits"]) > len(hits):
+            block.append(f"  ... {len(result['hits']) - len(hits)} more hits in this file")
+        text = "\n".join(block)
+        if out and used + len(text) > budget:
+            break
+        out.append(text)
+        used += len(text) + 1
+        shown_files += 1
+        shown_hits += len(result["hits"])
+    if shown_files < len(results):
+        out.append(f"[{total - shown_hits} more hits in {len(results) - shown_files} more files not shown — refine the query or use path=]")
+    return "\n".join(out)
+
+
+# ============================================================
+# REGISTRE (un index de code par racine de sandbox)
+# ============================================================
+_INDEXES: dict[str, CodeSearchIndex] = {}
+_LOCK = threading.Lock()
+
+
+def get_code_index(file_index: FileIndex) -> CodeSearchIndex:
+    key = str(file_index.root)
+    with _LOCK:
+        index = _INDEXES.get(key)
+        if index is None or index.files is not file_index:
+            # FileIndex recréé (sandbox nettoyé) : l'ancien index de code suivait l'ancien
+            index = _INDEXES[key] = CodeSearchIndex(file_index)
+        return index
+
+
+def discard_code_index(root: Path):
+    """Oublie l'index de code du sandbox (fermeture ou nettoyage de session)."""
+    with _LOCK:
+        _INDEXES.pop(str(root), None)
@@ -0,0 +1,173 @@
+# app/tools/command_cache.py
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from app.config import TERMINAL_CACHE_SIZE, TERMINAL_CACHE_TTL
+from app.logger import get_logger
+from app.tools.atomic_io import file_digest
+from app.tools.file_index import get_file_index
+
+logger = get_logger("terminal")
+
+# Lecture seule : la sortie ne dépend que des fichiers du sandbox
+READ_ONLY_COMMANDS = {
+    "ls", "cat", "head", "tail", "wc", "grep", "egrep", "fgrep", "find", "du",
+    "diff", "cmp", "md5sum", "sha1sum", "sha256sum", "sha512sum", "shasum",
+    "readlink", "cut", "strings", "column", "jq", "yq",
+}
+GIT_READ_ONLY = {"status", "diff", "log", "show", "ls-files", "blame", "rev-parse", "shortlog", "grep"}
+# Déterministes à fichiers identiques : tests, compilation, analyse statique
+CHECK_COMMANDS = {"pytest", "mypy", "pylint"}
+CHECK_MODULES = {"pytest", "py_compile", "unittest", "mypy", "pylint"}
+PYTHON_NAMES = {"python", "python3", "python3.10", "python3.11"}
+# Ni mises en cache ni susceptibles de modifier le sandbox : n'invalident rien
+NEUTRAL_COMMANDS = {
+    "pwd", "echo", "printf", "date", "cal", "whoami", "id", "groups", "uname", "hostname",
+    "uptime", "free", "df", "ps", "pgrep", "which", "whereis", "env", "printenv", "sleep",
+    "history", "clear", "lscpu", "lsblk",
+}
+# Options de find qui écrivent ou exécutent
+_FIND_ACTIONS = ("-delete", "-exec", "-ok", "-fprint", "-fls")
+
+
+def _args_inside(parts: list[str], cwd: Path, root: Path) -> bool:
+    """Les chemins cités restent-ils dans le sandbox ? (sinon la sortie peut changer à notre insu)"""
+    for arg in parts[1:]:
+        if arg.startswith("~"):
+            return False
+        if arg.startswith("/") or ".." in arg:
+            if not (cwd / arg).resolve().is_relative_to(root.resolve()):
+                return False
+    return True
+
+
+def is_cacheable(parts: list[str]) -> bool:
+    cmd, args = parts[0], parts[1:]
+    if cmd == "git":
+        sub = next((a for a in args if not a.startswith("-")), "")
+        return sub in GIT_READ_ONLY
+    if cmd == "find":
+        return not any(a.startswith(_FIND_ACTIONS) for a in args)
+    if cmd == "yq":
+        # -i / --inplace réécrit le fichier
+        return not any(a == "--inplace" or (a.startswith("-") and not a.startswith("--") and "i" in a)
+                       for a in args)
+    if cmd == "tail":
+        return not any(a in ("-f", "-F", "--follow") or a.startswith("--follow") for a in args)
+    if cmd in READ_ONLY_COMMANDS or cmd in CHECK_COMMANDS:
+        return True
+    if cmd in PYTHON_NAMES:
+        return len(args) > 1 and args[0] == "-m" and args[1] in CHECK_MODULES
+    return False
+
+
+def is_neutral(parts: list[str]) -> bool:
+    return parts[0] in NEUTRAL_COMMANDS
+
+
+class CommandCache:
+    """
+    Résultats de run_terminal pour les commandes en lecture seule ou déterministes d'un sandbox.
+
+    Clé : (commande, dossier courant). Une entrée n'est rendue que si l'empreinte est inchangée :
+    génération du sandbox (incrémentée à chaque évènement du FileIndex — watchfiles ou
+    écriture d'un outil fs) + empreinte de contenu des fichiers passés en argument.
+    Toute autre commande (hors commandes neutres) vide le cache : elle a pu écrire.
+    """
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.generation = 0
+        self._entries: OrderedDict = OrderedDict()  # (commande, cwd) → (empreinte, résumé, date)
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0}
+        get_file_index(root).add_listener(self._on_change)
+
+    def _on_change(self, rel: str):
+        self.invalidate()
+
+    def invalidate(self):
+        with self._lock:
+            self.generation += 1
+            if self._entries:
+                self.stats["invalidations"] += 1
+                self._entries.clear()
+
+    def _fingerprint(self, parts: list[str], cwd: Path) -> bytes:
+        h = hashlib.blake2b(str(self.generation).encode(), digest_size=16)
+        for arg in parts[1:]:
+            if arg.startswith("-"):
+                continue
+            path = cwd / arg
+            try:
+                if path.is_file():
+                    h.update(arg.encode() + b"\0" + file_digest(path))
+            except OSError:
+                continue
+        return h.digest()
+
+    def get(self, parts: list[str], command: str, cwd: Path) -> tuple[str, float] | None:
+        """(résumé, âge en secondes) si la commande a déjà tourné sur ce même sandbox."""
+        if not is_cacheable(parts) or not _args_inside(parts, cwd, self.root):
+            return None
+        key = (command, str(cwd))
+        fingerprint = self._fingerprint(parts, cwd)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == fingerprint and time.monotonic() - entry[2] < TERMINAL_CACHE_TTL:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                logger.info(f"♻️ Résultat en cache : {command}")
+                return entry[1], time.monotonic() - entry[2]
+            self.stats["misses"] += 1
+        return None
+
+    def record(self, parts: list[str], command: str, cwd: Path, summary: str, reusable: bool):
+        """Mémorise le résultat d'une commande cachable, ou vide le cache après une commande qui a pu écrire."""
+        cacheable = is_cacheable(parts)
+        if not reusable or not (cacheable or is_neutral(parts)):
+            self.invalidate()
+            return
+        if not cacheable or not _args_inside(parts, cwd, self.root):
+            return
+        fingerprint = self._fingerprint(parts, cwd)
+        with self._lock:
+            key = (command, str(cwd))
+            self._entries[key] = (fingerprint, summary, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > TERMINAL_CACHE_SIZE:
+                self._entries.popitem(last=False)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {**self.stats, "size": len(self._entries)}
+
+
+# ============================================================
+# REGISTRE (un cache par racine de sandbox)
+# ============================================================
+_CACHES: dict[str, CommandCache] = {}
+_LOCK = threading.Lock()
+
+
+def get_command_cache(root: Path) -> CommandCache:
+    key = str(root)
+    with _LOCK:
+        cache = _CACHES.get(key)
+        if cache is None:
+            cache = _CACHES[key] = CommandCache(root)
+        return cache
+
+
+def discard_command_cache(root: Path):
+    with _LOCK:
+        _CACHES.pop(str(root), None)
+
+
+def invalidate_command_cache(root: Path):
+    """Écriture connue (outil fs) : les résultats mémorisés du sandbox ne valent plus."""
+    cache = _CACHES.get(str(root))
+    if cache is not None:
+        cache.invalidate()
@@ -0,0 +1,411 @@
+# app/tools/file_index.py
+import atexit
+import bisect
+import os
+import re
+import threading
+from pathlib import Path
+from app.config import FILE_INDEX_WATCH_DEBOUNCE_MS
+from app.logger import get_logger
+
+try:
+    from watchfiles import watch, Change, DefaultFilter
+    HAS_WATCHFILES = True
+except ImportError:  # sans watchfiles, l'index est reconstruit à chaque listing
+    HAS_WATCHFILES = False
+
+logger = get_logger("file_index")
+
+# Jamais indexés (ni parcourus) : dépendances, caches, métadonnées VCS
+EXCLUDED_NAMES = {".git", ".venv", "venv", "__pycache__", ".DS_Store", "node_modules", ".mypy_cache", ".pytest_cache"}
+
+
+# ============================================================
+# .gitignore
+# ============================================================
+
+def _glob_to_regex(pattern: str) -> str:
+    out = []
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("/**", i) and i + 3 == len(pattern):
+            out.append("/.*")
+            i += 3
+        elif pattern[i] == "*":
+            out.append("[^/]*")
+            i += 1
+        elif pattern[i] == "?":
+            out.append("[^/]")
+            i += 1
+        elif pattern[i] == "[":
+            end = pattern.find("]", i + 1)
+            if end == -1:
+                out.append(re.escape("["))
+                i += 1
+            else:
+                out.append(pattern[i:end + 1].replace("[!", "[^"))
+                i = end + 1
+        else:
+            out.append(re.escape(pattern[i]))
+            i += 1
+    return "".join(out)
+
+
+class GitIgnore:
+    """Règles .gitignore (racine + sous-dossiers), la dernière règle qui correspond gagne."""
+
+    def __init__(self):
+        self._rules: list[tuple[str, re.Pattern, bool, bool]] = []  # (dossier, regex, négation, dossiers seuls)
+
+    def load(self, rel_dir: str, gitignore: Path):
+        try:
+            lines = gitignore.read_text(encoding="utf-8", errors="replace").splitlines()
+        except OSError:
+            return
+        self._rules = [r for r in self._rules if r[0] != rel_dir]
+        for line in lines:
+            line = line.rstrip()
+            if not line or line.startswith("#"):
+                continue
+            negate = line.startswith("!")
+            if negate:
+                line = line[1:]
+            dir_only = line.endswith("/")
+            line = line.strip("/") if dir_only else line
+            anchored = "/" in line
+            regex = _glob_to_regex(line.lstrip("/"))
+            regex = f"^{regex}$" if anchored else f"^(?:.*/)?{regex}$"
+            self._rules.append((rel_dir, re.compile(regex), negate, dir_only))
+
+    def forget(self, rel_dir: str):
+        self._rules = [r for r in self._rules if r[0] != rel_dir]
+
+    def ignored(self, rel_path: str, is_dir: bool) -> bool:
+        result = False
+        for base, regex, negate, dir_only in self._rules:
+            if base:
+                if not rel_path.startswith(base + "/"):
+                    continue
+                local = rel_path[len(base) + 1:]
+            else:
+                local = rel_path
+            if dir_only and not is_dir:
+                continue
+            if regex.match(local):
+                result = not negate
+        return result
+
+
+# ============================================================
+# INDEX
+# ============================================================
+
+class _Dir:
+    __slots__ = ("files", "file_names", "subdirs", "count", "bytes")
+
+    def __init__(self):
+        self.files: dict[str, int] = {}   # nom → taille
+        self.file_names: list[str] = []   # triés
+        self.subdirs: list[str] = []      # triés
+        self.count = 0                    # fichiers dans le sous-arbre
+        self.bytes = 0                    # octets dans le sous-arbre
+
+
+def _parent(rel: str) -> str:
+    return rel.rpartition("/")[0]
+
+
+def _name(rel: str) -> str:
+    return rel.rpartition("/")[2]
+
+
+def _join(rel_dir: str, name: str) -> str:
+    return f"{rel_dir}/{name}" if rel_dir else name
+
+
+class FileIndex:
+    """
+    Arbre des fichiers d'un sandbox, tenu à jour incrémentalement.
+    - Construction : os.scandir, les dossiers exclus / ignorés (.gitignore) ne sont jamais parcourus.
+    - Mise à jour : évènements watchfiles (thread dédié) + `refresh(path)` appelé par les outils
+      d'écriture pour un effet immédiat.
+    - Listing : parcours en profondeur des enfants triés, arrêté dès que la page est pleine →
+      coût proportionnel au résultat, pas à la taille de l'arbre. Chaque dossier connaît le
+      nombre de fichiers et la taille de son sous-arbre (listing replié par profondeur).
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self._dirs: dict[str, _Dir] = {}
+        self._gitignore = GitIgnore()
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._watcher: threading.Thread | None = None
+        self._listeners = []
+        self.build()
+
+    # ── construction ──
+
+    def build(self):
+        with self._lock:
+            self._dirs = {"": _Dir()}
+            self._gitignore = GitIgnore()
+            self._scan("")
+        self._notify("")
+
+    def _scan(self, rel_dir: str):
+        """Indexe le sous-arbre `rel_dir` (déjà présent dans _dirs), en élaguant pendant la descente."""
+        stack = [rel_dir]
+        while stack:
+            current = stack.pop()
+            abs_dir = self.root / current if current else self.root
+            gitignore = abs_dir / ".gitignore"
+            if gitignore.is_file():
+                self._gitignore.load(current, gitignore)
+            try:
+                entries = list(os.scandir(abs_dir))
+            except OSError:
+                continue
+            for entry in entries:
+                rel = _join(current, entry.name)
+                try:
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                    if self._excluded(rel, is_dir):
+                        continue
+                    if is_dir:
+                        self._add_dir(rel)
+                        stack.append(rel)
+                    elif entry.is_file(follow_symlinks=False):
+                        self._set_file(rel, entry.stat(follow_symlinks=False).st_size)
+                except OSError:
+                    continue
+
+    def _excluded(self, rel: str, is_dir: bool) -> bool:
+        return _name(rel) in EXCLUDED_NAMES or self._gitignore.ignored(rel, is_dir)
+
+    def _under_excluded(self, rel: str) -> bool:
+        """Le chemin ou l'un de ses dossiers parents est-il exclu ?"""
+        parts = rel.split("/")
+        for i in range(1, len(parts)):
+            if self._excluded("/".join(parts[:i]), True):
+                return True
+        return False
+
+    # ── mutations (lock tenu) ──
+
+    def _adjust(self, rel_dir: str, count: int, size: int):
+        while True:
+            node = self._dirs.get(rel_dir)
+            if node is not None:
+                node.count += count
+                node.bytes += size
+            if not rel_dir:
+                return
+            rel_dir = _parent(rel_dir)
+
+    def _add_dir(self, rel: str) -> _Dir:
+        node = self._dirs.get(rel)
+        if node is not None:
+            return node
+        parent = _parent(rel)
+        if parent not in self._dirs:
+            self._add_dir(parent)
+        node = self._dirs[rel] = _Dir()
+        bisect.insort(self._dirs[parent].subdirs, _name(rel))
+        return node
+
+    def _set_file(self, rel: str, size: int):
+        parent = _parent(rel)
+        node = self._dirs.get(parent) or self._add_dir(parent)
+        name = _name(rel)
+        old = node.files.get(name)
+        if old is None:
+            bisect.insort(node.file_names, name)
+            self._adjust(parent, 1, size)
+        else:
+            self._adjust(parent, 0, size - old)
+        node.files[name] = size
+
+    def _remove(self, rel: str):
+        """Supprime un fichier ou un sous-arbre."""
+        parent = _parent(rel)
+        node = self._dirs.get(parent)
+        if node is None:
+            return
+        name = _name(rel)
+        if name in node.files:
+            size = node.files.pop(name)
+            node.file_names.remove(name)
+            self._adjust(parent, -1, -size)
+        elif rel in self._dirs:
+            sub = self._dirs[rel]
+            self._adjust(parent, -sub.count, -sub.bytes)
+            node.subdirs.remove(name)
+            prefix = rel + "/"
+            for key in [k for k in self._dirs if k == rel or k.startswith(prefix)]:
+                del self._dirs[key]
+                self._gitignore.forget(key)
+
+    # ── mises à jour ──
+
+    def refresh(self, path: Path | str):
+        """Resynchronise un chemin (fichier ou dossier) après une modification connue."""
+        path = Path(path)
+        try:
+            rel = path.resolve().relative_to(self.root.resolve()).as_posix()
+        except ValueError:
+            return
+        if rel in ("", "."):
+            self.build()
+            return
+        with self._lock:
+            if path.name == ".gitignore":
+                # Les règles changent : on reconstruit (rare)
+                self.build()
+                return
+            if not path.exists():
+                self._remove(rel)
+            elif self._under_excluded(rel) or self._excluded(rel, path.is_dir()):
+                return
+            elif path.is_dir():
+                self._add_dir(rel)
+                self._scan(rel)
+            elif path.is_file():
+                self._set_file(rel, path.stat().st_size)
+        self._notify(rel)
+
+    def add_listener(self, callback):
+        """`callback(rel_path)` appelé après chaque mise à jour ("" = tout l'arbre a été reconstruit)."""
+        self._listeners.append(callback)
+
+    def _notify(self, rel: str):
+        for listener in self._listeners:
+            try:
+                listener(rel)
+            except Exception as e:
+                logger.warning(f"⚠️ Listener de l'index en échec ({rel or '/'}) : {e}")
+
+    def start_watching(self):
+        if not HAS_WATCHFILES or self._watcher is not None:
+            return
+        self._watcher = threading.Thread(target=self._watch, name=f"file_index:{self.root.name}", daemon=True)
+        self._watcher.start()
+
+    def stop(self):
+        self._stop.set()
+        watcher = self._watcher
+        if watcher is not None and watcher is not threading.current_thread():
+            watcher.join(timeout=1)
+
+    def _watch(self):
+        watch_filter = DefaultFilter(ignore_dirs=EXCLUDED_NAMES)
+        try:
+            for changes in watch(self.root, watch_filter=watch_filter, stop_event=self._stop,
+                                 debounce=FILE_INDEX_WATCH_DEBOUNCE_MS, step=20, yield_on_timeout=False):
+                for _, changed in changes:
+                    self.refresh(changed)
+        except Exception as e:  # dossier supprimé, limite inotify...
+            logger.warning(f"⚠️ Surveillance de {self.root} arrêtée : {e}")
+        finally:
+            self._watcher = None
+
+    # ── lecture ──
+
+    @property
+    def watching(self) -> bool:
+        return self._watcher is not None
+
+    def stats(self, rel_dir: str = "") -> tuple[int, int]:
+        """(nombre de fichiers, octets) du sous-arbre."""
+        with self._lock:
+            node = self._dirs.get(rel_dir)
+            return (node.count, node.bytes) if node else (0, 0)
+
+    def iter_files(self, rel_dir: str = ""):
+        """(chemin relatif, taille) des fichiers indexés sous `rel_dir` (copie, ordre quelconque)."""
+        prefix = rel_dir + "/" if rel_dir else ""
+        with self._lock:
+            return [
+                (_join(d, name), size)
+                for d, node in self._dirs.items() if d == rel_dir or d.startswith(prefix)
+                for name, size in node.files.items()
+            ]
+
+    def listing(self, rel_dir: str = "", max_depth: int = 0, offset: int = 0, limit: int = 100):
+        """
+        Page [offset, offset+limit) du parcours de `rel_dir` : fichiers (avec taille), puis
+        sous-dossiers. Au-delà de `max_depth` (0 = illimité) un dossier est replié en une ligne.
+        Retourne (lignes, il_reste_des_entrées) ou None si le dossier n'est pas indexé.
+        """
+        with self._lock:
+            if rel_dir not in self._dirs:
+                return None
+            rows = []
+            skipped = 0
+            # Pile de (dossier, profondeur) : parcours préfixe, arrêté dès la page pleine (+1 pour savoir s'il en reste)
+            stack = [(rel_dir, 1)]
+            while stack:
+                current, depth = stack.pop()
+                node = self._dirs[current]
+                entries = [("file", _join(current, n), node.files[n]) for n in node.file_names]
+                entries += [("dir", _join(current, n), depth) for n in node.subdirs]
+                pending = []
+                for kind, rel, extra in entries:
+                    if kind == "dir" and (not max_depth or depth < max_depth):
+                        pending.append((rel, depth + 1))
+                        continue
+                    if skipped < offset:
+                        skipped += 1
+                        continue
+                    if len(rows) == limit:
+                        return rows, True
+                    if kind == "file":
+                        rows.append((rel, extra, None))
+                    else:
+                        sub = self._dirs[rel]
+                        rows.append((rel + "/", sub.bytes, sub.count))
+                stack.extend(reversed(pending))
+            return rows, False
+
+
+# ============================================================
+# REGISTRE (un index par racine de sandbox)
+# ============================================================
+_INDEXES: dict[str, FileIndex] = {}
+_LOCK = threading.Lock()
+
+
+def get_file_index(root: Path) -> FileIndex:
+    key = str(root)
+    index = _INDEXES.get(key)
+    if index is None:
+        with _LOCK:
+            index = _INDEXES.get(key)
+            if index is None:
+                index = FileIndex(root)
+                index.start_watching()
+                _INDEXES[key] = index
+    elif not index.watching:
+        # Sans watchfiles, ou surveillance arrêtée sur erreur : des changements ont pu être
+        # manqués → reconstruction, puis nouvel essai de surveillance
+        index.build()
+        index.start_watching()
+    return index
+
+
+def discard_file_index(root: Path):
+    """Arrête la surveillance et oublie l'index (fermeture de session)."""
+    with _LOCK:
+        index = _INDEXES.pop(str(root), None)
+    if index is not None:
+        index.stop()
+
+
+@atexit.register
+def _stop_watchers():
+    # Arrête les threads watchfiles avant la finalisation de l'interpréteur
+    for index in list(_INDEXES.values()):
+        index.stop()
@@ -1,7 +1,17 @@
 # app/tools/fs.py
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from langchain_core.tools import tool
 from pathlib import Path
-from app.config import SANDBOX_PATH, FILE_CONTENT_MAX_CHARS
+from app.config import SANDBOX_PATH, FILE_CONTENT_MAX_CHARS, FS_BATCH_WORKERS
+from app.tools.atomic_io import is_unchanged, unified_diff, write_atomic
+from app.tools.code_search import get_code_index, format_results
+from app.tools.command_cache import invalidate_command_cache
+from app.tools.file_index import get_file_index
+from app.tools.line_index import line_index
+from app.tools.patch import PatchError, apply_patch_text, format_report
+from app.tools.sandbox import current_session
 
 # --- CONFIGURATION DU SANDBOX ---
 
@@ -28,52 +38,118 @@ def _sanitize_relative_path(file_path: str) -> str:
 
 def get_safe_path(file_path: str) -> Path:
     """
-    Transforme un chemin relatif (ex: 'main.py') en chemin absolu dans le sandbox.
-    Empêche de remonter dans les dossiers parents (sécurité).
+    Transforme un chemin relatif (ex: 'main.py') en chemin absolu dans le sandbox
+    de la session courante. Empêche de remonter dans les dossiers parents (sécurité).
     """
+    root = current_session().root
     # On enlève les éventuels "/" au début pour éviter de remonter à la racine système
     file_path = _sanitize_relative_path(file_path)
     clean_path = file_path.lstrip("/\\")
-    full_path = (SANDBOX_PATH / clean_path).resolve()
+    full_path = (root / clean_path).resolve()
     
     # Sécurité : On vérifie que le fichier final est bien DANS le sandbox
-    if not str(full_path).startswith(str(SANDBOX_PATH.resolve())):
+    if not full_path.is_relative_to(root.resolve()):
         raise ValueError(f"ACCÈS REFUSÉ : Tentative de sortir du sandbox ({file_path})")
     
     return full_path
 
+def _human_size(size: int) -> str:
+    if size < 1024:
+        return f"{size} B"
+    if size < 1024 * 1024:
+        return f"{size / 1024:.1f} KB"
+    return f"{size / (1024 * 1024):.1f} MB"
+
+
+def _refresh_index(path: Path):
+    """Répercute immédiatement une écriture dans l'index (sans attendre watchfiles)."""
+    root = current_session().root
+    get_file_index(root).refresh(path)
+    # Même si le chemin est ignoré par l'index : les résultats de commandes mémorisés ne valent plus
+    invalidate_command_cache(root)
+
+
 @tool
-def list_project_structure():
+def list_project_structure(path: str = "", max_depth: int = 0, offset: int = 0, limit: int = 100):
     """
-    Explore the sandbox directory and return the file tree structure.
+    List the files of the sandbox (or of the sub-directory `path`) with their sizes.
+    max_depth > 0 collapses deeper directories into one summary line.
+    Use offset/limit to page through large projects.
     """
     try:
-        
-        base_path = SANDBOX_PATH
-        
-        excluded = {".git", ".venv", "__pycache__", ".DS_Store", "node_modules"}
-        files_list = []
-        
+        base_path = current_session().root
+
         if not base_path.exists():
             return "Working directory is empty (new project)."
 
-        for path in base_path.rglob("*"):
-            if not any(part in excluded for part in path.parts):
-                if path.is_file():
-                    # On affiche le chemin relatif par rapport au sandbox
-                    files_list.append(str(path.relative_to(base_path)))
-        
-        if not files_list:
-            return "Directory is empty."
-            
-        return "\n".join(files_list[:100])
+        rel_dir = ""
+        if path:
+            target = get_safe_path(path)
+            if not target.is_dir():
+                return f"Error: {path} is not a directory."
+            rel_dir = target.relative_to(base_path.resolve()).as_posix()
+            rel_dir = "" if rel_dir == "." else rel_dir
+
+        index = get_file_index(base_path)
+        result = index.listing(rel_dir, max_depth=max(0, max_depth), offset=max(0, offset), limit=max(1, limit))
+        if result is None:
+            return f"Error: {path} is excluded from the index."
+        rows, more = result
+
+        if not rows:
+            return "Directory is empty." if offset == 0 else "No more entries."
+
+        lines = []
+        for rel, size, count in rows:
+            if count is None:
+                lines.append(f"{rel} ({_human_size(size)})")
+            else:
+                lines.append(f"{rel} ({count} files, {_human_size(size)})")
+        if more:
+            total, total_bytes = index.stats(rel_dir)
+            lines.append(f"... more entries ({total} files, {_human_size(total_bytes)} in total), "
+                         f"use offset={offset + len(rows)}")
+        return "\n".join(lines)
+    except ValueError as ve:
+        return str(ve)
     except Exception as e:
         return f"Error listing files: {str(e)}"
 
 @tool
-def read_file_content(file_path: str):
+def search_code(query: str, regex: bool = False, path: str = "", case_sensitive: bool = False, context: int = 1):
+    """
+    Search the project's text files for a literal string (or a Python regex with regex=True).
+    Returns ranked file:line hits with `context` lines around them. `path` restricts the
+    search to a file or directory.
+    """
+    try:
+        if not query:
+            return "Error: empty query."
+        base_path = current_session().root
+        prefix = ""
+        if path:
+            prefix = get_safe_path(path).relative_to(base_path.resolve()).as_posix()
+            prefix = "" if prefix == "." else prefix
+        index = get_code_index(get_file_index(base_path))
+        results, total = index.search(query, is_regex=regex, path=prefix,
+                                      case_sensitive=case_sensitive, context=min(max(context, 0), 5))
+        if not results:
+            return f"No match for {query!r}."
+        return format_results(results, total)
+    except re.error as e:
+        return f"Error: invalid regex ({e})."
+    except ValueError as ve:
+        return str(ve)
+    except Exception as e:
+        return f"Error searching code: {e}"
+
+@tool
+def read_file_content(file_path: str, start_line: int = 0, end_line: int = 0, byte_offset: int = -1):
     """
-    Read the content of a file within the sandbox.
+    Read a file within the sandbox, line-numbered (numbers match replace_lines).
+    Optional start_line/end_line (1-indexed, inclusive) read only that range;
+    byte_offset starts at the line containing that byte. Long outputs are cut,
+    the footer tells where to continue.
     """
     try:
         path = get_safe_path(file_path)
@@ -84,11 +160,29 @@ def read_file_content(file_path: str):
         if path.is_dir():
             return f"Error: {file_path} is a directory."
 
-        content = path.read_text(encoding="utf-8")
-        if len(content) > FILE_CONTENT_MAX_CHARS:
-            return content[:FILE_CONTENT_MAX_CHARS] + "\n... [Contenu tronqué]"
-            
-        return content
+        with open(path, "rb") as f:
+            if b"\0" in f.read(8192):
+                return f"Error: {file_path} is a binary file ({path.stat().st_size} bytes)."
+
+        if byte_offset >= 0:
+            start_line = line_index.line_at(path, byte_offset)
+        start = max(start_line, 1)
+        end = end_line if end_line > 0 else 2 ** 62
+        if end < start:
+            return "Error: start_line must be <= end_line"
+
+        rows, total, truncated = line_index.read(path, start, end, FILE_CONTENT_MAX_CHARS)
+        if not rows:
+            return f"File {file_path} is empty." if total == 0 else f"Error: line {start} out of range ({total} lines)."
+
+        width = len(str(rows[-1][0]))
+        body = "\n".join(f"{number:>{width}} | {text}" for number, text in rows)
+        first, last = rows[0][0], rows[-1][0]
+        if first > 1 or last < total or truncated:
+            header = f"[{file_path} — lines {first}-{last} of {total}]\n"
+            footer = f"\n... [truncated, continue with start_line={last + 1}]" if truncated else ""
+            return header + body + footer
+        return body
     except ValueError as ve:
         return str(ve)
     except Exception as e:
@@ -102,21 +196,23 @@ def write_file(file_path: str, content: str):
     try:
         path = get_safe_path(file_path)
         
-        # Création des dossiers parents si nécessaire
-        path.parent.mkdir(parents=True, exist_ok=True)
-        
+        if path.is_dir():
+            return f"Error: {file_path} is a directory."
+
+        data = content.encode("utf-8")
         existed = path.exists()
-        old_content = path.read_text(encoding="utf-8") if existed else None
+        # Contenu identique : aucune écriture (ni évènement watchfiles, ni ré-indexation)
+        if existed and is_unchanged(path, data):
+            return f"Succès : Fichier {file_path} inchangé (contenu identique, aucune écriture)."
+        old_content = path.read_text(encoding="utf-8", errors="replace") if existed else None
 
-        path.write_text(content, encoding="utf-8")
+        write_atomic(path, data)
+        _refresh_index(path)
 
         if existed:
-            return (
-                f"Succès : Fichier {file_path} modifié.\n"
-                f"[DIFF_BEFORE]{old_content[:500]}[/DIFF_BEFORE]\n"
-                f"[DIFF_AFTER]{content[:500]}[/DIFF_AFTER]"
-            )
-        return f"Succès : Fichier {file_path} créé ({len(content)} chars)."
+            diff, added, removed = unified_diff(old_content, content, file_path)
+            return f"Succès : Fichier {file_path} modifié (+{added} -{removed}).\n[DIFF]{diff}[/DIFF]"
+        return f"Succès : Fichier {file_path} créé ({len(content)} chars, {len(content.splitlines())} lines)."
     except ValueError as ve:
         return str(ve)
     except Exception as e:
@@ -132,7 +228,8 @@ def replace_lines(file_path: str, start_line: int, end_line: int, new_content: s
         if not path.exists():
             return f"Error: file {file_path} not found"
         
-        lines = path.read_text(encoding="utf-8").splitlines()
+        old_text = path.read_text(encoding="utf-8")
+        lines = old_text.splitlines()
 
         # Validation
         if not (1 <= start_line <= len(lines)):
@@ -142,17 +239,202 @@ def replace_lines(file_path: str, start_line: int, end_line: int, new_content: s
         if start_line > end_line:
             return "Error: start_line must be <= end_line"
 
-        old_section = "\n".join(lines[start_line - 1:end_line])
-
-        # Remplacement
+        # Remplacement (le saut de ligne final du fichier est conservé)
         new_lines = lines[:start_line - 1] + new_content.split('\n') + lines[end_line:]
-        path.write_text('\n'.join(new_lines), encoding="utf-8")
+        new_text = '\n'.join(new_lines) + ('\n' if old_text.endswith('\n') else '')
+        if not write_atomic(path, new_text):
+            return f"Success: lines {start_line}-{end_line} of {file_path} already had this content (no write)."
+        _refresh_index(path)
+        diff, added, removed = unified_diff(old_text, new_text, file_path)
         return (
-            f"Success: lines {start_line}-{end_line} replaced in {file_path}\n"
-            f"[DIFF_BEFORE]{old_section[:300]}[/DIFF_BEFORE]\n"
-            f"[DIFF_AFTER]{new_content[:300]}[/DIFF_AFTER]"
+            f"Success: lines {start_line}-{end_line} replaced in {file_path} (+{added} -{removed})\n"
+            f"[DIFF]{diff}[/DIFF]"
         )
     except ValueError as ve:
         return str(ve)
     except Exception as e:
-        return f"Error replacing lines: {e}"
\ No newline at end of file
+        return f"Error replacing lines: {e}"
+
+
+@tool
+def apply_patch(patch: str):
+    """
+    Apply a multi-hunk, multi-file patch: a unified diff (--- a/f / +++ b/f / @@ hunks)
+    or SEARCH/REPLACE blocks preceded by the file path. Context is matched fuzzily;
+    if any hunk fails, nothing is written.
+    """
+    try:
+        files, written = apply_patch_text(patch, get_safe_path)
+        for path in written:
+            _refresh_index(path)
+        return format_report(files, applied=all(not fp.error and all(h.ok for h in fp.hunks) for fp in files))
+    except PatchError as pe:
+        return f"Error: invalid patch ({pe})."
+    except Exception as e:
+        return f"Error applying patch: {e}"
+
+
+# --- OPÉRATIONS GROUPÉES (un seul appel LLM pour N fichiers, tout ou rien) ---
+
+def _missing_dirs(path: Path) -> list[Path]:
+    """Dossiers parents qui n'existent pas encore (du plus haut au plus profond)."""
+    missing = []
+    parent = path.parent
+    while not parent.exists():
+        missing.append(parent)
+        parent = parent.parent
+    return missing[::-1]
+
+
+def _remove_dirs(dirs: list[Path]):
+    for directory in sorted(set(dirs), key=lambda d: len(d.parts), reverse=True):
+        try:
+            directory.rmdir()
+        except OSError:
+            pass
+
+
+def _write_entry(path: Path, content: str) -> dict:
+    data = content.encode("utf-8")
+    existed = path.exists()
+    if existed and is_unchanged(path, data):
+        return {"status": "unchanged", "original": None}
+    original = path.read_bytes() if existed else None
+    write_atomic(path, data)
+    entry = {"status": "modified" if existed else "created", "original": original}
+    if existed:
+        _, entry["added"], entry["removed"] = unified_diff(original.decode("utf-8", errors="replace"), content, path.name)
+    else:
+        entry["lines"] = len(content.splitlines())
+    return entry
+
+
+@tool
+def write_files(files: list[dict]):
+    """
+    Create or overwrite SEVERAL files in one call: files = [{"file_path": "app.py", "content": "..."}, ...].
+    Files are written in parallel; if one fails, every file is restored (all or nothing).
+    """
+    try:
+        if not files:
+            return "Error: 'files' is empty."
+        targets = []
+        for i, entry in enumerate(files):
+            file_path = entry.get("file_path") or entry.get("path")
+            content = entry.get("content")
+            if not file_path or not isinstance(content, str):
+                return f"Error: files[{i}] needs 'file_path' and 'content'."
+            path = get_safe_path(file_path)
+            if path.is_dir():
+                return f"Error: {file_path} is a directory."
+            targets.append((file_path, path, content))
+        if len({path for _, path, _ in targets}) != len(targets):
+            return "Error: the same file appears twice in 'files'."
+
+        created_dirs = [d for _, path, _ in targets for d in _missing_dirs(path)]
+        results, failure = {}, None
+        with ThreadPoolExecutor(max_workers=min(len(targets), FS_BATCH_WORKERS), thread_name_prefix="write_files") as pool:
+            futures = {pool.submit(_write_entry, path, content): file_path for file_path, path, content in targets}
+            for future in as_completed(futures):
+                try:
+                    results[futures[future]] = future.result()
+                except Exception as e:
+                    failure = failure or f"{futures[future]}: {e}"
+
+        paths = {file_path: path for file_path, path, _ in targets}
+        if failure:
+            # Retour arrière : contenus d'origine restaurés, fichiers et dossiers créés supprimés
+            for file_path, result in results.items():
+                if result["status"] == "created":
+                    paths[file_path].unlink(missing_ok=True)
+                elif result["status"] == "modified":
+                    write_atomic(paths[file_path], result["original"])
+            _remove_dirs(created_dirs)
+            return f"Error: write_files rolled back, no file changed ({failure})."
+
+        for file_path, result in results.items():
+            if result["status"] != "unchanged":
+                _refresh_index(paths[file_path])
+
+        counts = {s: sum(r["status"] == s for r in results.values()) for s in ("created", "modified", "unchanged")}
+        lines = [f"Succès : {len(targets)} fichiers ({counts['created']} créés, {counts['modified']} modifiés, {counts['unchanged']} inchangés)."]
+        for file_path, _, _ in targets:
+            result = results[file_path]
+            if result["status"] == "created":
+                lines.append(f"- {file_path}: created ({result['lines']} lines)")
+            elif result["status"] == "modified":
+                lines.append(f"- {file_path}: modified (+{result['added']} -{result['removed']})")
+            else:
+                lines.append(f"- {file_path}: unchanged")
+        return "\n".join(lines)
+    except ValueError as ve:
+        return str(ve)
+    except Exception as e:
+        return f"Error writing files: {e}"
+
+
+@tool
+def make_dirs(paths: list[str]):
+    """Create several directories (with their parents) in one call."""
+    try:
+        targets = [(p, get_safe_path(p)) for p in paths]
+        for dir_path, path in targets:
+            if path.exists() and not path.is_dir():
+                return f"Error: {dir_path} exists and is not a directory."
+        new = [path for _, path in targets if not path.exists()]
+        created = []
+        try:
+            for path in new:
+                created.extend(_missing_dirs(path / "_"))
+                path.mkdir(parents=True, exist_ok=True)
+        except OSError as e:
+            _remove_dirs(created)
+            return f"Error: make_dirs rolled back ({e})."
+        for path in new:
+            _refresh_index(path)
+        return f"Succès : {len(targets)} dossiers ({len(new)} créés, {len(targets) - len(new)} existants)."
+    except ValueError as ve:
+        return str(ve)
+    except Exception as e:
+        return f"Error creating directories: {e}"
+
+
+@tool
+def move_paths(moves: list[dict]):
+    """
+    Move or rename several files/directories in one call: moves = [{"src": "old.py", "dst": "pkg/new.py"}, ...].
+    Destinations must not exist. Applied in order; undone entirely if one fails.
+    """
+    try:
+        targets = []
+        for i, move in enumerate(moves):
+            src, dst = move.get("src") or move.get("source"), move.get("dst") or move.get("destination")
+            if not src or not dst:
+                return f"Error: moves[{i}] needs 'src' and 'dst'."
+            targets.append((src, dst, get_safe_path(src), get_safe_path(dst)))
+
+        done, created_dirs = [], []
+        try:
+            for src, dst, src_path, dst_path in targets:
+                if not src_path.exists():
+                    raise FileNotFoundError(f"{src} not found")
+                if dst_path.exists():
+                    raise FileExistsError(f"{dst} already exists")
+                created_dirs.extend(_missing_dirs(dst_path))
+                dst_path.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(src_path, dst_path)
+                done.append((src_path, dst_path))
+        except OSError as e:
+            for src_path, dst_path in reversed(done):
+                os.replace(dst_path, src_path)
+            _remove_dirs(created_dirs)
+            return f"Error: move_paths rolled back, nothing moved ({e})."
+
+        for src_path, dst_path in done:
+            _refresh_index(src_path)
+            _refresh_index(dst_path)
+        return "Succès : " + ", ".join(f"{src} → {dst}" for src, dst, _, _ in targets)
+    except ValueError as ve:
+        return str(ve)
+    except Exception as e:
+        return f"Error moving files: {e}"
@@ -0,0 +1,84 @@
+# app/tools/http_pool.py
+import asyncio
+import threading
+import weakref
+import httpx
+from app.config import (
+    WEB_FETCH_TIMEOUT, WEB_POOL_MAX_CONNECTIONS, WEB_POOL_MAX_KEEPALIVE, WEB_POOL_KEEPALIVE_EXPIRY,
+)
+from app.logger import get_logger
+from app.utils.http_stats import ConnectionStats
+
+logger = get_logger("http_pool")
+
+# On se fait passer pour un vrai navigateur (User-Agent) pour ne pas être bloqué
+BROWSER_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+}
+
+# ============================================================
+# CLIENTS HTTP PARTAGÉS DES OUTILS WEB
+# ============================================================
+# httpx garde un pool de connexions keep-alive par origine (schéma, hôte, port) :
+# deux pages du même site ne repaient ni le DNS ni le handshake TCP+TLS.
+# - sync  : un seul httpx.Client (thread-safe, utilisé par les threads du ToolNode)
+# - async : un httpx.AsyncClient par event loop (ses connexions sont liées à la loop)
+_sync_client: httpx.Client | None = None
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+_LOCK = threading.Lock()
+
+_STATS = ConnectionStats()
+
+
+def _client_kwargs() -> dict:
+    return {
+        "headers": BROWSER_HEADERS,
+        "timeout": WEB_FETCH_TIMEOUT,
+        "follow_redirects": True,
+        "limits": httpx.Limits(
+            max_connections=WEB_POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=WEB_POOL_MAX_KEEPALIVE,
+            keepalive_expiry=WEB_POOL_KEEPALIVE_EXPIRY,
+        ),
+    }
+
+
+def get_http_client() -> httpx.Client:
+    """Client synchrone partagé (CLI, threads du ToolNode)."""
+    global _sync_client
+    if _sync_client is None:
+        with _LOCK:
+            if _sync_client is None:
+                _sync_client = httpx.Client(event_hooks={"request": [_STATS.on_request]}, **_client_kwargs())
+    return _sync_client
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """Client async partagé par les coroutines de l'event loop courante (serveur)."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(event_hooks={"request": [_STATS.on_request_async]}, **_client_kwargs())
+        _async_clients[loop] = client
+    return client
+
+
+def get_http_pool_stats() -> dict:
+    """Compteurs de réutilisation des connexions des outils web."""
+    return _STATS.snapshot()
+
+
+async def aclose_http_clients():
+    """Ferme le client async de la loop courante (arrêt du serveur)."""
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+def close_http_clients():
+    """Ferme le client synchrone partagé (tests / arrêt du CLI)."""
+    global _sync_client
+    with _LOCK:
+        if _sync_client is not None:
+            _sync_client.close()
+        _sync_client = None
@@ -0,0 +1,97 @@
+# app/tools/line_index.py
+import mmap
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+import numpy as np
+from app.config import LINE_INDEX_CACHE_SIZE
+
+
+class LineIndex:
+    """
+    Index des débuts de ligne d'un fichier, construit une fois via mmap (recherche
+    vectorisée des '\\n', sans charger le fichier dans une str Python) puis mis en cache
+    par (chemin, mtime, taille). Lire les lignes 50 000 à 50 100 revient alors à lire
+    ~100 lignes : deux accès dans le tableau d'offsets et une tranche du mmap.
+    """
+
+    def __init__(self, maxsize: int = LINE_INDEX_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries: OrderedDict = OrderedDict()  # (chemin, mtime_ns, taille) → offsets
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "builds": 0}
+
+    def offsets(self, path: Path) -> tuple[np.ndarray, int]:
+        """(offsets des débuts de ligne, taille du fichier)."""
+        st = os.stat(path)
+        key = (str(path), st.st_mtime_ns, st.st_size)
+        with self._lock:
+            offsets = self._entries.get(key)
+            if offsets is not None:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return offsets, st.st_size
+
+        offsets = self._build(path, st.st_size)
+        with self._lock:
+            self._entries[key] = offsets
+            self._entries.move_to_end(key)
+            self.stats["builds"] += 1
+            # Une seule version par chemin : les anciennes (mtime/taille périmés) ne resserviront pas
+            for stale in [k for k in self._entries if k[0] == key[0] and k != key]:
+                del self._entries[stale]
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return offsets, st.st_size
+
+    @staticmethod
+    def _build(path: Path, size: int) -> np.ndarray:
+        if size == 0:
+            return np.zeros(1, dtype=np.int64)
+        dtype = np.uint32 if size < 2 ** 32 else np.int64
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            data = np.frombuffer(mm, dtype=np.uint8)
+            starts = np.flatnonzero(data == 10) + 1
+            del data  # libère l'export du buffer avant la fermeture du mmap
+        if starts.size and starts[-1] == size:
+            starts = starts[:-1]  # le '\n' final n'ouvre pas de ligne
+        return np.concatenate(([0], starts)).astype(dtype)
+
+    def read(self, path: Path, start: int, end: int, max_chars: int) -> tuple[list[tuple[int, str]], int, bool]:
+        """
+        Lignes [start, end] (1-indexées, incluses) → ([(numéro, texte)], total de lignes, tronqué ?).
+        S'arrête dès que `max_chars` caractères sont réunis.
+        """
+        offsets, size = self.offsets(path)
+        total = len(offsets) if size else 0
+        start, end = max(1, start), min(end, total)
+        rows, used = [], 0
+        if start > end:
+            return rows, total, False
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for number in range(start, end + 1):
+                begin = int(offsets[number - 1])
+                stop = int(offsets[number]) if number < total else size
+                # Ligne géante (minifié, log) : on ne décode que ce qui peut tenir dans le budget
+                stop = min(stop, begin + 4 * (max_chars - used) + 4)
+                text = mm[begin:stop].decode("utf-8", errors="replace").rstrip("\r\n")
+                if used + len(text) > max_chars:
+                    if not rows:
+                        rows.append((number, text[:max_chars] + " [... line truncated]"))
+                    return rows, total, True
+                rows.append((number, text))
+                used += len(text) + 1
+        return rows, total, False
+
+    def line_at(self, path: Path, byte_offset: int) -> int:
+        """Numéro (1-indexé) de la ligne qui contient `byte_offset`."""
+        offsets, _ = self.offsets(path)
+        return int(np.searchsorted(offsets, byte_offset, side="right"))
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {**self.stats, "size": len(self._entries)}
+
+
+line_index = LineIndex()
@@ -0,0 +1,135 @@
+# app/tools/output_capture.py
+import time
+import uuid
+from collections import deque
+from app.config import (
+    TERMINAL_HEAD_CHARS, TERMINAL_TAIL_CHARS, TERMINAL_MAX_LINE_CHARS,
+    TERMINAL_STREAM_BATCH_LINES, TERMINAL_STREAM_INTERVAL, TERMINAL_STREAM_MAX_LINES,
+)
+from app.logger import get_logger
+
+logger = get_logger("terminal")
+
+
+class OutputCapture:
+    """
+    Capture bornée d'un flux de sortie : les premiers `head` caractères et les dernières
+    lignes tenant dans `tail` caractères (deque). La mémoire ne dépend pas du volume
+    imprimé par la commande, seuls les compteurs grandissent.
+    """
+
+    def __init__(self, head: int = TERMINAL_HEAD_CHARS, tail: int = TERMINAL_TAIL_CHARS):
+        self.head_limit = head
+        self.tail_limit = tail
+        self.head: list[str] = []
+        self.head_size = 0
+        self.tail: deque[str] = deque()
+        self.tail_size = 0
+        self.lines = 0
+        self.bytes = 0
+        self._partial = b""
+
+    def feed(self, data: bytes) -> list[str]:
+        """Ajoute un morceau brut, retourne les lignes complètes qu'il termine."""
+        self.bytes += len(data)
+        chunks = (self._partial + data).split(b"\n")
+        self._partial = chunks.pop()
+        if len(self._partial) > 4 * TERMINAL_MAX_LINE_CHARS:
+            # Ligne sans fin (barre de progression, binaire) : on la coupe
+            chunks.append(self._partial)
+            self._partial = b""
+        lines = [c.decode("utf-8", errors="replace").rstrip("\r") for c in chunks]
+        for line in lines:
+            self.add(line)
+        return lines
+
+    def close(self) -> list[str]:
+        if not self._partial:
+            return []
+        line = self._partial.decode("utf-8", errors="replace").rstrip("\r")
+        self._partial = b""
+        self.add(line)
+        return [line]
+
+    def add(self, line: str):
+        """Ajoute une ligne déjà découpée (le shell de session fait son propre découpage)."""
+        if len(line) > TERMINAL_MAX_LINE_CHARS:
+            line = line[:TERMINAL_MAX_LINE_CHARS] + " [...]"
+        self.lines += 1
+        if self.head_size + len(line) <= self.head_limit and len(self.head) == self.lines - 1:
+            self.head.append(line)
+            self.head_size += len(line) + 1
+            return
+        self.tail.append(line)
+        self.tail_size += len(line) + 1
+        while self.tail_size > self.tail_limit and len(self.tail) > 1:
+            self.tail_size -= len(self.tail.popleft()) + 1
+
+    @property
+    def truncated(self) -> bool:
+        return len(self.head) + len(self.tail) < self.lines
+
+    def text(self) -> str:
+        omitted = self.lines - len(self.head) - len(self.tail)
+        parts = list(self.head)
+        if omitted > 0:
+            parts.append(f"... [{omitted} lines omitted] ...")
+        parts.extend(self.tail)
+        return "\n".join(parts).strip()
+
+
+class TerminalStream:
+    """
+    Relaie les lignes d'une commande au client (/ws) pendant son exécution, via le flux
+    "custom" de LangGraph. Les lignes sont regroupées (nombre ou délai) et le relais
+    s'arrête après TERMINAL_STREAM_MAX_LINES lignes. Hors d'une exécution du graphe,
+    ne fait rien.
+    """
+
+    def __init__(self, command: str):
+        try:
+            from langgraph.config import get_stream_writer
+            self._writer = get_stream_writer()
+        except Exception:
+            self._writer = None
+        self.command = command
+        self.run_id = uuid.uuid4().hex[:8]
+        self._pending: list[str] = []
+        self._stream = "stdout"
+        self._last_flush = 0.0
+        self._sent = 0
+
+    def lines(self, stream: str, lines: list[str]):
+        if self._writer is None or not lines or self._sent >= TERMINAL_STREAM_MAX_LINES:
+            return
+        if stream != self._stream:
+            self.flush()
+            self._stream = stream
+        self._pending.extend(lines)
+        if len(self._pending) >= TERMINAL_STREAM_BATCH_LINES or time.monotonic() - self._last_flush >= TERMINAL_STREAM_INTERVAL:
+            self.flush()
+
+    def tick(self):
+        """Appelé périodiquement : envoie les lignes en attente depuis plus d'un intervalle."""
+        if self._pending and time.monotonic() - self._last_flush >= TERMINAL_STREAM_INTERVAL:
+            self.flush()
+
+    def flush(self, final: bool = False, summary: str | None = None):
+        if self._writer is None:
+            return
+        lines, self._pending = self._pending, []
+        budget = TERMINAL_STREAM_MAX_LINES - self._sent
+        if len(lines) > budget:
+            lines = lines[:budget] + ["... [streaming stopped, see the final summary]"]
+        self._sent += len(lines)
+        self._last_flush = time.monotonic()
+        if not lines and not final:
+            return
+        try:
+            self._writer({"terminal": {
+                "run_id": self.run_id, "command": self.command, "stream": self._stream,
+                "text": "\n".join(lines), "final": final, "summary": summary,
+            }})
+        except Exception as e:
+            logger.debug(f"Relais terminal indisponible : {e}")
+            self._writer = None
@@ -0,0 +1,75 @@
+# app/tools/page_cache.py
+import threading
+import time
+from pathlib import Path
+from app.config import WEB_CACHE_ENABLED, WEB_CACHE_PATH, WEB_CACHE_FRESHNESS, WEB_CACHE_MAX_BYTES
+from app.logger import get_logger
+from app.utils.sqlite_store import SQLiteLRUStore
+
+logger = get_logger("page_cache")
+
+
+class PageCache(SQLiteLRUStore):
+    """
+    Cache HTTP persistant (SQLite) des pages web, après extraction du texte.
+    - Frais (< `freshness` s) : servi directement, sans réseau ni parsing HTML.
+    - Périmé : l'appelant revalide avec un GET conditionnel (ETag / Last-Modified) ;
+      un 304 remet l'entrée à neuf via `touch`.
+    - Éviction LRU et budget en octets gérés par SQLiteLRUStore.
+    """
+
+    table = "pages"
+    key_column = "url"
+    columns = "text TEXT NOT NULL, etag TEXT, last_modified TEXT, fetched REAL NOT NULL"
+
+    def __init__(self, path: Path, freshness: int = WEB_CACHE_FRESHNESS, max_bytes: int = WEB_CACHE_MAX_BYTES):
+        super().__init__(path, max_bytes, counters=("hits", "misses", "stale", "revalidated"))
+        self.freshness = freshness
+
+    def get(self, url: str) -> dict | None:
+        """Entrée {text, etag, last_modified, fresh} ou None. Une entrée périmée reste lisible."""
+        now = time.time()
+        with self._lock:
+            row = self._select(url, "text, etag, last_modified, fetched")
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            text, etag, last_modified, fetched = row
+            fresh = now - fetched < self.freshness
+            self.stats["hits" if fresh else "stale"] += 1
+            self._mark_used(url, now)
+        return {"text": text, "etag": etag, "last_modified": last_modified, "fresh": fresh}
+
+    def set(self, url: str, text: str, etag: str | None = None, last_modified: str | None = None):
+        now = time.time()
+        with self._lock:
+            self._write(url, len(text.encode("utf-8")), now,
+                        text=text, etag=etag, last_modified=last_modified, fetched=now)
+
+    def touch(self, url: str):
+        """Revalidation réussie (304) : l'entrée redevient fraîche."""
+        now = time.time()
+        with self._lock:
+            self._mark_used(url, now, fetched=now)
+            self.stats["revalidated"] += 1
+
+    def _hit_rate(self, stats: dict) -> float:
+        # Hits réseau évités : entrées fraîches + revalidations 304 (pas de corps ni de parsing)
+        lookups = stats["hits"] + stats["stale"] + stats["misses"]
+        return round((stats["hits"] + stats["revalidated"]) / lookups, 3) if lookups else 0.0
+
+
+_cache: PageCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_page_cache() -> PageCache | None:
+    """Instance partagée, ou None si le cache est désactivé (WEB_CACHE_ENABLED)."""
+    global _cache
+    if not WEB_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = PageCache(WEB_CACHE_PATH)
+    return _cache
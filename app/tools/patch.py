@@ -0,0 +1,432 @@
+# app/tools/patch.py
+import difflib
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from app.config import PATCH_FUZZY_THRESHOLD
+from app.tools.atomic_io import unified_diff, write_atomic
+from app.logger import get_logger
+
+logger = get_logger("patch")
+
+_HUNK_HEADER_RE = re.compile(r"^@@+ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+_SEARCH, _DIVIDER, _REPLACE = "<<<<<<< SEARCH", "=======", ">>>>>>> REPLACE"
+
+
+class PatchError(ValueError):
+    """Patch illisible (format inconnu, en-tête de fichier manquant...)."""
+
+
+@dataclass
+class Hunk:
+    old: list[str]
+    new: list[str]
+    hint: int | None = None      # ligne (0-indexée) annoncée par l'en-tête @@, si présente
+    ok: bool = False
+    start: int | None = None     # position retenue dans le fichier d'origine
+    note: str = ""
+
+
+@dataclass
+class FilePatch:
+    path: str
+    hunks: list[Hunk] = field(default_factory=list)
+    create: bool = False
+    delete: bool = False
+    error: str = ""
+    original: str | None = None
+    result: str | None = None
+
+
+# ============================================================
+# PARSING
+# ============================================================
+
+def _clean_path(raw: str) -> str:
+    path = raw.split("\t")[0].strip().strip("`*\"'")
+    for prefix in ("File:", "file:", "#"):
+        if path.startswith(prefix):
+            path = path[len(prefix):].strip()
+    if path.startswith(("a/", "b/")):
+        path = path[2:]
+    return path
+
+
+def _file_patch(files: list[FilePatch], path: str) -> FilePatch:
+    for fp in files:
+        if fp.path == path:
+            return fp
+    files.append(FilePatch(path=path))
+    return files[-1]
+
+
+def _is_file_header(lines: list[str], i: int) -> bool:
+    """'--- ' n'ouvre un fichier que suivi de '+++ ' (sinon : ligne supprimée commençant par '-- ')."""
+    return lines[i].startswith("--- ") and i + 1 < len(lines) and lines[i + 1].startswith("+++ ")
+
+
+def _is_body(lines: list[str], i: int) -> bool:
+    return i < len(lines) and lines[i][:1] in (" ", "+", "-", "\\") and not _is_file_header(lines, i)
+
+
+def _read_hunk(lines: list[str], i: int, hunk: Hunk, old_left: int | None, new_left: int | None) -> int:
+    """
+    Lit le corps d'un hunk à partir de lines[i] ; renvoie l'indice de la ligne suivante.
+    Les compteurs de l'en-tête @@ tranchent les ambiguïtés : tant qu'il reste des lignes
+    supprimées et ajoutées à lire, '--- x' suivi de '+++ y' est du corps, pas un en-tête, et
+    une ligne vide est du contexte. Au-delà (compteurs faux, fréquents chez un modèle, ou
+    absents avec un '@@' nu), le hunk continue tant que les lignes sont des lignes de diff ;
+    une ligne vide n'y est du contexte que si le diff reprend après elle.
+    """
+    counted = old_left is not None
+    while i < len(lines):
+        body = lines[i]
+        pending = counted and (old_left > 0 or new_left > 0)
+        if body == "":
+            if not ((pending and i + 1 < len(lines)) or _is_body(lines, i + 1)):
+                break
+        elif body[0] not in " +-\\":
+            break                                # '@@', 'diff ...', texte hors diff
+        elif _is_file_header(lines, i) and not (pending and old_left > 0 and new_left > 0):
+            break
+        if body.startswith("\\"):
+            pass                                 # "\ No newline at end of file"
+        elif body.startswith("-"):
+            hunk.old.append(body[1:])
+            old_left = old_left - 1 if counted else None
+        elif body.startswith("+"):
+            hunk.new.append(body[1:])
+            new_left = new_left - 1 if counted else None
+        else:                                    # contexte (" x" ou ligne vide tronquée par le modèle)
+            hunk.old.append(body[1:])
+            hunk.new.append(body[1:])
+            if counted:
+                old_left, new_left = old_left - 1, new_left - 1
+        i += 1
+    return i
+
+
+def _parse_unified(lines: list[str]) -> list[FilePatch]:
+    files: list[FilePatch] = []
+    current = None
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        if _is_file_header(lines, i):
+            old_path, new_path = _clean_path(line[4:]), _clean_path(lines[i + 1][4:])
+            current = _file_patch(files, old_path if new_path == "/dev/null" else new_path)
+            current.create = old_path == "/dev/null"
+            current.delete = new_path == "/dev/null"
+            i += 2
+            continue
+        if line.startswith("@@"):
+            if current is None:
+                raise PatchError("hunk found before any '--- a/file' / '+++ b/file' header")
+            header = _HUNK_HEADER_RE.match(line)
+            hunk = Hunk(old=[], new=[], hint=int(header.group(1)) - 1 if header else None)
+            counts = (int(header.group(2) or 1), int(header.group(4) or 1)) if header else (None, None)
+            i = _read_hunk(lines, i + 1, hunk, *counts)
+            current.hunks.append(hunk)
+            continue
+        i += 1
+    return files
+
+
+def _parse_search_replace(lines: list[str]) -> list[FilePatch]:
+    files: list[FilePatch] = []
+    candidate, last_path = None, None
+    i = 0
+    while i < len(lines):
+        stripped = lines[i].strip()
+        if stripped == _SEARCH:
+            path = candidate or last_path
+            if not path:
+                raise PatchError("SEARCH block without a file name on the line above it")
+            old, new = [], []
+            i += 1
+            while i < len(lines) and lines[i].strip() != _DIVIDER:
+                old.append(lines[i])
+                i += 1
+            i += 1
+            while i < len(lines) and lines[i].strip() != _REPLACE:
+                new.append(lines[i])
+                i += 1
+            if i >= len(lines):
+                raise PatchError(f"unterminated SEARCH/REPLACE block for {path}")
+            fp = _file_patch(files, path)
+            fp.hunks.append(Hunk(old=old, new=new))
+            fp.create = fp.create or (not old and len(fp.hunks) == 1)
+            last_path, candidate = path, None
+        elif stripped and not stripped.startswith("```"):
+            candidate = _clean_path(stripped)
+        i += 1
+    return files
+
+
+def parse_patch(text: str) -> list[FilePatch]:
+    lines = text.replace("\r\n", "\n").split("\n")
+    if any(line.strip() == _SEARCH for line in lines):
+        files = _parse_search_replace(lines)
+    elif any(line.startswith("@@") for line in lines):
+        files = _parse_unified(lines)
+    else:
+        raise PatchError("expected a unified diff (---/+++/@@) or SEARCH/REPLACE blocks")
+    if not files:
+        raise PatchError("no file in patch")
+    return files
+
+
+# ============================================================
+# LOCALISATION DES HUNKS
+# ============================================================
+
+_LEVELS = (
+    ("exact", lambda s: s),
+    ("trailing whitespace", str.rstrip),
+    ("indentation", str.strip),
+)
+
+
+def _matches(lines: list[str], old: list[str], norm) -> list[int]:
+    want = [norm(x) for x in old]
+    first, k = want[0], len(want)
+    return [
+        p for p in range(len(lines) - k + 1)
+        if norm(lines[p]) == first and all(norm(lines[p + j]) == want[j] for j in range(1, k))
+    ]
+
+
+def _closest(lines: list[str], old: list[str]) -> tuple[int, float]:
+    """(position, similarité) de la fenêtre la plus proche du contexte attendu."""
+    k = len(old)
+    target = "\n".join(x.strip() for x in old)
+    matcher = difflib.SequenceMatcher(autojunk=False)
+    matcher.set_seq2(target)
+    best, best_ratio = 0, 0.0
+    for p in range(max(1, len(lines) - k + 1)):
+        matcher.set_seq1("\n".join(x.strip() for x in lines[p:p + k]))
+        if matcher.real_quick_ratio() <= best_ratio or matcher.quick_ratio() <= best_ratio:
+            continue
+        ratio = matcher.ratio()
+        if ratio > best_ratio:
+            best, best_ratio = p, ratio
+    return best, best_ratio
+
+
+def _indent(line: str) -> str:
+    return line[:len(line) - len(line.lstrip())]
+
+
+def _reindent(hunk: Hunk, lines: list[str], start: int) -> list[str]:
+    """
+    Traduit l'indentation des lignes ajoutées dans celle du fichier, d'après les lignes de
+    contexte appariées (ex. patch indenté à 2 espaces, fichier à 4).
+    """
+    mapping = {}
+    for j, old_line in enumerate(hunk.old):
+        if old_line.strip():
+            mapping.setdefault(_indent(old_line), _indent(lines[start + j]))
+    if all(want == have for want, have in mapping.items()):
+        return hunk.new
+    out = []
+    for line in hunk.new:
+        indent = _indent(line)
+        if indent in mapping:
+            out.append(mapping[indent] + line[len(indent):])
+        else:
+            # Indentation inconnue : on applique l'écart du préfixe connu le plus long
+            base = max((w for w in mapping if indent.startswith(w)), key=len, default=None)
+            out.append(mapping[base] + line[len(base):] if base is not None else line)
+    return out
+
+
+def _merge_drifted(hunk: Hunk, lines: list[str], start: int) -> list[str] | None:
+    """
+    Hunk localisé par similarité : le contexte du patch a dérivé, il ne doit pas écraser le
+    fichier. Les lignes de contexte gardent leur version du fichier ; seules les lignes '-'
+    (qui doivent bien être celles du fichier) et '+' s'appliquent. None si une ligne à
+    supprimer ne correspond pas (hunk.note décrit l'écart).
+    """
+    window = lines[start:start + len(hunk.old)]
+    if len(window) < len(hunk.old):
+        hunk.note = f"context drifted past the end of the file (line {start + 1})"
+        return None
+    ops = difflib.SequenceMatcher(None, hunk.old, hunk.new, autojunk=False).get_opcodes()
+    out = []
+    for op, i1, i2, j1, j2 in ops:
+        if op == "equal":
+            out.extend(window[i1:i2])            # contexte : la version du fichier fait foi
+            continue
+        for i in range(i1, i2):
+            if window[i].strip() != hunk.old[i].strip():
+                hunk.note = (f"line {start + i + 1} to remove has drifted: file has {window[i].strip()!r}, "
+                             f"patch expects {hunk.old[i].strip()!r}")
+                return None
+        out.extend(hunk.new[j1:j2])
+    return out
+
+
+def _locate(hunk: Hunk, lines: list[str], cursor: int) -> list[str]:
+    """Positionne le hunk (hunk.start) et renvoie les lignes de remplacement."""
+    if not hunk.old:
+        hunk.start = len(lines) if hunk.hint is None else min(max(hunk.hint, 0), len(lines))
+        hunk.ok = True
+        return hunk.new
+    for level, norm in _LEVELS:
+        found = _matches(lines, hunk.old, norm)
+        if not found:
+            continue
+        if hunk.hint is not None:
+            start = min(found, key=lambda p: abs(p - hunk.hint))
+        else:
+            start = next((p for p in found if p >= cursor), found[0])
+        hunk.start, hunk.ok = start, True
+        if level != "exact":
+            hunk.note = f"fuzzy: {level}"
+        return _reindent(hunk, lines, start) if level == "indentation" else hunk.new
+    start, ratio = _closest(lines, hunk.old)
+    if ratio >= PATCH_FUZZY_THRESHOLD:
+        merged = _merge_drifted(hunk, lines, start)
+        if merged is not None:
+            hunk.start, hunk.ok = start, True
+            hunk.note = f"fuzzy: {ratio:.0%} similar"
+            return merged
+        return hunk.new
+    hunk.note = f"context not found (closest: line {start + 1}, {ratio:.0%} similar)"
+    return hunk.new
+
+
+def _apply_file(fp: FilePatch, text: str):
+    """Applique tous les hunks d'un fichier en une passe ; fp.result = None si un hunk échoue."""
+    newline = "\r\n" if "\r\n" in text else "\n"
+    trailing = text.endswith("\n") or not text
+    lines = text.split(newline)
+    if trailing and lines and lines[-1] == "":
+        lines.pop()
+
+    edits, cursor = [], 0
+    for hunk in fp.hunks:
+        new = _locate(hunk, lines, cursor)
+        if hunk.ok:
+            edits.append((hunk.start, hunk.start + len(hunk.old), new, hunk))
+            cursor = hunk.start + len(hunk.old)
+
+    out, pos = [], 0
+    for start, end, new, hunk in sorted(edits, key=lambda e: (e[0], e[1])):
+        if start < pos:
+            hunk.ok, hunk.note = False, "overlaps a previous hunk"
+            continue
+        out.extend(lines[pos:start])
+        out.extend(new)
+        pos = end
+    out.extend(lines[pos:])
+    if all(h.ok for h in fp.hunks):
+        fp.result = newline.join(out) + (newline if trailing and out else "")
+
+
+# ============================================================
+# APPLICATION (tout ou rien)
+# ============================================================
+
+def apply_patch_text(text: str, resolve) -> tuple[list[FilePatch], list[Path]]:
+    """
+    Parse et applique `text`. `resolve(chemin)` → Path absolu sûr (sandbox).
+    Rien n'est écrit si un seul hunk échoue. Retourne (fichiers, chemins modifiés).
+    """
+    files = parse_patch(text)
+    paths = {}
+    for fp in files:
+        try:
+            path = paths[fp.path] = resolve(fp.path)
+        except ValueError as e:
+            fp.error = str(e)
+            continue
+        if fp.create and path.exists():
+            fp.error = "file already exists"
+            continue
+        if fp.create:
+            fp.original = ""
+        elif not path.is_file():
+            fp.error = "file not found"
+            continue
+        else:
+            try:
+                with open(path, encoding="utf-8", newline="") as f:
+                    fp.original = f.read()
+            except UnicodeDecodeError:
+                fp.error = "not a UTF-8 text file"
+                continue
+        if fp.delete:
+            fp.result = None
+            for hunk in fp.hunks:
+                hunk.ok = True
+        else:
+            _apply_file(fp, fp.original)
+
+    if any(fp.error or not all(h.ok for h in fp.hunks) for fp in files):
+        return files, []
+
+    written = []
+    try:
+        for fp in files:
+            path = paths[fp.path]
+            if fp.delete:
+                path.unlink()
+            elif fp.result != fp.original:
+                write_atomic(path, fp.result)
+            else:
+                continue
+            written.append(fp)
+    except OSError as e:
+        # Retour arrière des fichiers déjà remplacés
+        for done in written:
+            if done.create and not done.original:
+                paths[done.path].unlink(missing_ok=True)
+            else:
+                write_atomic(paths[done.path], done.original)
+        logger.error(f"❌ Patch annulé : {e}")
+        raise
+    return files, [paths[fp.path] for fp in written]
+
+
+def format_report(files: list[FilePatch], applied: bool) -> str:
+    hunks = [h for fp in files for h in fp.hunks]
+    ok = sum(h.ok for h in hunks)
+    if applied and not any(fp.delete or fp.result != fp.original for fp in files):
+        # Hunks localisés mais sans effet : '-' et '+' identiques, ou patch mal compris
+        lines = [f"Error: patch matched ({ok}/{len(hunks)} hunks) but changed nothing — "
+                 f"its removed and added lines are identical. No file changed."]
+    elif applied:
+        lines = [f"Success: patch applied to {len(files)} file(s), {ok}/{len(hunks)} hunks."]
+    else:
+        lines = [f"Error: patch NOT applied (no file changed), {len(hunks) - ok}/{len(hunks)} hunks failed."]
+    diffs = []
+    for fp in files:
+        if fp.error:
+            lines.append(f"- {fp.path}: ✗ {fp.error}")
+            continue
+        if fp.delete:
+            lines.append(f"- {fp.path}: deleted")
+            continue
+        parts = []
+        for n, hunk in enumerate(fp.hunks, 1):
+            where = f"line {hunk.start + 1}" if hunk.start is not None else ""
+            detail = ", ".join(x for x in (where, hunk.note) if x)
+            parts.append(f"hunk {n} {'✓' if hunk.ok else '✗'}" + (f" ({detail})" if detail else ""))
+        label = " (created)" if fp.create and not fp.original else ""
+        if applied and fp.result is not None:
+            if fp.result == fp.original:
+                label += " (unchanged)"
+            else:
+                diff, added, removed = unified_diff(fp.original, fp.result, fp.path)
+                label += f" (+{added} -{removed})"
+                diffs.append(diff)
+        lines.append(f"- {fp.path}{label}: " + "; ".join(parts))
+        if not applied:
+            for n, hunk in enumerate(fp.hunks, 1):
+                if not hunk.ok and hunk.old:
+                    expected = "\n".join(hunk.old[:8])
+                    lines.append(f"  hunk {n} expected:\n{expected}")
+    if diffs:
+        lines.append("[DIFF]" + "\n".join(diffs) + "[/DIFF]")
+    return "\n".join(lines)
@@ -0,0 +1,304 @@
+# app/tools/python_pool.py
+import atexit
+import json
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import threading
+import time
+from pathlib import Path
+from app.config import (
+    PYTHON_POOL_PRELOAD, PYTHON_POOL_MAX_RUNS, PYTHON_POOL_START_TIMEOUT, TERMINAL_STREAM_INTERVAL,
+)
+from app.logger import get_logger
+from app.tools.output_capture import OutputCapture, TerminalStream
+from app.tools.shell_session import ShellResult
+
+logger = get_logger("terminal")
+
+WORKER_SCRIPT = Path(__file__).with_name("python_worker.py")
+
+PYTHON_NAMES = {"python", "python3", "python3.10", "python3.11"}
+# Modules qui modifient l'environnement Python lui-même : toujours via le shell
+SHELL_ONLY_MODULES = {"pip", "venv", "ensurepip"}
+# Commandes après lesquelles les modules préchargés peuvent être périmés
+PACKAGE_COMMANDS = {"pip", "pip3", "pipx", "poetry", "pipenv", "conda", "mamba"}
+# Caractères que bash développe hors guillemets (globs, accolades, ~, variables)
+_EXPANDING = set("*?[]{}~$")
+
+
+# ============================================================
+# ROUTAGE
+# ============================================================
+
+def _interpreter(name: str) -> str | None:
+    path = shutil.which(name)
+    return os.path.realpath(path) if path else None
+
+
+def _pytest_interpreter() -> str | None:
+    """Interpréteur qui exécuterait `pytest` : shebang du script, sinon le python3 du même dossier."""
+    script = shutil.which("pytest")
+    if not script:
+        return None
+    try:
+        with open(script, "rb") as f:
+            first = f.readline(256).decode("utf-8", errors="replace")
+    except OSError:
+        return None
+    if first.startswith("#!") and "python" in Path(first[2:].split()[0]).name:
+        return os.path.realpath(first[2:].split()[0])
+    python = shutil.which("python3", path=str(Path(script).parent))
+    return os.path.realpath(python) if python else None
+
+
+def shell_expands(command: str) -> bool:
+    """
+    bash développerait-il quelque chose dans `command` ? Globs, accolades et ~ hors guillemets,
+    $ hors apostrophes. shlex ne fait aucun de ces développements : une telle commande passe
+    par le shell, pour que son résultat ne dépende pas de l'état du pool.
+    """
+    quote = None
+    escaped = False
+    for ch in command:
+        if escaped:
+            escaped = False
+        elif quote == "'":
+            quote = None if ch == "'" else quote
+        elif ch == "\\":
+            escaped = True
+        elif quote == '"':
+            if ch == '"':
+                quote = None
+            elif ch == "$":
+                return True
+        elif ch in "'\"":
+            quote = ch
+        elif ch in _EXPANDING:
+            return True
+    return False
+
+
+def python_job(parts: list[str]) -> tuple[str, dict] | None:
+    """
+    `python script.py ...`, `python -m mod ...`, `python -c code ...` ou `pytest ...`
+    → (interpréteur, job). None pour tout le reste (REPL, options exotiques, pip...).
+    """
+    name, args = parts[0], parts[1:]
+    if name == "pytest":
+        interpreter = _pytest_interpreter()
+        return (interpreter, {"mode": "module", "target": "pytest", "args": args}) if interpreter else None
+    if name not in PYTHON_NAMES:
+        return None
+    while args and args[0] in ("-u", "-B"):
+        args = args[1:]  # sans effet ici : sortie déjà non bufferisée, enfant éphémère
+    if not args:
+        return None
+    interpreter = _interpreter(name)
+    if interpreter is None:
+        return None
+    if args[0] == "-m" and len(args) > 1 and args[1].split(".")[0] not in SHELL_ONLY_MODULES:
+        return interpreter, {"mode": "module", "target": args[1], "args": args[2:]}
+    if args[0] == "-c" and len(args) > 1:
+        return interpreter, {"mode": "code", "target": args[1], "args": args[2:]}
+    if not args[0].startswith("-"):
+        return interpreter, {"mode": "script", "target": args[0], "args": args[1:]}
+    return None
+
+
+def changes_packages(parts: list[str]) -> bool:
+    return parts[0] in PACKAGE_COMMANDS or (parts[0] in PYTHON_NAMES and parts[1:3] == ["-m", "pip"])
+
+
+# ============================================================
+# POOL
+# ============================================================
+
+class PythonPool:
+    """
+    Interpréteur Python chaud d'un sandbox : un gabarit (python_worker.py) qui a déjà importé
+    PYTHON_POOL_PRELOAD et fork un enfant par exécution. Un script court ne paie donc ni le
+    démarrage de l'interpréteur ni ses imports lourds (quelques ms au lieu de centaines).
+    Le gabarit démarre en arrière-plan au premier appel (qui passe encore par le shell) et
+    est recyclé toutes les PYTHON_POOL_MAX_RUNS exécutions.
+    """
+
+    def __init__(self, root: Path, interpreter: str):
+        self.root = root
+        self.interpreter = interpreter
+        self.runs = 0
+        self.preloaded: list[str] = []
+        self._proc: subprocess.Popen | None = None
+        self._sock: socket.socket | None = None
+        self._lock = threading.Lock()
+        self._starting = False
+
+    # ── cycle de vie ──
+
+    @property
+    def ready(self) -> bool:
+        return self._sock is not None and self._proc is not None and self._proc.poll() is None
+
+    def warm(self):
+        """Démarre le gabarit en arrière-plan (sans effet s'il tourne ou démarre déjà)."""
+        with self._lock:
+            if self._starting or self.ready:
+                return
+            self._starting = True
+        threading.Thread(target=self._start, daemon=True).start()
+
+    def _start(self):
+        parent, child = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        try:
+            start = time.monotonic()
+            proc = subprocess.Popen(
+                [self.interpreter, "-u", str(WORKER_SCRIPT), str(child.fileno()), ",".join(PYTHON_POOL_PRELOAD)],
+                pass_fds=(child.fileno(),),
+                cwd=str(self.root),
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                env={**os.environ, "TERM": "dumb", "PAGER": "cat", "PYTHONUNBUFFERED": "1"},
+                start_new_session=True,
+            )
+            child.close()
+            parent.settimeout(PYTHON_POOL_START_TIMEOUT)
+            hello = json.loads(parent.recv(65536) or b"{}")
+            if "ready" not in hello:
+                raise RuntimeError("le gabarit s'est arrêté au démarrage")
+            parent.settimeout(None)
+            with self._lock:
+                self._proc, self._sock = proc, parent
+                self.preloaded = hello["ready"]
+                self.runs = 0
+            logger.info(f"🐍 Pool Python prêt ({Path(self.interpreter).name}, {len(self.preloaded)} modules préchargés, "
+                        f"{time.monotonic() - start:.2f}s)")
+        except Exception as e:
+            child.close()
+            parent.close()
+            logger.warning(f"🐍 Pool Python indisponible ({self.interpreter}) : {e}")
+        finally:
+            self._starting = False
+
+    def _stop(self):
+        proc, sock = self._proc, self._sock
+        self._proc = self._sock = None
+        if sock is not None:
+            sock.close()  # le gabarit voit la fin de flux et s'arrête
+        if proc is not None:
+            try:
+                proc.wait(timeout=1)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.wait()
+
+    def close(self):
+        with self._lock:
+            self._stop()
+
+    # ── exécution ──
+
+    def run(self, job: dict, cwd: Path, stream: TerminalStream, timeout: float) -> ShellResult | None:
+        """Exécute `job` dans un enfant du gabarit. None si le gabarit n'a pas pu le prendre."""
+        with self._lock:
+            if not self.ready:
+                return None
+            out_r, out_w = os.pipe()
+            err_r, err_w = os.pipe()
+            try:
+                socket.send_fds(self._sock, [json.dumps({**job, "cwd": str(cwd)}).encode()], [out_w, err_w])
+                self._sock.settimeout(5)
+                pid = json.loads(self._sock.recv(65536))["pid"]
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"🐍 Gabarit Python injoignable, retour au shell : {e}")
+                os.close(out_r)
+                os.close(err_r)
+                self._stop()
+                return None
+            finally:
+                os.close(out_w)
+                os.close(err_w)
+
+            stdout, stderr = OutputCapture(), OutputCapture()
+            lock = threading.Lock()
+            readers = [
+                threading.Thread(target=_pump, args=(out_r, "stdout", stdout, stream, lock), daemon=True),
+                threading.Thread(target=_pump, args=(err_r, "stderr", stderr, stream, lock), daemon=True),
+            ]
+            for reader in readers:
+                reader.start()
+
+            deadline = time.monotonic() + timeout
+            timed_out = False
+            returncode = -1
+            self._sock.settimeout(TERMINAL_STREAM_INTERVAL)
+            while True:
+                try:
+                    returncode = json.loads(self._sock.recv(65536))["exit"]
+                    break
+                except socket.timeout:
+                    with lock:
+                        stream.tick()
+                    if not timed_out and time.monotonic() >= deadline:
+                        timed_out = True
+                        try:
+                            os.killpg(pid, signal.SIGKILL)
+                        except ProcessLookupError:
+                            pass
+                except (OSError, ValueError, KeyError):
+                    self._stop()  # gabarit mort en cours de route
+                    break
+            for reader in readers:
+                reader.join(timeout=5)
+
+            self.runs += 1
+            recycle = self.runs >= PYTHON_POOL_MAX_RUNS
+            if recycle:
+                self._stop()
+        if recycle:
+            self.warm()
+        return ShellResult(returncode, stdout, stderr, None, timed_out=timed_out)
+
+
+def _pump(fd: int, name: str, capture: OutputCapture, stream: TerminalStream, lock: threading.Lock):
+    try:
+        while chunk := os.read(fd, 65536):
+            lines = capture.feed(chunk)
+            with lock:
+                stream.lines(name, lines)
+        with lock:
+            stream.lines(name, capture.close())
+    finally:
+        os.close(fd)
+
+
+# ============================================================
+# REGISTRE (un pool par sandbox et par interpréteur)
+# ============================================================
+_POOLS: dict[tuple[str, str], PythonPool] = {}
+_LOCK = threading.Lock()
+
+
+def get_python_pool(root: Path, interpreter: str) -> PythonPool:
+    key = (str(root), interpreter)
+    with _LOCK:
+        pool = _POOLS.get(key)
+        if pool is None:
+            pool = _POOLS[key] = PythonPool(root, interpreter)
+        return pool
+
+
+def discard_python_pools(root: Path):
+    """Arrête les pools du sandbox (fermeture de session, paquets installés ou mis à jour)."""
+    with _LOCK:
+        pools = [_POOLS.pop(key) for key in list(_POOLS) if key[0] == str(root)]
+    for pool in pools:
+        pool.close()
+
+
+@atexit.register
+def _close_pools():
+    for pool in list(_POOLS.values()):
+        pool.close()
@@ -0,0 +1,146 @@
+# app/tools/python_worker.py
+"""
+Gabarit chaud du pool Python : lancé comme script par app/tools/python_pool.py (jamais importé).
+
+Importe une fois les modules courants, puis fork un enfant neuf par exécution. L'enfant
+hérite des imports déjà faits mais ses globals, ses modules importés en plus et l'état de
+l'interpréteur disparaissent avec lui : deux exécutions ne partagent rien.
+
+Protocole (socket AF_UNIX SOCK_SEQPACKET, un message JSON par paquet) :
+    → {"ready": [modules préchargés]}
+    ← {"mode": "script"|"module"|"code", "target": ..., "args": [...], "cwd": ...} + 2 fds (stdout, stderr)
+    → {"pid": n}      dès le fork (le parent peut tuer le groupe de l'enfant en cas de timeout)
+    → {"exit": code}  à la fin de l'enfant
+"""
+import json
+import os
+import socket
+import sys
+
+
+def _preload(names: list[str]) -> list[str]:
+    loaded = []
+    for name in names:
+        try:
+            __import__(name)
+            loaded.append(name)
+        except Exception:
+            pass
+    if "pytest" in loaded:
+        # L'essentiel du démarrage de pytest : les plugins déclarés (entry points pytest11)
+        from importlib.metadata import entry_points
+        for ep in entry_points(group="pytest11"):
+            try:
+                __import__(ep.module)
+            except Exception:
+                pass
+    return loaded
+
+
+def _exit_code(e: SystemExit) -> int:
+    if e.code is None:
+        return 0
+    if isinstance(e.code, int):
+        return e.code
+    print(e.code, file=sys.stderr)
+    return 1
+
+
+def _print_traceback():
+    """Traceback sans les frames du gabarit ni de runpy, comme l'afficherait `python script.py`."""
+    import traceback
+    kind, error, tb = sys.exc_info()
+    while tb is not None and (tb.tb_frame.f_code.co_filename == __file__
+                              or "runpy" in tb.tb_frame.f_code.co_filename):
+        tb = tb.tb_next
+    traceback.print_exception(kind, error, tb)
+
+
+def _child(job: dict, fds: list[int]):
+    os.setsid()  # groupe dédié : un timeout tue aussi les sous-processus du script
+    os.dup2(fds[0], 1)
+    os.dup2(fds[1], 2)
+    for fd in fds:
+        os.close(fd)
+    null = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(null, 0)
+    os.close(null)
+    os.chdir(job["cwd"])
+
+    import runpy
+    import types
+    # Le générateur global de NumPy n'est pas ré-initialisé par fork (celui de `random` l'est)
+    if "numpy.random" in sys.modules:
+        sys.modules["numpy.random"].seed()
+
+    mode, target, args = job["mode"], job["target"], job["args"]
+    code = 0
+    try:
+        if mode == "script":
+            if not os.path.exists(target):
+                print(f"python: can't open file {os.path.abspath(target)!r}: [Errno 2] No such file or directory",
+                      file=sys.stderr)
+                os._exit(2)
+            sys.argv = [target, *args]
+            sys.path.insert(0, os.path.dirname(os.path.abspath(target)))
+            runpy.run_path(target, run_name="__main__")
+        elif mode == "module":
+            if target == "pytest":
+                # Plugins préchargés : pytest ne peut plus réécrire leurs assert, ce n'est pas une erreur
+                os.environ["PYTEST_ADDOPTS"] = (os.environ.get("PYTEST_ADDOPTS", "")
+                                                + " -W ignore::pytest.PytestAssertRewriteWarning").strip()
+            sys.argv = [target, *args]
+            sys.path.insert(0, os.getcwd())
+            runpy.run_module(target, run_name="__main__", alter_sys=True)
+        else:
+            sys.argv = ["-c", *args]
+            sys.path.insert(0, "")
+            main = types.ModuleType("__main__")  # pas celui du gabarit : ses globals restent intacts
+            sys.modules["__main__"] = main
+            exec(compile(target, "<string>", "exec"), main.__dict__)
+    except SystemExit as e:
+        code = _exit_code(e)
+    except BaseException:
+        _print_traceback()
+        code = 1
+
+    # Fin "normale" d'interpréteur : threads non-daemon, atexit, tampons
+    try:
+        import threading
+        threading._shutdown()
+        import atexit
+        atexit._run_exitfuncs()
+        sys.stdout.flush()
+        sys.stderr.flush()
+    except BaseException:
+        pass
+    os._exit(code & 0xFF)
+
+
+def main():
+    sock = socket.socket(fileno=int(sys.argv[1]))
+    sys.path.pop(0)  # dossier de ce fichier : ne doit pas masquer les modules du projet
+    loaded = _preload([m for m in sys.argv[2].split(",") if m] if len(sys.argv) > 2 else [])
+    sock.send(json.dumps({"ready": loaded}).encode())
+
+    while True:
+        try:
+            msg, fds, _, _ = socket.recv_fds(sock, 1 << 20, 2)
+        except OSError:
+            break
+        if not msg:
+            break  # l'application s'est arrêtée
+        job = json.loads(msg)
+        pid = os.fork()
+        if pid == 0:
+            sock.close()
+            _child(job, fds)
+        for fd in fds:
+            os.close(fd)
+        sock.send(json.dumps({"pid": pid}).encode())
+        _, status = os.waitpid(pid, 0)
+        sock.send(json.dumps({"exit": os.waitstatus_to_exitcode(status)}).encode())
+
+
+if __name__ == "__main__":
+    main()
@@ -3,15 +3,22 @@
 VALID_TOOLS = {
     "web_search", "fetch_web_page", "smart_web_fetch",
     "write_file", "read_file_content", "replace_lines",
-    "list_project_structure", "run_terminal"
+    "list_project_structure", "search_code", "apply_patch", "run_terminal",
+    "write_files", "make_dirs", "move_paths"
 }
 
 SAFE_TOOLS_NO_REVIEW = {
     "web_search", "fetch_web_page", "read_file_content",
-    "list_project_structure", "replace_lines",
+    "list_project_structure", "search_code", "replace_lines", "apply_patch", "make_dirs",
     "smart_web_fetch", "run_terminal"
 }
 
+# Outils sans effet de bord : plusieurs appels d'un même tour peuvent tourner en parallèle
+READ_ONLY_TOOLS = {
+    "web_search", "fetch_web_page", "smart_web_fetch",
+    "read_file_content", "list_project_structure", "search_code"
+}
+
 TOOL_ALIASES = {
     "read_file": "read_file_content",
     "read": "read_file_content",
@@ -39,21 +46,44 @@ TOOL_ALIASES = {
     "ls": "list_project_structure",
     "list_dir": "list_project_structure",
     "tree": "list_project_structure",
+    "grep": "search_code",
+    "code_search": "search_code",
+    "find_in_files": "search_code",
+    "search_files": "search_code",
     "create_file": "write_file",
     "save_file": "write_file",
     "edit_file": "replace_lines",
+    "create_files": "write_files",
+    "write_multiple_files": "write_files",
+    "save_files": "write_files",
+    "mkdir": "make_dirs",
+    "create_dirs": "make_dirs",
+    "create_directories": "make_dirs",
+    "move": "move_paths",
+    "mv": "move_paths",
+    "rename": "move_paths",
+    "move_files": "move_paths",
+    "patch": "apply_patch",
+    "apply_diff": "apply_patch",
+    "edit_files": "apply_patch",
+    "search_replace": "apply_patch",
 }
 
 VALID_TOOLS_LIST_STR = ", ".join(sorted(VALID_TOOLS))
 
 TOOLS_MANIFEST = """### AVAILABLE TOOLS (use EXACT names — any other name will fail) ###
-- read_file_content(file_path): Read a file's content. File path is RELATIVE (e.g., "snake_game.py").
+- read_file_content(file_path, start_line=0, end_line=0): Read a file, line-numbered ("12 | code", the numbers are NOT part of the file). File path is RELATIVE (e.g., "snake_game.py"). Use start_line/end_line for large files.
 - write_file(file_path, content): Create or overwrite a file.
+- write_files(files): Create/overwrite SEVERAL files in ONE call, files = [{"file_path": ..., "content": ...}]. Use it to scaffold a project.
+- make_dirs(paths): Create several directories at once.
+- move_paths(moves): Move/rename files, moves = [{"src": ..., "dst": ...}].
 - replace_lines(file_path, start_line, end_line, new_content): Edit specific lines in a file.
-- list_project_structure(): List all files in the project.
+- apply_patch(patch): Edit existing files with a unified diff or SEARCH/REPLACE blocks (several hunks and files in ONE call). Prefer it over write_file/replace_lines to modify existing code.
+- list_project_structure(path="", max_depth=0, offset=0, limit=100): List project files with sizes (skips .gitignore'd and dependency dirs; page with offset).
+- search_code(query, regex=False, path="", case_sensitive=False, context=1): Search the project files (ranked file:line hits). Prefer it over run_terminal("grep ...").
 - run_terminal(command): Execute a shell command (ls, cat, grep, head, etc.).
 - web_search(query): Search the internet via DuckDuckGo.
-- fetch_web_page(url): Fetch a webpage's text content.
+- fetch_web_page(url, query): Fetch a webpage's text content. Optional query → only the most relevant passages.
 - smart_web_fetch(query): Search + fetch best result in one shot.
 
 ⚠️ CRITICAL RULES:
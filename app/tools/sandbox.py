@@ -0,0 +1,131 @@
+# app/tools/sandbox.py
+import re
+import shutil
+import threading
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from pathlib import Path
+from app.config import SANDBOX_PATH, SESSIONS_PATH
+from app.tools.file_index import discard_file_index
+from app.tools.code_search import discard_code_index
+from app.tools.shell_session import close_shell
+from app.tools.python_pool import discard_python_pools
+from app.tools.command_cache import discard_command_cache
+from app.logger import get_logger
+
+logger = get_logger("sandbox")
+
+_SESSION_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+@dataclass
+class SandboxSession:
+    """Espace de travail isolé : un dossier racine + le dossier courant du terminal."""
+    session_id: str
+    root: Path
+    cwd: Path
+
+    def contains(self, path: Path) -> bool:
+        return path.resolve().is_relative_to(self.root.resolve())
+
+
+# Registre des sessions, clé = str(root) (c'est ce que DevState.root_dir transporte)
+_SESSIONS: dict[str, SandboxSession] = {}
+_LOCK = threading.Lock()
+
+# Session active pour l'exécution courante (posée par le nœud "tools")
+_current: ContextVar[SandboxSession | None] = ContextVar("sandbox_session", default=None)
+
+
+def _register(session_id: str, root: Path) -> SandboxSession:
+    key = str(root)
+    with _LOCK:
+        session = _SESSIONS.get(key)
+        if session is None:
+            root.mkdir(parents=True, exist_ok=True)
+            session = SandboxSession(session_id=session_id, root=root, cwd=root)
+            _SESSIONS[key] = session
+        return session
+
+
+def default_session() -> SandboxSession:
+    """Sandbox partagé historique (CLI, requêtes sans session)."""
+    return _register("default", SANDBOX_PATH)
+
+
+def create_session(session_id: str | None = None) -> SandboxSession:
+    """Crée (ou retrouve) la session `session_id` dans SESSIONS_PATH."""
+    session_id = session_id or uuid.uuid4().hex[:12]
+    if not _SESSION_ID_RE.match(session_id):
+        raise ValueError(f"Invalid session id: {session_id!r}")
+    session = _register(session_id, SESSIONS_PATH / session_id)
+    logger.info(f"📦 Session sandbox : {session.session_id} → {session.root}")
+    return session
+
+
+def find_session(session_id: str) -> SandboxSession | None:
+    if session_id == "default":
+        return default_session()
+    if not _SESSION_ID_RE.match(session_id or ""):
+        return None
+    return _SESSIONS.get(str(SESSIONS_PATH / session_id))
+
+
+def session_for_root(root_dir: str | None) -> SandboxSession:
+    """Résout DevState.root_dir vers sa session (le sandbox par défaut si vide)."""
+    if not root_dir:
+        return default_session()
+    session = _SESSIONS.get(root_dir)
+    if session is not None:
+        return session
+    root = Path(root_dir)
+    if root.resolve() == SANDBOX_PATH.resolve():
+        return default_session()
+    return _register(root.name, root)
+
+
+def current_session() -> SandboxSession:
+    return _current.get() or default_session()
+
+
+@contextmanager
+def use_sandbox(root_dir: str | None):
+    """Active la session de `root_dir` pour les outils exécutés dans ce contexte."""
+    token = _current.set(session_for_root(root_dir))
+    try:
+        yield _current.get()
+    finally:
+        _current.reset(token)
+
+
+def clean_session(session: SandboxSession):
+    """Supprime le contenu du sandbox de la session et remet le cwd à la racine."""
+    for item in session.root.iterdir():
+        if item.is_dir():
+            shutil.rmtree(item)
+        else:
+            item.unlink()
+    session.cwd = session.root
+    discard_file_index(session.root)
+    discard_code_index(session.root)
+    close_shell(session.root)
+    discard_python_pools(session.root)
+    discard_command_cache(session.root)
+
+
+def close_session(session_id: str):
+    """Oublie la session et supprime son dossier (jamais le sandbox par défaut)."""
+    if session_id == "default":
+        return
+    with _LOCK:
+        session = _SESSIONS.pop(str(SESSIONS_PATH / session_id), None)
+    if session is not None:
+        discard_file_index(session.root)
+        discard_code_index(session.root)
+        close_shell(session.root)
+        discard_python_pools(session.root)
+        discard_command_cache(session.root)
+        shutil.rmtree(session.root, ignore_errors=True)
+        logger.info(f"🧹 Session sandbox fermée : {session_id}")
@@ -0,0 +1,159 @@
+# app/tools/search_cache.py
+import asyncio
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from ddgs import DDGS
+from app.config import (
+    WEB_SEARCH_TIMEOUT, WEB_SEARCH_CACHE_TTL, WEB_SEARCH_STALE_TTL, WEB_SEARCH_CACHE_MAXSIZE,
+)
+from app.logger import get_logger
+
+logger = get_logger("search_cache")
+
+_SPACES_RE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """Requêtes équivalentes → même clé (casse, espaces, ponctuation finale)."""
+    return _SPACES_RE.sub(" ", query.lower()).strip(" ?!.,;:")
+
+
+def _ddgs_search(query: str, max_results: int) -> list:
+    return DDGS(timeout=WEB_SEARCH_TIMEOUT).text(query, max_results=max_results)
+
+
+class SearchCache:
+    """
+    Cache TTL des recherches web, devant DDGS.
+    - Frais (< ttl) : servi sans appel réseau.
+    - Périmé (< stale_ttl) : servi immédiatement, rafraîchi en arrière-plan (stale-while-revalidate).
+    - Single-flight : des requêtes identiques simultanées (threads ou coroutines) partagent
+      le même appel upstream, exécuté dans un pool de threads dédié.
+    - Timeout dur : au-delà de `timeout`, l'appelant reçoit le résultat périmé s'il existe,
+      sinon une TimeoutError ; l'appel upstream continue et remplira le cache.
+    """
+
+    def __init__(self, search_fn=_ddgs_search, ttl=WEB_SEARCH_CACHE_TTL, stale_ttl=WEB_SEARCH_STALE_TTL,
+                 timeout=WEB_SEARCH_TIMEOUT, maxsize=WEB_SEARCH_CACHE_MAXSIZE):
+        self.search_fn = search_fn
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.timeout = timeout
+        self.maxsize = maxsize
+        self.stats = {"hits": 0, "stale_hits": 0, "misses": 0, "coalesced": 0,
+                      "upstream_calls": 0, "timeouts": 0, "errors": 0}
+        self._entries: OrderedDict = OrderedDict()  # key → (results, fetched_at)
+        self._inflight: dict[tuple, Future] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="web_search")
+
+    def search(self, query: str, max_results: int) -> list:
+        cached, future = self._lookup(query, max_results)
+        if future is None:
+            return cached
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            return self._on_timeout(query, cached)
+        except Exception:
+            if cached is None:
+                raise
+            return cached
+
+    async def asearch(self, query: str, max_results: int) -> list:
+        cached, future = self._lookup(query, max_results)
+        if future is None:
+            return cached
+        try:
+            # shield : l'annulation/le timeout d'un appelant n'annule pas l'appel partagé
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), self.timeout)
+        except asyncio.TimeoutError:
+            return self._on_timeout(query, cached)
+        except Exception:
+            if cached is None:
+                raise
+            return cached
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["size"] = len(self._entries)
+            stats["inflight"] = len(self._inflight)
+        lookups = stats["hits"] + stats["stale_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["hits"] + stats["stale_hits"]) / lookups, 3) if lookups else 0.0
+        return stats
+
+    # ── internals ──
+
+    def _lookup(self, query: str, max_results: int) -> tuple[list | None, Future | None]:
+        """(résultat à servir, None) ou (résultat périmé éventuel, appel upstream à attendre)."""
+        key = (normalize_query(query), max_results)
+        now = time.time()
+        started = None
+        with self._lock:
+            entry = self._entries.get(key)
+            age = now - entry[1] if entry else None
+            if entry is not None and age < self.ttl:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return entry[0], None
+            if entry is not None and age < self.stale_ttl:
+                self._entries.move_to_end(key)
+                self.stats["stale_hits"] += 1
+                started = self._start_fetch(key)
+                logger.debug(f"🔎 SEARCH CACHE STALE: '{key[0]}' (rafraîchissement en arrière-plan)")
+                result = entry[0], None
+            else:
+                self.stats["misses"] += 1
+                started = self._start_fetch(key)
+                result = (entry[0] if entry else None), self._inflight[key]
+        if started is not None:
+            self._watch(key, started)
+        return result
+
+    def _start_fetch(self, key: tuple) -> Future | None:
+        """
+        Lock tenu : un seul appel upstream par clé à la fois. Renvoie le nouvel appel, à passer
+        à `_watch` une fois le lock relâché, ou None si un appel est déjà en cours (partagé).
+        """
+        if key in self._inflight:
+            self.stats["coalesced"] += 1
+            return None
+        self.stats["upstream_calls"] += 1
+        future = self._executor.submit(self.search_fn, *key)
+        self._inflight[key] = future
+        return future
+
+    def _watch(self, key: tuple, future: Future):
+        # Hors lock : si l'appel est déjà terminé, le callback s'exécute ici même et prend le lock
+        future.add_done_callback(lambda f: self._on_fetched(key, f))
+
+    def _on_fetched(self, key: tuple, future: Future):
+        with self._lock:
+            self._inflight.pop(key, None)
+            if future.exception() is not None:
+                self.stats["errors"] += 1
+                logger.warning(f"⚠️ Recherche '{key[0]}' échouée : {future.exception()}")
+                return
+            self._entries[key] = (future.result(), time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def _on_timeout(self, query: str, cached: list | None) -> list:
+        with self._lock:
+            self.stats["timeouts"] += 1
+        if cached is not None:
+            logger.warning(f"⏱️ Recherche '{query}' trop lente : résultat périmé servi")
+            return cached
+        raise TimeoutError(f"search timed out after {self.timeout}s")
+
+
+search_cache = SearchCache()
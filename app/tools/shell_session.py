@@ -0,0 +1,251 @@
+# app/tools/shell_session.py
+import atexit
+import os
+import queue
+import shlex
+import shutil
+import signal
+import subprocess
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from app.config import TERMINAL_SHELL, TERMINAL_STREAM_INTERVAL, TERMINAL_MAX_LINE_CHARS
+from app.logger import get_logger
+from app.tools.output_capture import OutputCapture, TerminalStream
+
+logger = get_logger("terminal")
+
+# Commandes qui changent l'environnement du shell (PATH, venv...) : un autre processus
+# n'y verrait plus le même `python`
+ENV_COMMANDS = {"export", "unset", "source", ".", "deactivate", "alias", "conda", "mamba"}
+
+
+@dataclass
+class ShellResult:
+    returncode: int
+    stdout: OutputCapture
+    stderr: OutputCapture
+    cwd: Path | None       # dossier courant du shell après la commande ($PWD)
+    timed_out: bool = False
+    died: bool = False     # le shell lui-même s'est arrêté (kill $$, crash)
+
+
+class _Splitter:
+    """
+    Découpe un flux du shell en lignes jusqu'à la sentinelle de fin de commande.
+    La sentinelle est précédée d'un '\\n' (pour terminer une sortie sans retour final) :
+    la ligne vide qu'il produit quand la sortie se terminait déjà par '\\n' est retenue
+    puis jetée si c'est elle qui précède la sentinelle.
+    """
+
+    def __init__(self, token: bytes, capture: OutputCapture):
+        self.token = token
+        self.capture = capture
+        self.partial = b""
+        self.held_empty = False
+        self.done = False
+        self.status = b""
+
+    def feed(self, data: bytes) -> list[str]:
+        chunks = (self.partial + data).split(b"\n")
+        self.partial = chunks.pop()
+        if len(self.partial) > 4 * TERMINAL_MAX_LINE_CHARS and self.token not in self.partial:
+            chunks.append(self.partial)
+            self.partial = b""
+        out = []
+        for raw in chunks:
+            if raw.startswith(self.token):
+                self.done = True
+                self.status = raw[len(self.token):].strip()
+                break
+            if self.held_empty:
+                out.append("")
+                self.held_empty = False
+            if not raw:
+                self.held_empty = True
+                continue
+            out.append(raw.decode("utf-8", errors="replace").rstrip("\r"))
+        for line in out:
+            self.capture.bytes += len(line) + 1
+            self.capture.add(line)
+        return out
+
+
+class ShellSession:
+    """
+    Shell persistant d'un sandbox : un seul `bash` par session, alimenté par stdin.
+    Chaque commande est suivie d'une sentinelle unique (code de sortie + $PWD) sur stdout
+    et stderr, qui délimite sa sortie. Variables exportées, venv activé, alias restent
+    donc en place d'un appel à l'autre, et les builtins (cd, export, echo...) ne coûtent
+    plus aucun fork. Un timeout tue le groupe de processus ; le shell est relancé au
+    prochain appel dans le dernier dossier connu.
+    """
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.cwd: Path | None = None
+        self.commands = 0
+        self.env_changed = False
+        self._proc: subprocess.Popen | None = None
+        self._queue: queue.Queue | None = None
+        self._lock = threading.Lock()
+
+    # ── cycle de vie ──
+
+    def _start(self, cwd: Path):
+        shell = shutil.which(TERMINAL_SHELL) or shutil.which("bash") or "/bin/sh"
+        args = [shell, "--noprofile", "--norc"] if Path(shell).name == "bash" else [shell]
+        env = {**os.environ, "TERM": "dumb", "PAGER": "cat", "GIT_PAGER": "cat", "PYTHONUNBUFFERED": "1"}
+        self._proc = subprocess.Popen(
+            args,
+            cwd=str(cwd),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            env=env,
+            start_new_session=True,  # groupe de processus dédié : un timeout tue aussi les enfants
+        )
+        if Path(shell).name == "bash":
+            # bash non interactif ignore les alias par défaut : `alias ll=...` doit servir ensuite
+            self._proc.stdin.write(b"shopt -s expand_aliases\n")
+            self._proc.stdin.flush()
+        # File propre à ce processus : rien d'un shell précédent ne peut s'y mêler
+        self._queue = queue.Queue()
+        for pipe, name in ((self._proc.stdout, "stdout"), (self._proc.stderr, "stderr")):
+            threading.Thread(target=self._reader, args=(pipe, name, self._queue), daemon=True).start()
+        self.cwd = cwd
+        self.commands = 0
+        logger.info(f"🐚 Shell de session démarré ({Path(shell).name}, pid {self._proc.pid}) dans {cwd}")
+
+    @staticmethod
+    def _reader(pipe, name: str, q: queue.Queue):
+        fd = pipe.fileno()
+        try:
+            while chunk := os.read(fd, 65536):
+                q.put((name, chunk))
+        except OSError:
+            pass
+        q.put((name, None))
+
+    def _kill(self):
+        proc, self._proc = self._proc, None
+        self.env_changed = False
+        if proc is None:
+            return
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            proc.kill()
+        proc.wait()
+        for pipe in (proc.stdin, proc.stdout, proc.stderr):
+            try:
+                pipe.close()
+            except OSError:
+                pass
+
+    def close(self):
+        with self._lock:
+            self._kill()
+
+    @property
+    def alive(self) -> bool:
+        return self._proc is not None and self._proc.poll() is None
+
+    # ── exécution ──
+
+    def run(self, command: str, cwd: Path, stream: TerminalStream, timeout: float) -> ShellResult:
+        """
+        Exécute `command` (déjà validée) dans `cwd` et attend sa sentinelle.
+        stdin de la commande = /dev/null : elle ne peut pas avaler les lignes suivantes. La
+        redirection s'applique à un groupe `{ ...\n}` : un `#` dans la commande ne peut pas la
+        mettre en commentaire.
+        """
+        with self._lock:
+            if not self.alive:
+                self._kill()
+                self._start(cwd)
+            token = f"__CA_END_{uuid.uuid4().hex}__"
+            script = ""
+            if cwd != self.cwd:
+                script += f"cd -- {shlex.quote(str(cwd))}\n"
+            script += (
+                f"{{ {command}\n}} < /dev/null\n"
+                f"__ca_rc=$?; printf '\\n%s %d %s\\n' {token} \"$__ca_rc\" \"$PWD\"; printf '\\n%s\\n' {token} >&2\n"
+            )
+
+            stdout, stderr = OutputCapture(), OutputCapture()
+            splitters = {
+                "stdout": _Splitter(token.encode(), stdout),
+                "stderr": _Splitter(token.encode(), stderr),
+            }
+            self.commands += 1
+            if command.split(maxsplit=1)[0] in ENV_COMMANDS:
+                self.env_changed = True
+            try:
+                self._proc.stdin.write(script.encode("utf-8"))
+                self._proc.stdin.flush()
+            except OSError:
+                pass  # shell déjà mort : la fin de flux arrivera par la file
+
+            deadline = time.monotonic() + timeout
+            timed_out = died = False
+            while not all(s.done for s in splitters.values()):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    timed_out = True
+                    break
+                try:
+                    name, chunk = self._queue.get(timeout=min(TERMINAL_STREAM_INTERVAL, remaining))
+                except queue.Empty:
+                    stream.tick()
+                    continue
+                if chunk is None:
+                    died = True
+                    break
+                stream.lines(name, splitters[name].feed(chunk))
+
+            if timed_out or died:
+                try:
+                    code = self._proc.wait(timeout=0 if timed_out else 1)
+                except subprocess.TimeoutExpired:
+                    code = None
+                self._kill()
+                logger.warning(f"🐚 Shell de session {'arrêté (timeout)' if timed_out else 'terminé'} : relancé au prochain appel")
+                return ShellResult(-9 if timed_out else (code if code is not None else -1),
+                                   stdout, stderr, None, timed_out=timed_out, died=died)
+
+            rc, _, pwd = splitters["stdout"].status.decode("utf-8", errors="replace").partition(" ")
+            self.cwd = Path(pwd) if pwd else None
+            return ShellResult(int(rc) if rc.lstrip("-").isdigit() else -1, stdout, stderr, self.cwd)
+
+
+# ============================================================
+# REGISTRE (un shell par racine de sandbox)
+# ============================================================
+_SHELLS: dict[str, ShellSession] = {}
+_LOCK = threading.Lock()
+
+
+def get_shell(root: Path) -> ShellSession:
+    key = str(root)
+    with _LOCK:
+        shell = _SHELLS.get(key)
+        if shell is None:
+            shell = _SHELLS[key] = ShellSession(root)
+        return shell
+
+
+def close_shell(root: Path):
+    """Tue le shell de la session (fermeture ou nettoyage du sandbox)."""
+    with _LOCK:
+        shell = _SHELLS.pop(str(root), None)
+    if shell is not None:
+        shell.close()
+
+
+@atexit.register
+def _close_shells():
+    for shell in list(_SHELLS.values()):
+        shell.close()
@@ -1,18 +1,26 @@
 # app/tools/terminal.py
-from langchain_core.tools import tool
+from langchain_core.tools import StructuredTool
 from pathlib import Path
+import asyncio
 import subprocess
 import shlex
 import os
-from app.config import SANDBOX_PATH
+import threading
+import time
+from app.config import (
+    SANDBOX_PATH, TERMINAL_STREAM_INTERVAL, TERMINAL_PERSISTENT_SHELL, PYTHON_POOL_ENABLED, TERMINAL_CACHE_ENABLED,
+)
+from app.tools.output_capture import OutputCapture, TerminalStream
+from app.tools.sandbox import current_session
+from app.tools.shell_session import get_shell
+from app.tools.python_pool import python_job, shell_expands, changes_packages, get_python_pool, discard_python_pools
+from app.tools.command_cache import get_command_cache
+from app.tools.file_index import get_file_index
 
-# --- ÉTAT GLOBAL (Mémoire du dossier courant) ---
 # S'assurer que le dossier racine existe
+# (le dossier courant est mémorisé par session : voir app/tools/sandbox.py)
 SANDBOX_PATH.mkdir(parents=True, exist_ok=True)
 
-# Au démarrage, on est dans le sandbox
-CURRENT_WORKING_DIR = SANDBOX_PATH
-
 # Liste élargie pour un Coding Assistant viable
 ALLOWED_COMMANDS = {
     # --- Navigation & Fichiers de base ---
@@ -61,7 +69,8 @@ ALLOWED_COMMANDS = {
     "lscpu", "lsblk", "lsusb", "lspci",
     "uname", "hostname", "whoami", "id", "groups",
     "date", "cal", "time", "watch",
-    "env", "printenv", "export", "alias", # (Alias ne marchera que dans le shell courant)
+    "env", "printenv", "export", "alias", # (conservés par le shell de session)
+    "unset", "source", ".", "deactivate", # venv : 'source .venv/bin/activate' reste actif
     
     # --- Réseau & Internet ---
     "curl", "wget", "http", # (httpie)
@@ -94,13 +103,19 @@ ALLOWED_COMMANDS = {
 
 # On garde l'interdiction des opérateurs complexes pour éviter les injections trop sales
 # Mais on peut être plus souple si besoin.
-DISALLOWED_TOKENS = {">", "<", "|", ";", "&", "&&"} 
+# "$(" et "`" : la commande passe par le shell de session, la substitution lancerait
+# n'importe quel programme hors liste blanche.
+DISALLOWED_TOKENS = {">", "<", "|", ";", "&", "&&", "$(", "`"}
+
+COMMAND_TIMEOUT = 120
 
 def _validate_command(command: str) -> list[str]:
     if not command or not command.strip():
         raise ValueError("Empty command.")
 
     # NOTE : J'ai supprimé le bloc qui interdisait "cd" ici.
+    if "\n" in command or "\r" in command:
+        raise ValueError("Une seule ligne de commande à la fois.")
 
     try:
         parts = shlex.split(command)
@@ -120,18 +135,207 @@ def _validate_command(command: str) -> list[str]:
     if cmd not in ALLOWED_COMMANDS:
         raise ValueError(f"Commande '{cmd}' non autorisée. Commandes dev dispos: python, pip, git, npm, ls, etc.")
 
+    # 4. Commandes qui exécutent autre chose qu'elles-mêmes dans le shell de session
+    if cmd in ("source", "."):
+        _validate_activate(parts)
+    elif cmd == "alias":
+        _validate_alias(parts)
+
     return parts
 
 
-@tool
-def run_terminal(command: str):
+def _validate_activate(parts: list[str]):
+    """`source` n'exécute qu'un script `activate` de venv du sandbox (pas un fichier écrit par l'agent)."""
+    session = current_session()
+    if len(parts) != 2:
+        raise ValueError(f"Usage : {parts[0]} .venv/bin/activate")
+    script = (session.cwd / parts[1]).resolve()
+    if not session.contains(script) or script.name != "activate" or script.parent.name not in ("bin", "Scripts"):
+        raise ValueError(f"'{parts[0]}' est réservé à l'activation d'un venv du sandbox (ex: source .venv/bin/activate).")
+    if not script.is_file() or not (script.parent.parent / "pyvenv.cfg").is_file():
+        raise ValueError(f"Pas de venv (pyvenv.cfg) autour de : {parts[1]}")
+
+
+def _validate_alias(parts: list[str]):
+    """Le corps d'un alias passe la même liste blanche qu'une commande (sinon `alias ls=nc` la contourne)."""
+    for definition in parts[1:]:
+        name, sep, body = definition.partition("=")
+        if not sep:
+            continue  # `alias ls` : affichage
+        try:
+            words = shlex.split(body)
+        except ValueError:
+            raise ValueError("Shell syntax error.")
+        if not words or words[0] not in ALLOWED_COMMANDS or words[0] in ("source", ".", "alias"):
+            raise ValueError(f"Alias '{name}' : commande '{words[0] if words else ''}' non autorisée.")
+
+
+def _change_directory(parts: list[str]) -> str:
+    """Émule 'cd' : met à jour le dossier courant mémorisé de la session."""
+    session = current_session()
+
+    if len(parts) < 2:
+        # 'cd' tout seul = retour à la racine du sandbox
+        target_dir = session.root
+    else:
+        # 'cd chemin'
+        path_arg = parts[1]
+        # Résolution du chemin par rapport au dossier courant
+        # .resolve() gère les '..' et les chemins relatifs
+        target_dir = (session.cwd / path_arg).resolve()
+
+    # Vérifications de sécurité et d'existence
+    if not session.contains(target_dir):
+        return f"Erreur: '{path_arg}' est hors du sandbox."
+    if not target_dir.exists():
+        return f"Erreur: Le dossier '{target_dir}' n'existe pas."
+    if not target_dir.is_dir():
+        return f"Erreur: '{target_dir}' n'est pas un dossier."
+    
+    # Mise à jour de la mémoire
+    session.cwd = target_dir
+    return f"Dossier courant changé vers : {session.cwd}"
+
+
+def _format_output(returncode: int, stdout: OutputCapture, stderr: OutputCapture,
+                   duration: float, timed_out: bool = False) -> str:
+    """Résumé compact : tête + queue de chaque flux, code de sortie, durée."""
+    out = stdout.text()
+    err = stderr.text()
+
+    output = ""
+    if out:
+        output += out
+    if err:
+        output += f"\n[STDERR]\n{err}"
+    output = output.strip()
+
+    total = stdout.lines + stderr.lines
+    footer = f"[exit {returncode} · {duration:.1f}s"
+    if stdout.truncated or stderr.truncated:
+        footer += f" · {total} lines, {(stdout.bytes + stderr.bytes) / 1024:.0f} KB, head/tail shown"
+    footer += "]"
+
+    if timed_out:
+        return f"Erreur : Timeout de la commande après {COMMAND_TIMEOUT}s (processus tué).\n{output}\n{footer}".replace("\n\n", "\n")
+    if returncode != 0:
+        return f"Erreur (code {returncode}):\n{output}\n{footer}"
+
+    return f"{output}\n{footer}" if output else f"(commande exécutée avec succès, pas de sortie) {footer}"
+
+
+def _pump(pipe, name: str, capture: OutputCapture, stream: TerminalStream, lock: threading.Lock):
+    """Lit un pipe par blocs (jamais de ligne non bornée en mémoire) jusqu'à EOF."""
+    fd = pipe.fileno()
+    while chunk := os.read(fd, 65536):
+        lines = capture.feed(chunk)
+        with lock:
+            stream.lines(name, lines)
+    with lock:
+        stream.lines(name, capture.close())
+
+
+def _run_in_pool(parts: list[str], command: str) -> str | None:
+    """
+    Exécute une commande Python dans le pool chaud du sandbox.
+    None = à passer par le shell (pas du Python simple, arguments que bash développerait,
+    environnement du shell modifié, pool pas encore prêt : il démarre alors en arrière-plan
+    pour les appels suivants).
+    """
+    session = current_session()
+    if get_shell(session.root).env_changed or shell_expands(command):
+        return None
+    routed = python_job(parts)
+    if routed is None:
+        return None
+    interpreter, job = routed
+    pool = get_python_pool(session.root, interpreter)
+    if not pool.ready:
+        pool.warm()
+        return None
+
+    stream = TerminalStream(command)
+    start = time.monotonic()
+    result = pool.run(job, session.cwd, stream, COMMAND_TIMEOUT)
+    if result is None:
+        return None
+    summary = _format_output(result.returncode, result.stdout, result.stderr,
+                             time.monotonic() - start, result.timed_out)
+    stream.flush(final=True, summary=summary)
+    return summary
+
+
+def _run_in_shell(command: str) -> str:
+    """Exécute dans le shell persistant de la session (état conservé entre deux appels)."""
+    session = current_session()
+    stream = TerminalStream(command)
+    start = time.monotonic()
+    result = get_shell(session.root).run(command, session.cwd, stream, COMMAND_TIMEOUT)
+    # Le shell a pu changer de dossier (source d'un script...) : on ne suit que dans le sandbox,
+    # sinon il y sera ramené au prochain appel
+    if result.cwd is not None and session.contains(result.cwd):
+        session.cwd = result.cwd
+
+    summary = _format_output(result.returncode, result.stdout, result.stderr,
+                             time.monotonic() - start, result.timed_out)
+    if result.timed_out or result.died:
+        summary += "\n(shell de session relancé : variables exportées et venv activé sont perdus)"
+    stream.flush(final=True, summary=summary)
+    return summary
+
+
+def _command_cache():
+    # Sans surveillance active (watchfiles absent ou watcher arrêté), une modification
+    # externe passerait inaperçue : pas de cache
+    if not TERMINAL_CACHE_ENABLED:
+        return None
+    root = current_session().root
+    if not get_file_index(root).watching:
+        return None
+    return get_command_cache(root)
+
+
+def _from_cache(parts: list[str], command: str) -> str | None:
+    """Résultat mémorisé si la commande est en lecture seule/déterministe et le sandbox inchangé."""
+    cache = _command_cache()
+    hit = cache.get(parts, command, current_session().cwd) if cache is not None else None
+    if hit is None:
+        return None
+    summary, age = hit
+    summary += f"\n(résultat en cache : sandbox inchangé depuis l'exécution d'il y a {age:.0f}s)"
+    TerminalStream(command).flush(final=True, summary=summary)
+    return summary
+
+
+def _remember(parts: list[str], command: str, summary: str) -> str:
+    cache = _command_cache()
+    if cache is not None:
+        # Timeout / shell relancé / erreur système : ni réutilisable, ni sûr pour le reste du cache
+        reusable = not summary.startswith(("Erreur : Timeout", "Erreur système")) and "shell de session relancé" not in summary
+        cache.record(parts, command, current_session().cwd, summary, reusable)
+    return summary
+
+
+def _run_persistent(parts: list[str], command: str) -> str:
+    if PYTHON_POOL_ENABLED:
+        summary = _run_in_pool(parts, command)
+        if summary is not None:
+            return summary
+    summary = _run_in_shell(command)
+    if changes_packages(parts):
+        # Paquets installés / mis à jour : les modules préchargés du pool sont peut-être périmés
+        discard_python_pools(current_session().root)
+    return summary
+
+
+def _run_terminal(command: str):
     """
     Exécute une commande terminal.
     Supporte 'cd' pour changer de dossier (l'état est conservé).
+    Le shell est persistant : export, 'source .venv/bin/activate', alias restent actifs
+    d'un appel à l'autre.
     Outils Dev autorisés : python, pip, git, npm, ls, cat, grep, etc.
     """
-    global CURRENT_WORKING_DIR # On accède à la mémoire globale du dossier
-
     try:
         # Nettoyage préventif
         command = command.strip()
@@ -139,53 +343,132 @@ def run_terminal(command: str):
         
         # --- GESTION SPÉCIALE DU 'CD' ---
         if parts[0] == "cd":
-            if len(parts) < 2:
-                # 'cd' tout seul = retour à la racine du sandbox
-                target_dir = SANDBOX_PATH
-            else:
-                # 'cd chemin'
-                path_arg = parts[1]
-                # Résolution du chemin par rapport au dossier courant
-                # .resolve() gère les '..' et les chemins relatifs
-                target_dir = (CURRENT_WORKING_DIR / path_arg).resolve()
-
-            # Vérifications de sécurité et d'existence
-            if not target_dir.exists():
-                return f"Erreur: Le dossier '{target_dir}' n'existe pas."
-            if not target_dir.is_dir():
-                return f"Erreur: '{target_dir}' n'est pas un dossier."
-            
-            # Mise à jour de la mémoire
-            CURRENT_WORKING_DIR = target_dir
-            return f"Dossier courant changé vers : {CURRENT_WORKING_DIR}"
-
-        # --- EXÉCUTION DES AUTRES COMMANDES ---
-        result = subprocess.run(
+            return _change_directory(parts)
+
+        cached = _from_cache(parts, command)
+        if cached is not None:
+            return cached
+
+        if TERMINAL_PERSISTENT_SHELL:
+            return _remember(parts, command, _run_persistent(parts, command))
+
+        # --- EXÉCUTION DES AUTRES COMMANDES (un processus par appel) ---
+        # Sortie lue au fil de l'eau : relayée au client, capture bornée (tête + queue)
+        stdout, stderr = OutputCapture(), OutputCapture()
+        stream = TerminalStream(command)
+        lock = threading.Lock()
+        start = time.monotonic()
+        proc = subprocess.Popen(
             parts,
-            cwd=str(CURRENT_WORKING_DIR), # On utilise le dossier mémorisé !
-            capture_output=True,
-            text=True,
-            check=False,
-            timeout=120 # Timeout de sécurité (2min max)
+            cwd=str(current_session().cwd), # On utilise le dossier mémorisé !
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
         )
-        
-        stdout = result.stdout.strip()
-        stderr = result.stderr.strip()
-        
-        output = ""
-        if stdout:
-            output += f"{stdout}"
-        if stderr:
-            output += f"\n[STDERR]\n{stderr}"
-            
-        if result.returncode != 0:
-            return f"Erreur (code {result.returncode}):\n{output}"
-            
-        return output or "(commande exécutée avec succès, pas de sortie)"
+        readers = [
+            threading.Thread(target=_pump, args=(proc.stdout, "stdout", stdout, stream, lock), daemon=True),
+            threading.Thread(target=_pump, args=(proc.stderr, "stderr", stderr, stream, lock), daemon=True),
+        ]
+        for reader in readers:
+            reader.start()
+        timed_out = False
+        deadline = start + COMMAND_TIMEOUT # Timeout de sécurité (2min max)
+        while proc.poll() is None:
+            if time.monotonic() >= deadline:
+                proc.kill()
+                proc.wait()
+                timed_out = True
+                break
+            try:
+                proc.wait(timeout=TERMINAL_STREAM_INTERVAL)
+            except subprocess.TimeoutExpired:
+                with lock:
+                    stream.tick()
+        for reader in readers:
+            reader.join(timeout=5)
+        proc.stdout.close()
+        proc.stderr.close()
+
+        summary = _format_output(proc.returncode, stdout, stderr, time.monotonic() - start, timed_out)
+        stream.flush(final=True, summary=summary)
+        return _remember(parts, command, summary)
+
+    except ValueError as ve:
+        return f"Erreur de validation : {ve}"
+    except Exception as e:
+        return f"Erreur système : {e}"
+
+
+async def _apump(reader: asyncio.StreamReader, name: str, capture: OutputCapture, stream: TerminalStream):
+    while chunk := await reader.read(65536):
+        stream.lines(name, capture.feed(chunk))
+    stream.lines(name, capture.close())
+
+
+async def _aticker(stream: TerminalStream):
+    while True:
+        await asyncio.sleep(TERMINAL_STREAM_INTERVAL)
+        stream.tick()
+
+
+async def _arun_terminal(command: str):
+    """Version async : sous-processus asyncio, l'event loop reste libre pendant l'exécution."""
+    try:
+        command = command.strip()
+        parts = _validate_command(command)
+
+        if parts[0] == "cd":
+            return _change_directory(parts)
+
+        cached = _from_cache(parts, command)
+        if cached is not None:
+            return cached
+
+        if TERMINAL_PERSISTENT_SHELL:
+            # Le shell est piloté par des threads lecteurs : on attend sans bloquer l'event loop
+            return _remember(parts, command, await asyncio.to_thread(_run_persistent, parts, command))
+
+        stdout, stderr = OutputCapture(), OutputCapture()
+        stream = TerminalStream(command)
+        start = time.monotonic()
+        proc = await asyncio.create_subprocess_exec(
+            *parts,
+            cwd=str(current_session().cwd),
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        timed_out = False
+        ticker = asyncio.create_task(_aticker(stream))
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(
+                    _apump(proc.stdout, "stdout", stdout, stream),
+                    _apump(proc.stderr, "stderr", stderr, stream),
+                    proc.wait(),
+                ),
+                timeout=COMMAND_TIMEOUT,
+            )
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()
+            timed_out = True
+        finally:
+            ticker.cancel()
+
+        summary = _format_output(proc.returncode, stdout, stderr, time.monotonic() - start, timed_out)
+        stream.flush(final=True, summary=summary)
+        return _remember(parts, command, summary)
 
     except ValueError as ve:
         return f"Erreur de validation : {ve}"
-    except subprocess.TimeoutExpired:
-        return "Erreur : Timeout de la commande (trop long)."
     except Exception as e:
-        return f"Erreur système : {e}"
\ No newline at end of file
+        return f"Erreur système : {e}"
+
+
+# Outil exposé au graphe : sync (CLI) + async (serveur)
+run_terminal = StructuredTool.from_function(
+    func=_run_terminal,
+    coroutine=_arun_terminal,
+    name="run_terminal",
+)
@@ -1,120 +1,368 @@
 # app/tools/web.py
-from langchain_core.tools import tool
-from ddgs import DDGS
-import requests
-from bs4 import BeautifulSoup
-from app.config import WEB_SEARCH_MAX_RESULTS, WEB_PAGE_MAX_CHARS
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from langchain_core.tools import StructuredTool
+import httpx
+from app.config import (
+    WEB_SEARCH_MAX_RESULTS, WEB_PAGE_MAX_CHARS, WEB_FETCH_CANDIDATES, WEB_MIN_CONTENT_CHARS, WEB_FETCH_MAX_BYTES,
+    WEB_PASSAGE_RANKING,
+)
+from app.tools.http_pool import get_http_client, get_async_http_client
+from app.tools.page_cache import get_page_cache
+from app.tools.search_cache import search_cache
+from app.utils.html_text import extract_text
+from app.utils.passages import top_passages
 from app.logger import get_logger
 
 logger = get_logger("web_tools")
 
-@tool
-def web_search(query: str):
+PRIORITY_DOMAINS = ['docs.', 'github.com', 'python.org', 'stackoverflow.com']
+
+# Types de contenu dont on sait extraire du texte ; le reste (PDF, images, binaires) est refusé
+# dès les en-têtes, sans télécharger le corps
+TEXT_CONTENT_TYPES = ("text/", "application/xhtml+xml", "application/xml", "application/json")
+
+
+class UnsupportedContent(Exception):
+    pass
+
+
+# ============================================================
+# HELPERS (partagés sync / async)
+# ============================================================
+
+def _format_search_results(results) -> str:
+    if not results:
+        return "No results found."
+
+    formatted = []
+    for res in results:
+        formatted.append(f"Titre: {res['title']}\nLien: {res['href']}\nRésumé: {res['body']}")
+
+    return "\n---\n".join(formatted)
+
+
+def _rank_urls(results) -> list:
+    """URLs des résultats, docs officielles d'abord (ordre de la recherche conservé sinon)."""
+    urls = list(dict.fromkeys(r['href'] for r in results if r.get('href')))
+    preferred = [u for u in urls if any(domain in u for domain in PRIORITY_DOMAINS)]
+    return preferred + [u for u in urls if u not in preferred]
+
+
+def _truncate(text: str, marker: str = "\n... [Contenu tronqué]") -> str:
+    # On limite la taille pour ne pas tuer le LLM (5000 caractères max)
+    if len(text) > WEB_PAGE_MAX_CHARS:
+        return text[:WEB_PAGE_MAX_CHARS] + marker
+    return text
+
+
+def _page_excerpt(text: str, query: str, marker: str = "\n... [Contenu tronqué]") -> str:
+    """Texte renvoyé au LLM : les passages pertinents pour `query` (BM25), sinon le début de la page."""
+    if query and WEB_PASSAGE_RANKING and len(text) > WEB_PAGE_MAX_CHARS:
+        ranked = top_passages(text, query, WEB_PAGE_MAX_CHARS)
+        if ranked is not None:
+            return ranked
+    return _truncate(text, marker)
+
+
+def _search(query: str, max_results: int = WEB_SEARCH_MAX_RESULTS):
+    # DDGS derrière le cache de recherches (TTL, single-flight, timeout)
+    return search_cache.search(query, max_results)
+
+
+async def _asearch(query: str, max_results: int = WEB_SEARCH_MAX_RESULTS):
+    # DDGS est synchrone : le cache l'exécute dans ses threads, la loop ne fait qu'attendre
+    return await search_cache.asearch(query, max_results)
+
+
+def _conditional_headers(entry: dict | None) -> dict:
+    """En-têtes de revalidation d'une entrée périmée du cache."""
+    headers = {}
+    if entry:
+        if entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
+
+
+def _from_cache(cache, url: str, entry: dict | None, response: httpx.Response | None = None) -> str | None:
+    """Texte servi par le cache : entrée fraîche, ou périmée mais confirmée par un 304."""
+    if entry is None:
+        return None
+    if entry["fresh"]:
+        logger.debug(f"📦 WEB CACHE HIT: {url}")
+        return entry["text"]
+    if response is not None and response.status_code == 304:
+        logger.debug(f"📦 WEB CACHE 304: {url}")
+        cache.touch(url)
+        return entry["text"]
+    return None
+
+
+def _store(cache, url: str, response: httpx.Response, text: str):
+    if cache is None or "no-store" in response.headers.get("cache-control", "").lower():
+        return
+    cache.set(url, text, response.headers.get("etag"), response.headers.get("last-modified"))
+
+
+def _check_content_type(response: httpx.Response):
+    content_type = response.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type and not content_type.startswith(TEXT_CONTENT_TYPES):
+        raise UnsupportedContent(f"unsupported content type {content_type}")
+
+
+def _body(response: httpx.Response, body: bytearray) -> str | bytes:
+    """Corps à parser : décodé si le charset est annoncé, sinon bytes (le parser lit le <meta charset>)."""
+    charset = response.charset_encoding
+    if charset:
+        try:
+            return body.decode(charset, errors="replace")
+        except LookupError:
+            pass
+    return bytes(body)
+
+
+def _download(url: str, headers: dict) -> tuple[httpx.Response, str | bytes | None]:
+    """GET en streaming : type de contenu vérifié avant le corps, lecture arrêtée à WEB_FETCH_MAX_BYTES."""
+    with get_http_client().stream("GET", url, headers=headers) as response:
+        if response.status_code != 200:
+            return response, None
+        _check_content_type(response)
+        body = bytearray()
+        for chunk in response.iter_bytes():
+            body += chunk
+            if len(body) >= WEB_FETCH_MAX_BYTES:
+                logger.debug(f"✂️ {url} : téléchargement arrêté à {len(body)} octets")
+                break
+        return response, _body(response, body)
+
+
+async def _adownload(url: str, headers: dict) -> tuple[httpx.Response, str | bytes | None]:
+    async with get_async_http_client().stream("GET", url, headers=headers) as response:
+        if response.status_code != 200:
+            return response, None
+        _check_content_type(response)
+        body = bytearray()
+        async for chunk in response.aiter_bytes():
+            body += chunk
+            if len(body) >= WEB_FETCH_MAX_BYTES:
+                logger.debug(f"✂️ {url} : téléchargement arrêté à {len(body)} octets")
+                break
+        return response, _body(response, body)
+
+
+def _get_page(url: str) -> tuple[int, str | None]:
+    """(statut HTTP, texte propre) en passant par le cache de pages."""
+    cache = get_page_cache()
+    entry = cache.get(url) if cache else None
+    text = _from_cache(cache, url, entry)
+    if text is not None:
+        return 200, text
+
+    response, html = _download(url, _conditional_headers(entry))
+    text = _from_cache(cache, url, entry, response)
+    if text is not None:
+        return 200, text
+    if response.status_code != 200:
+        return response.status_code, None
+
+    text = extract_text(html)
+    _store(cache, url, response, text)
+    return 200, text
+
+
+async def _aget_page(url: str) -> tuple[int, str | None]:
+    # Les accès SQLite du cache sont sub-millisecondes : faits directement sur la loop
+    cache = get_page_cache()
+    entry = cache.get(url) if cache else None
+    text = _from_cache(cache, url, entry)
+    if text is not None:
+        return 200, text
+
+    response, html = await _adownload(url, _conditional_headers(entry))
+    text = _from_cache(cache, url, entry, response)
+    if text is not None:
+        return 200, text
+    if response.status_code != 200:
+        return response.status_code, None
+
+    # Parsing CPU-bound → hors de l'event loop
+    text = await asyncio.to_thread(extract_text, html)
+    _store(cache, url, response, text)
+    return 200, text
+
+
+def _usable_text(status: int, text: str | None) -> tuple[str | None, str | None]:
+    """(texte propre, None) si la page est exploitable, sinon (None, raison)."""
+    if status != 200:
+        return None, f"HTTP {status}"
+    if len(text) < WEB_MIN_CONTENT_CHARS:
+        return None, f"only {len(text)} chars of text"
+    return text, None
+
+
+def _fetch_candidate(url: str) -> tuple[str, str | None, str | None]:
+    try:
+        text, reason = _usable_text(*_get_page(url))
+        return url, text, reason
+    except Exception as e:
+        return url, None, str(e) or type(e).__name__
+
+
+async def _afetch_candidate(url: str) -> tuple[str, str | None, str | None]:
+    try:
+        text, reason = _usable_text(*await _aget_page(url))
+        return url, text, reason
+    except Exception as e:
+        return url, None, str(e) or type(e).__name__
+
+
+def _first_usable(urls: list) -> tuple[str | None, str | None, list]:
+    """Télécharge les URLs en parallèle ; la première page exploitable gagne."""
+    failures = []
+    pool = ThreadPoolExecutor(max_workers=len(urls), thread_name_prefix="web_fetch")
+    try:
+        futures = [pool.submit(_fetch_candidate, url) for url in urls]
+        for future in as_completed(futures):
+            url, text, reason = future.result()
+            if text is not None:
+                return url, text, failures
+            failures.append(f"{url}: {reason}")
+        return None, None, failures
+    finally:
+        # Les téléchargements encore en cours sont abandonnés (bornés par le timeout)
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+async def _afirst_usable(urls: list) -> tuple[str | None, str | None, list]:
+    """Version async : la première page exploitable gagne, les autres tâches sont annulées."""
+    failures = []
+    tasks = [asyncio.create_task(_afetch_candidate(url)) for url in urls]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            url, text, reason = await next_done
+            if text is not None:
+                return url, text, failures
+            failures.append(f"{url}: {reason}")
+        return None, None, failures
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+# ============================================================
+# web_search
+# ============================================================
+
+def _web_search(query: str):
     """
     Search the internet using DuckDuckGo.
     Use this to find documentation, error solutions, or libraries.
     """
     try:
         # max_results=3 pour économiser le contexte du petit modèle
-        results = DDGS().text(query, max_results=WEB_SEARCH_MAX_RESULTS)
-        if not results:
-            return "No results found."
-        
-        formatted = []
-        for res in results:
-            formatted.append(f"Titre: {res['title']}\nLien: {res['href']}\nRésumé: {res['body']}")
-            
-        return "\n---\n".join(formatted)
+        return _format_search_results(_search(query))
     except Exception as e:
         return f"Search error: {str(e)}"
 
-@tool
-def fetch_web_page(url: str):
+
+async def _aweb_search(query: str):
+    try:
+        results = await _asearch(query)
+        return _format_search_results(results)
+    except Exception as e:
+        return f"Search error: {str(e)}"
+
+
+# ============================================================
+# fetch_web_page
+# ============================================================
+
+def _fetch_web_page(url: str, query: str = ""):
     """
     Fetch the content of a specific URL.
     Use this when web_search snippets are not detailed enough.
+    Pass `query` (what you are looking for) to get the most relevant passages of long pages.
     """
     logger.info(f"🕷️ SCRAPING: {url}")
     try:
-        # On se fait passer pour un vrai navigateur (User-Agent) pour ne pas être bloqué
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-        }
-        
-        response = requests.get(url, headers=headers, timeout=10)
-        # response.raise_for_status() # On évite ça pour gérer l'erreur manuellement ci-dessous
-        
-        if response.status_code != 200:
-               return f"HTTP error {response.status_code} accessing {url}"
-
-        # Nettoyage du HTML avec BeautifulSoup
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # On supprime les scripts et les styles inutiles
-        for script in soup(["script", "style", "nav", "footer", "svg"]):
-            script.decompose()
-            
-        # On récupère le texte
-        text = soup.get_text(separator='\n')
-        
-        # On nettoie les espaces vides
-        lines = (line.strip() for line in text.splitlines())
-        chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-        clean_text = '\n'.join(chunk for chunk in chunks if chunk)
-        
-        # On limite la taille pour ne pas tuer le LLM (5000 caractères max)
-        if len(clean_text) > WEB_PAGE_MAX_CHARS:
-            return clean_text[:WEB_PAGE_MAX_CHARS] + "\n... [Contenu tronqué]"
-        
-        return clean_text
+        status, text = _get_page(url)
+
+        if status != 200:
+               return f"HTTP error {status} accessing {url}"
+
+        return _page_excerpt(text, query)
 
     except Exception as e:
         return f"Error fetching page: {e}"
-    
-@tool
-def smart_web_fetch(query: str):
+
+
+async def _afetch_web_page(url: str, query: str = ""):
+    logger.info(f"🕷️ SCRAPING: {url}")
+    try:
+        status, text = await _aget_page(url)
+        if status != 200:
+            return f"HTTP error {status} accessing {url}"
+
+        # Scoring NumPy sur des pages longues : hors de l'event loop
+        return await asyncio.to_thread(_page_excerpt, text, query)
+
+    except Exception as e:
+        return f"Error fetching page: {e}"
+
+
+# ============================================================
+# smart_web_fetch
+# ============================================================
+
+def _smart_result(query: str, url, text, failures, tried: int) -> str:
+    if text is None:
+        return f"Error: no usable page among {tried} results ({'; '.join(failures)})"
+    if failures:
+        logger.info(f"🕷️ SMART FETCH : {len(failures)} page(s) inutilisable(s) ignorée(s)")
+    return f"Source: {url}\n\n" + _page_excerpt(text, query, "\n...[truncated]")
+
+
+def _smart_web_fetch(query: str):
     """
     Search DuckDuckGo + fetch best result in one shot.
     Use this for research tasks requiring page content.
     """
     try:
         # 1. Search
-        results = DDGS().text(query, max_results=5)
+        results = _search(query, max_results=5)
         if not results:
             return "No results found."
-        
-        # 2. Pick best URL (priorité docs officielles)
-        best = results[0]
-        priority_domains = ['docs.', 'github.com', 'python.org', 'stackoverflow.com']
-        for r in results:
-            if any(domain in r['href'] for domain in priority_domains):
-                best = r
-                break
-        
-        url = best['href']
-        logger.info(f"🕷️ SMART FETCH: {url}")
-        
-        # 3. Fetch
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-        }
-        response = requests.get(url, headers=headers, timeout=10)
-        
-        if response.status_code != 200:
-            return f"Error HTTP {response.status_code}"
-        
-        soup = BeautifulSoup(response.text, 'html.parser')
-        for script in soup(["script", "style", "nav", "footer"]):
-            script.decompose()
-        
-        text = soup.get_text(separator='\n')
-        lines = (line.strip() for line in text.splitlines())
-        clean = '\n'.join(line for line in lines if line)
-        
-        if len(clean) > WEB_PAGE_MAX_CHARS:
-            return clean[:WEB_PAGE_MAX_CHARS] + "\n...[truncated]"
-        
-        return clean
-        
+
+        # 2. Les meilleures URLs sont téléchargées en parallèle, la première page exploitable gagne
+        urls = _rank_urls(results)[:WEB_FETCH_CANDIDATES]
+        logger.info(f"🕷️ SMART FETCH: {', '.join(urls)}")
+        return _smart_result(query, *_first_usable(urls), tried=len(urls))
+
+    except Exception as e:
+        return f"Error: {e}"
+
+
+async def _asmart_web_fetch(query: str):
+    try:
+        results = await _asearch(query, max_results=5)
+        if not results:
+            return "No results found."
+
+        urls = _rank_urls(results)[:WEB_FETCH_CANDIDATES]
+        logger.info(f"🕷️ SMART FETCH: {', '.join(urls)}")
+        # Scoring des passages hors de l'event loop
+        return await asyncio.to_thread(_smart_result, query, *await _afirst_usable(urls), len(urls))
+
     except Exception as e:
-        return f"Error: {e}"
\ No newline at end of file
+        return f"Error: {e}"
+
+
+# ============================================================
+# OUTILS EXPOSÉS (sync pour le CLI, async pour le serveur)
+# ============================================================
+web_search = StructuredTool.from_function(func=_web_search, coroutine=_aweb_search, name="web_search")
+fetch_web_page = StructuredTool.from_function(func=_fetch_web_page, coroutine=_afetch_web_page, name="fetch_web_page")
+smart_web_fetch = StructuredTool.from_function(func=_smart_web_fetch, coroutine=_asmart_web_fetch, name="smart_web_fetch")
@@ -0,0 +1,74 @@
+# app/utils/html_text.py
+from bs4 import BeautifulSoup
+from app.config import WEB_EXTRACT_MAX_CHARS
+
+try:
+    import lxml.html
+    from lxml import etree
+    HAS_LXML = True
+except ImportError:  # lxml absent → BeautifulSoup + html.parser (pur Python, plus lent)
+    HAS_LXML = False
+
+# Balises dont le contenu n'est jamais du texte utile
+SKIP_TAGS = {"script", "style", "nav", "footer", "svg"}
+
+
+def _phrases(raw: str):
+    """Découpe comme l'ancien nettoyage : lignes, puis segments séparés par deux espaces."""
+    for line in raw.splitlines():
+        for phrase in line.strip().split("  "):
+            phrase = phrase.strip()
+            if phrase:
+                yield phrase
+
+
+def _collect(strings, max_chars: int) -> str:
+    """Assemble les segments de texte, en s'arrêtant dès que `max_chars` est atteint."""
+    kept = []
+    total = 0
+    for raw in strings:
+        for phrase in _phrases(raw):
+            kept.append(phrase)
+            total += len(phrase) + 1
+            if total >= max_chars:
+                return "\n".join(kept)[:max_chars]
+    return "\n".join(kept)
+
+
+def _lxml_strings(html: str | bytes):
+    """Textes du document dans l'ordre de lecture, sous-arbres SKIP_TAGS ignorés (paresseux)."""
+    try:
+        root = lxml.html.fromstring(html)
+    except ValueError:
+        # str avec déclaration d'encodage XML : lxml exige des bytes
+        root = lxml.html.fromstring(html.encode("utf-8"))
+    except etree.ParserError:  # document vide
+        return
+
+    walker = etree.iterwalk(root, events=("start", "end", "comment", "pi"))
+    for event, el in walker:
+        if event == "start":
+            if el.tag in SKIP_TAGS:
+                walker.skip_subtree()
+            elif el.text:
+                yield el.text
+        elif el.tail:
+            # Le texte qui suit une balise (même ignorée, ou un commentaire) fait partie du parent
+            yield el.tail
+
+
+def _soup_strings(html: str | bytes):
+    soup = BeautifulSoup(html, "html.parser")
+    for tag in soup(list(SKIP_TAGS)):
+        tag.decompose()
+    yield soup.get_text(separator="\n")
+
+
+def extract_text(html: str | bytes, max_chars: int = WEB_EXTRACT_MAX_CHARS) -> str:
+    """
+    HTML → texte brut sans lignes vides, limité à ~`max_chars`.
+    Avec lxml (parser C), le parcours s'arrête dès qu'il a assez de texte ; sinon
+    BeautifulSoup/html.parser. Passer des bytes laisse le parser lire le <meta charset>.
+    """
+    strings = _lxml_strings(html) if HAS_LXML else _soup_strings(html)
+    return _collect(strings, max_chars)
@@ -0,0 +1,47 @@
+# app/utils/http_stats.py
+import threading
+import httpx
+
+
+class ConnectionStats:
+    """
+    Compteurs de réutilisation des connexions d'un pool httpx.
+    Les hooks `on_request` / `on_request_async` se branchent dans les `event_hooks` du client ;
+    chaque requête reçoit une trace httpcore qui compte les vraies ouvertures de connexion.
+    Des compteurs propres au pool (hits du registre...) peuvent être ajoutés via `extra`.
+    """
+
+    def __init__(self, *extra: str):
+        self._lock = threading.Lock()
+        self._counts = {key: 0 for key in extra}
+        self._counts["http_requests"] = 0       # requêtes envoyées par les clients partagés
+        self._counts["connections_opened"] = 0  # handshakes TCP (+TLS) réellement effectués
+
+    def incr(self, key: str, n: int = 1):
+        with self._lock:
+            self._counts[key] += n
+
+    def _on_trace(self, event_name: str, info: dict):
+        # httpcore émet cet évènement uniquement quand il doit ouvrir une nouvelle connexion
+        if event_name == "connection.connect_tcp.complete":
+            self.incr("connections_opened")
+
+    async def _on_trace_async(self, event_name: str, info: dict):
+        self._on_trace(event_name, info)
+
+    def on_request(self, request: httpx.Request):
+        self.incr("http_requests")
+        request.extensions["trace"] = self._on_trace
+
+    async def on_request_async(self, request: httpx.Request):
+        self.incr("http_requests")
+        request.extensions["trace"] = self._on_trace_async
+
+    def snapshot(self) -> dict:
+        """Compteurs + connexions réutilisées et taux de réutilisation."""
+        with self._lock:
+            stats = dict(self._counts)
+        reused = max(stats["http_requests"] - stats["connections_opened"], 0)
+        stats["connections_reused"] = reused
+        stats["connection_reuse_rate"] = round(reused / stats["http_requests"], 3) if stats["http_requests"] else 0.0
+        return stats
@@ -0,0 +1,98 @@
+# app/utils/passages.py
+import re
+import numpy as np
+from app.config import WEB_PAGE_MAX_CHARS, WEB_PASSAGE_CHARS
+
+_TOKEN_RE = re.compile(r"[a-z0-9_]+")
+
+STOPWORDS = {
+    "a", "an", "the", "and", "or", "of", "to", "in", "on", "for", "with", "is", "are", "be",
+    "how", "what", "do", "does", "i", "it", "this", "that", "by", "as", "at", "from", "can",
+}
+
+GAP = "\n[...]\n"
+
+
+def tokenize(text: str) -> list:
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+def split_passages(text: str, target_chars: int = WEB_PASSAGE_CHARS) -> list:
+    """Regroupe les lignes consécutives du texte nettoyé en passages d'environ `target_chars`."""
+    passages = []
+    current = []
+    size = 0
+    for line in text.splitlines():
+        current.append(line)
+        size += len(line) + 1
+        if size >= target_chars:
+            passages.append("\n".join(current))
+            current, size = [], 0
+    if current:
+        passages.append("\n".join(current))
+    return passages
+
+
+def bm25_scores(passages: list, query: str, k1: float = 1.5, b: float = 0.75) -> np.ndarray:
+    """
+    Score BM25 de chaque passage pour la requête. Seuls les termes de la requête comptent :
+    la matrice des fréquences est (passages x termes de la requête), le reste est vectorisé.
+    """
+    terms = list(dict.fromkeys(tokenize(query)))
+    if not passages or not terms:
+        return np.zeros(len(passages))
+    column = {term: j for j, term in enumerate(terms)}
+
+    tf = np.zeros((len(passages), len(terms)), dtype=np.float64)
+    lengths = np.empty(len(passages), dtype=np.float64)
+    for i, passage in enumerate(passages):
+        tokens = tokenize(passage)
+        lengths[i] = len(tokens)
+        for token in tokens:
+            j = column.get(token)
+            if j is not None:
+                tf[i, j] += 1
+
+    n = len(passages)
+    df = np.count_nonzero(tf, axis=0)
+    idf = np.log((n - df + 0.5) / (df + 0.5) + 1.0)
+    avgdl = lengths.mean() or 1.0
+    norm = k1 * (1.0 - b + b * lengths / avgdl)
+    return ((tf * (k1 + 1.0)) / (tf + norm[:, None])) @ idf
+
+
+def top_passages(text: str, query: str, budget: int = WEB_PAGE_MAX_CHARS) -> str | None:
+    """
+    Les passages les plus pertinents pour `query`, remis dans l'ordre du document, dans la
+    limite de `budget` caractères. None si aucun passage ne contient un terme de la requête
+    (l'appelant garde alors le début de la page).
+    """
+    passages = split_passages(text)
+    scores = bm25_scores(passages, query)
+    if not scores.any():
+        return None
+
+    chosen = []
+    used = 0
+    for i in np.argsort(-scores, kind="stable"):
+        if scores[i] <= 0:
+            break
+        cost = len(passages[i]) + len(GAP)
+        if used + cost > budget:
+            continue
+        chosen.append(int(i))
+        used += cost
+
+    if not chosen:
+        # Même le meilleur passage dépasse le budget : on le tronque
+        return passages[int(np.argmax(scores))][:budget]
+
+    chosen.sort()
+    parts = []
+    for k, i in enumerate(chosen):
+        if k == 0 and i > 0 or k > 0 and i != chosen[k - 1] + 1:
+            parts.append("[...]")
+        parts.append(passages[i])
+    if chosen[-1] != len(passages) - 1:
+        parts.append("[...]")
+    return "\n".join(parts)
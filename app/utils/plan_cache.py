@@ -0,0 +1,129 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from pathlib import Path
+from app.config import PLAN_CACHE_TTL, PLAN_CACHE_MAXSIZE, PLAN_CACHE_PERSIST, PLAN_CACHE_PATH
+from app.logger import get_logger
+
+logger = get_logger("plan_cache")
+
+
+class PlanCache:
+    """
+    LRU + TTL cache for planner results.
+
+    - get/set/invalidate are O(1): entries live in an OrderedDict kept in LRU order.
+    - Expiry is proactive: since every entry has the same TTL, insertion order is expiry
+      order, so a deque of (expires_at, key) is drained from the left on each access.
+    - A single lock makes it safe from threaded (CLI/ToolNode) and async (server) sessions.
+    - With `path`, the cache is reloaded at startup and rewritten atomically on change.
+    """
+
+    def __init__(self, ttl=PLAN_CACHE_TTL, maxsize=PLAN_CACHE_MAXSIZE, path: Path | None = None):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.path = Path(path) if path else None
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+        self._entries: OrderedDict = OrderedDict()  # key → (plan, expires_at)
+        self._expiry: deque = deque()               # (expires_at, key), oldest first
+        self._lock = threading.Lock()
+        if self.path:
+            self._load()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, query: str):
+        with self._lock:
+            self._purge_expired()
+            entry = self._entries.get(query)
+            if entry is None:
+                self.stats["misses"] += 1
+                logger.debug(f"📭 PLAN CACHE MISS ({self._ratio()})")
+                return None
+            self._entries.move_to_end(query)
+            self.stats["hits"] += 1
+            logger.debug(f"📬 PLAN CACHE HIT ({self._ratio()})")
+            return entry[0]
+
+    def set(self, query: str, plan: dict):
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._purge_expired()
+            self._entries[query] = (plan, expires_at)
+            self._entries.move_to_end(query)
+            self._expiry.append((expires_at, query))
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+            self._save()
+
+    def invalidate(self, query: str):
+        with self._lock:
+            if self._entries.pop(query, None) is not None:
+                self.stats["invalidations"] += 1
+                self._save()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._expiry.clear()
+            self._save()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["size"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+        return stats
+
+    # ── internals (lock held) ──
+
+    def _ratio(self) -> str:
+        return f"hits={self.stats['hits']} misses={self.stats['misses']}"
+
+    def _purge_expired(self):
+        now = time.time()
+        while self._expiry and self._expiry[0][0] <= now:
+            expires_at, key = self._expiry.popleft()
+            entry = self._entries.get(key)
+            # Ignore stale deque records of keys that were re-set since
+            if entry is not None and entry[1] == expires_at:
+                del self._entries[key]
+                self.stats["expirations"] += 1
+
+    def _load(self):
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ Plan cache illisible ({e}), démarrage à vide")
+            return
+        now = time.time()
+        # Saved in LRU order; the expiry deque must be sorted by deadline
+        for key, plan, expires_at in data:
+            if expires_at > now:
+                self._entries[key] = (plan, expires_at)
+        self._expiry.extend(sorted((expires_at, key) for key, (_, expires_at) in self._entries.items()))
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        logger.info(f"♻️ Plan cache rechargé : {len(self._entries)} plans")
+
+    def _save(self):
+        if not self.path:
+            return
+        data = [[key, plan, expires_at] for key, (plan, expires_at) in self._entries.items()]
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logger.warning(f"⚠️ Sauvegarde du plan cache impossible : {e}")
+
+
+plan_cache = PlanCache(path=PLAN_CACHE_PATH if PLAN_CACHE_PERSIST else None)
@@ -0,0 +1,179 @@
+import re
+import threading
+import zlib
+import numpy as np
+from app.config import PLAN_INDEX_DIM, PLAN_INDEX_MAXSIZE, PLAN_SIMILARITY_THRESHOLD
+from app.logger import get_logger
+
+logger = get_logger("plan_index")
+
+_WORD_RE = re.compile(r"[a-z0-9_.+#-]+")
+
+STOPWORDS = {
+    "a", "an", "the", "with", "for", "to", "of", "in", "on", "and", "that", "this",
+    "me", "my", "please", "some", "using", "use", "into", "from", "it",
+    "can", "could", "would", "you", "i", "want", "need", "just",
+}
+
+# Canonical forms for common request verbs/nouns so paraphrases share features
+SYNONYMS = {
+    "build": "create", "make": "create", "write": "create", "generate": "create", "implement": "create",
+    "authentication": "auth", "authorization": "auth", "login": "auth",
+    "application": "app", "apis": "api", "endpoint": "api", "endpoints": "api",
+    "repair": "fix", "debug": "fix",
+}
+
+
+# Words whose change alters what must be built, however similar the rest of the request is
+NEGATIONS = {"no", "not", "without", "never", "dont", "don't", "except", "skip", "remove", "delete"}
+TECH_TERMS = {
+    "python", "javascript", "js", "typescript", "ts", "java", "go", "rust", "c", "c++", "c#", "ruby", "php",
+    "bash", "sql", "html", "css", "json", "yaml", "yml", "toml", "xml", "csv", "ini", "markdown",
+    "flask", "django", "fastapi", "express", "react", "vue", "angular", "svelte", "node", "nodejs",
+    "sqlite", "postgres", "postgresql", "mysql", "redis", "mongodb", "docker", "kubernetes",
+    "pytest", "unittest", "jest", "numpy", "pandas", "matplotlib", "requests", "httpx", "asyncio",
+    "tkinter", "pygame", "cli", "gui", "rest", "graphql", "websocket", "jwt", "oauth",
+}
+
+
+def _bucket(feature: str, dim: int) -> tuple[int, float]:
+    """Stable signed hashing (crc32, unlike hash(), does not change between runs)."""
+    h = zlib.crc32(feature.encode("utf-8"))
+    return h % dim, (1.0 if (h >> 31) & 1 else -1.0)
+
+
+def content_words(text: str) -> list[str]:
+    """Lower-cased words without stopwords, synonyms mapped to their canonical form."""
+    return [SYNONYMS.get(w, w) for w in _WORD_RE.findall(text.lower()) if w not in STOPWORDS]
+
+
+def key_terms(text: str) -> frozenset:
+    """
+    Content words a reused plan must share with the request: file names and paths, words
+    with digits, negations and technology names. Everything else may differ by wording.
+    """
+    return frozenset(
+        w for w in content_words(text)
+        if w in NEGATIONS or w in TECH_TERMS or any(ch in w for ch in "./_") or any(ch.isdigit() for ch in w)
+    )
+
+
+def vectorize(text: str, dim: int = PLAN_INDEX_DIM) -> np.ndarray:
+    """Hashed bag of words + character trigrams, L2-normalized."""
+    words = content_words(text)
+    vec = np.zeros(dim, dtype=np.float32)
+    for word in words:
+        idx, sign = _bucket("w:" + word, dim)
+        vec[idx] += sign
+        padded = f" {word} "
+        for i in range(len(padded) - 2):
+            idx, sign = _bucket(padded[i:i + 3], dim)
+            vec[idx] += 0.5 * sign
+    norm = np.linalg.norm(vec)
+    if norm:
+        vec /= norm
+    return vec
+
+
+class SemanticPlanIndex:
+    """
+    Nearest-neighbour lookup of stored plans by request similarity.
+
+    Stored requests are unit vectors, so cosine similarity is a dot product. The matrix is
+    kept feature-major (dim x capacity): a query only has a few dozen non-zero features,
+    so scoring gathers those rows and reduces them, touching nnz * N floats instead of
+    dim * N. Once `maxsize` plans are stored, the oldest column is overwritten (ring
+    buffer). Runs offline, NumPy only.
+
+    Similarity alone cannot tell "parse json" from "parse yaml", or "with tests" from
+    "without tests": a candidate above the threshold is only reused if it has the same
+    key terms (file names, numbers, negations, technology names, see `key_terms`).
+    """
+
+    def __init__(self, dim=PLAN_INDEX_DIM, maxsize=PLAN_INDEX_MAXSIZE, threshold=PLAN_SIMILARITY_THRESHOLD):
+        self.dim = dim
+        self.maxsize = maxsize
+        self.threshold = threshold
+        self._matrix = np.zeros((dim, min(maxsize, 256)), dtype=np.float32)
+        self._keys: list[str | None] = []
+        self._terms: list[frozenset | None] = []
+        self._plans: list[dict | None] = []
+        self._slots: dict[str, int] = {}
+        self._next = 0
+        self._lock = threading.Lock()
+        self.stats = {"lookups": 0, "hits": 0}
+
+    def __len__(self):
+        return len(self._slots)
+
+    def add(self, key: str, plan: dict):
+        vec = vectorize(key, self.dim)
+        with self._lock:
+            slot = self._slots.get(key)
+            if slot is None:
+                slot = self._allocate()
+                old_key = self._keys[slot]
+                if old_key is not None:
+                    self._slots.pop(old_key, None)
+                self._keys[slot] = key
+                self._slots[key] = slot
+            self._terms[slot] = key_terms(key)
+            self._matrix[:, slot] = vec
+            self._plans[slot] = plan
+
+    def remove(self, key: str):
+        with self._lock:
+            slot = self._slots.pop(key, None)
+            if slot is not None:
+                self._matrix[:, slot] = 0.0
+                self._keys[slot] = None
+                self._terms[slot] = None
+                self._plans[slot] = None
+
+    def lookup(self, query: str) -> tuple[dict | None, float, str | None]:
+        """
+        Return (plan, score, matched_key) of the closest request above the threshold with the same key terms.
+        plan=None when nothing qualifies (score/key are then those of the closest request).
+        """
+        vec = vectorize(query, self.dim)
+        nz = np.flatnonzero(vec)
+        terms = key_terms(query)
+        with self._lock:
+            n = len(self._keys)
+            if n == 0 or nz.size == 0:
+                return None, 0.0, None
+            scores = vec[nz] @ self._matrix[nz, :n]
+            self.stats["lookups"] += 1
+            best = int(np.argmax(scores))
+            above = np.flatnonzero(scores >= self.threshold)
+            for slot in above[np.argsort(-scores[above], kind="stable")].tolist():
+                if self._keys[slot] is not None and self._terms[slot] == terms:
+                    self.stats["hits"] += 1
+                    return self._plans[slot], float(scores[slot]), self._keys[slot]
+        return None, float(scores[best]), self._keys[best]
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["size"] = len(self._slots)
+        stats["hit_rate"] = round(stats["hits"] / stats["lookups"], 3) if stats["lookups"] else 0.0
+        stats["threshold"] = self.threshold
+        return stats
+
+    def _allocate(self) -> int:
+        n = len(self._keys)
+        if n < self.maxsize:
+            if n == self._matrix.shape[1]:
+                grown = np.zeros((self.dim, min(self.maxsize, n * 2)), dtype=np.float32)
+                grown[:, :n] = self._matrix
+                self._matrix = grown
+            self._keys.append(None)
+            self._terms.append(None)
+            self._plans.append(None)
+            return n
+        slot = self._next
+        self._next = (self._next + 1) % self.maxsize
+        return slot
+
+
+plan_index = SemanticPlanIndex()
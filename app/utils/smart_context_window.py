@@ -1,22 +1,100 @@
+import json
+import re
+import threading
+from collections import OrderedDict
 from langchain_core.messages import SystemMessage, ToolMessage, AIMessage, HumanMessage
-from app.config import MAX_CONTEXT_MESSAGES
+from app.config import (
+    MAX_CONTEXT_MESSAGES, CONTEXT_WINDOW_MODE, CONTEXT_TOKEN_BUDGETS, CONTEXT_TOKEN_BUDGET_DEFAULT,
+    CONTEXT_RESPONSE_RESERVE, CONTEXT_TOOL_SHARE,
+)
 from app.logger import get_logger
 
 logger = get_logger("context_window")
 
 
+# ============================================================
+# TOKEN ESTIMATION
+# ============================================================
+
+# BPE tokenizers rarely keep more than ~5 word characters together and give most
+# punctuation its own token: counting those pieces slightly over-estimates real
+# counts, which is the safe side for a budget. No tokenizer download needed.
+_TOKEN_RE = re.compile(r"\w{1,5}|[^\w\s]")
+_MESSAGE_OVERHEAD = 4  # role + separators
+
+_TOKEN_CACHE: OrderedDict = OrderedDict()  # (message id, content length) → tokens
+_TOKEN_CACHE_MAX = 4096
+_TOKEN_LOCK = threading.Lock()
+
+
+def estimate_tokens(text: str) -> int:
+    """Fast local token estimate of a string."""
+    return len(_TOKEN_RE.findall(text)) if text else 0
+
+
+def _message_text(message) -> str:
+    content = message.content
+    if not isinstance(content, str):
+        content = json.dumps(content, ensure_ascii=False, default=str)
+    tool_calls = getattr(message, "tool_calls", None)
+    if tool_calls:
+        content += json.dumps([{"name": c.get("name"), "args": c.get("args")} for c in tool_calls],
+                              ensure_ascii=False, default=str)
+    return content
+
+
+def message_tokens(message) -> int:
+    """Token estimate of a message, memoized by message id (content length guards against edits)."""
+    message_id = getattr(message, "id", None)
+    content = message.content
+    key = (message_id, len(content) if isinstance(content, str) else -1)
+    if message_id is not None:
+        with _TOKEN_LOCK:
+            tokens = _TOKEN_CACHE.get(key)
+            if tokens is not None:
+                _TOKEN_CACHE.move_to_end(key)
+                return tokens
+    tokens = estimate_tokens(_message_text(message)) + _MESSAGE_OVERHEAD
+    if message_id is not None:
+        with _TOKEN_LOCK:
+            _TOKEN_CACHE[key] = tokens
+            while len(_TOKEN_CACHE) > _TOKEN_CACHE_MAX:
+                _TOKEN_CACHE.popitem(last=False)
+    return tokens
+
+
+def context_budget(model_name: str | None = None) -> int:
+    """Prompt token budget of a model: exact name, else the longest configured name it contains."""
+    if model_name is None:
+        from app.llm.llm_client import current_model_name
+        model_name = current_model_name()
+    if model_name in CONTEXT_TOKEN_BUDGETS:
+        return CONTEXT_TOKEN_BUDGETS[model_name]
+    matches = [name for name in CONTEXT_TOKEN_BUDGETS if name in model_name]
+    return CONTEXT_TOKEN_BUDGETS[max(matches, key=len)] if matches else CONTEXT_TOKEN_BUDGET_DEFAULT
+
+
+# ============================================================
+# WINDOW
+# ============================================================
+
 def smart_context_window(
     messages: list,
-    max_messages: int = MAX_CONTEXT_MESSAGES,
+    max_messages: int | None = None,
     max_tool_content: int = 1500,
+    reserved_tokens: int = 0,
+    budget_tokens: int | None = None,
 ) -> list:
     """
     Reduce conversation history to fit in the LLM context window.
 
     Args:
         messages: Full message list from state["messages"]
-        max_messages: Max number of non-system messages to keep (default from config)
-        max_tool_content: Max chars for ToolMessage content before truncation
+        max_messages: Max number of non-system messages to keep (default from config
+            in "messages" mode; in "tokens" mode, only applied when given)
+        max_tool_content: Max chars for ToolMessage content before truncation ("messages" mode)
+        reserved_tokens: Tokens already taken by the caller's system prompt ("tokens" mode)
+        budget_tokens: Prompt budget, defaults to the active model's ("tokens" mode)
 
     Returns:
         List of messages ready to be prepended with a SystemMessage by the caller.
@@ -29,6 +107,12 @@ def smart_context_window(
     if not filtered:
         return []
 
+    if CONTEXT_WINDOW_MODE == "tokens":
+        return _token_window(filtered, max_messages, reserved_tokens, budget_tokens)
+
+    if max_messages is None:
+        max_messages = MAX_CONTEXT_MESSAGES
+
     # ── 2. Truncate oversized ToolMessages ──
     filtered = _truncate_tool_messages(filtered, max_tool_content)
 
@@ -83,6 +167,60 @@ def smart_context_window(
     return recent
 
 
+def _token_window(filtered: list, max_messages: int | None, reserved_tokens: int,
+                  budget_tokens: int | None) -> list:
+    """
+    Keep as much recent history as the token budget allows.
+
+    Messages are grouped into units (an AIMessage with the ToolMessages that follow it),
+    taken newest first while they fit: a ToolMessage is never separated from its call.
+    The newest unit is always kept, and the first HumanMessage (original request) is
+    re-added if it was cut, as in the message-count mode.
+    """
+    budget = (budget_tokens or context_budget()) - CONTEXT_RESPONSE_RESERVE
+    available = max(budget - reserved_tokens, 0)
+
+    # ── Truncate oversized ToolMessages relative to the budget (≈4 chars per token) ──
+    filtered = _truncate_tool_messages(filtered, max(int(available * CONTEXT_TOOL_SHARE) * 4, 500))
+
+    units: list[list] = []
+    for m in filtered:
+        if isinstance(m, ToolMessage) and units:
+            units[-1].append(m)
+        else:
+            units.append([m])
+
+    first_human = next((m for m in filtered if isinstance(m, HumanMessage)), None)
+    first_cost = message_tokens(first_human) if first_human is not None else 0
+
+    kept: list[list] = []
+    used = count = 0
+    for unit in reversed(units):
+        cost = sum(message_tokens(m) for m in unit)
+        first_in_unit = first_human is not None and unit[0] is first_human
+        # Room for the original request must stay available unless this unit contains it
+        reserve = 0 if first_in_unit or any(u[0] is first_human for u in kept) else first_cost
+        too_many = max_messages is not None and count + len(unit) > max_messages - (1 if reserve else 0)
+        if kept and (used + cost + reserve > available or too_many):
+            break
+        kept.append(unit)
+        used += cost
+        count += len(unit)
+
+    recent = [m for unit in reversed(kept) for m in unit]
+    if first_human is not None and not any(m is first_human for m in recent):
+        recent = [first_human] + recent
+        used += first_cost
+
+    logger.info(
+        f"📐 Context window: {reserved_tokens + used}/{budget} tokens "
+        f"(system {reserved_tokens}, history {used}), {len(recent)}/{len(filtered)} messages"
+    )
+    if reserved_tokens + used > budget:
+        logger.warning(f"⚠️ Context over budget ({reserved_tokens + used}/{budget} tokens): latest exchange kept whole")
+    return recent
+
+
 def _truncate_tool_messages(messages: list, max_content: int) -> list:
     """
     Truncate ToolMessages that exceed max_content characters.
@@ -95,6 +233,7 @@ def _truncate_tool_messages(messages: list, max_content: int) -> list:
                 content=m.content[:max_content] + "\n...[truncated]",
                 tool_call_id=m.tool_call_id,
                 name=getattr(m, 'name', ''),
+                id=m.id,  # keeps the token count memoized
             ))
         else:
             result.append(m)
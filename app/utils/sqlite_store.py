@@ -0,0 +1,109 @@
+# app/utils/sqlite_store.py
+import sqlite3
+import threading
+from pathlib import Path
+
+
+class SQLiteLRUStore:
+    """
+    Socle des caches persistants (réponses LLM, pages web) : une table SQLite en WAL,
+    une colonne `accessed` pour l'éviction LRU et une colonne `size` pour le budget en octets.
+    Dès que la taille totale dépasse `max_bytes`, les entrées les moins récemment lues sont
+    supprimées jusqu'à repasser sous 90% du budget.
+
+    Une sous-classe déclare `table`, `key_column` et ses propres `columns`, puis s'appuie sur
+    `_select` / `_write` / `_delete` / `_mark_used`, à appeler avec `self._lock` tenu.
+    """
+
+    table = ""
+    key_column = "key"
+    columns = ""  # colonnes propres au cache, en plus de la clé, de `accessed` et de `size`
+
+    def __init__(self, path: Path, max_bytes: int, counters: tuple[str, ...] = ("hits", "misses")):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.stats = {**{name: 0 for name in counters}, "writes": 0, "evictions": 0}
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.table} ("
+            f" {self.key_column} TEXT PRIMARY KEY, {self.columns},"
+            " accessed REAL NOT NULL, size INTEGER NOT NULL)"
+        )
+        self._db.execute(f"CREATE INDEX IF NOT EXISTS idx_{self.table}_accessed ON {self.table}(accessed)")
+        self._total = self._db.execute(f"SELECT COALESCE(SUM(size), 0) FROM {self.table}").fetchone()[0]
+
+    # ── primitives (lock tenu) ──
+
+    def _select(self, key: str, columns: str) -> tuple | None:
+        return self._db.execute(
+            f"SELECT {columns} FROM {self.table} WHERE {self.key_column} = ?", (key,)
+        ).fetchone()
+
+    def _mark_used(self, key: str, now: float, **values):
+        """Met à jour `accessed` (et d'éventuelles autres colonnes) : l'entrée remonte dans la LRU."""
+        assignments = "".join(f", {column} = ?" for column in values)
+        self._db.execute(
+            f"UPDATE {self.table} SET accessed = ?{assignments} WHERE {self.key_column} = ?",
+            (now, *values.values(), key),
+        )
+
+    def _write(self, key: str, size: int, now: float, **values):
+        old = self._select(key, "size")
+        columns = ", ".join([self.key_column, *values, "accessed", "size"])
+        placeholders = ", ".join("?" * (len(values) + 3))
+        self._db.execute(
+            f"INSERT OR REPLACE INTO {self.table} ({columns}) VALUES ({placeholders})",
+            (key, *values.values(), now, size),
+        )
+        self._total += size - (old[0] if old else 0)
+        self.stats["writes"] += 1
+        if self._total > self.max_bytes:
+            self._evict()
+
+    def _delete(self, key: str, size: int):
+        self._db.execute(f"DELETE FROM {self.table} WHERE {self.key_column} = ?", (key,))
+        self._total -= size
+
+    def _evict(self):
+        # LRU : on supprime les moins récemment lues jusqu'à repasser sous 90% du budget
+        target = int(self.max_bytes * 0.9)
+        while self._total > target:
+            rows = self._db.execute(
+                f"SELECT {self.key_column}, size FROM {self.table} ORDER BY accessed LIMIT 64"
+            ).fetchall()
+            if not rows:
+                self._total = 0
+                break
+            victims = []
+            for key, size in rows:
+                if self._total <= target:
+                    break
+                victims.append((key,))
+                self._total -= size
+            self._db.executemany(f"DELETE FROM {self.table} WHERE {self.key_column} = ?", victims)
+            self.stats["evictions"] += len(victims)
+
+    # ── API commune ──
+
+    def clear(self):
+        with self._lock:
+            self._db.execute(f"DELETE FROM {self.table}")
+            self._total = 0
+
+    def _hit_rate(self, stats: dict) -> float:
+        lookups = stats["hits"] + stats["misses"]
+        return round(stats["hits"] / lookups, 3) if lookups else 0.0
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+            entries = self._db.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+        stats["hit_rate"] = self._hit_rate(stats)
+        stats["entries"] = entries
+        stats["bytes"] = self._total
+        return stats
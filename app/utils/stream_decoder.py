@@ -0,0 +1,122 @@
+import re
+from app.logger import get_logger
+
+logger = get_logger("stream_decoder")
+
+_ANSWER_KEY = re.compile(r'"answer"\s*:\s*"')
+_TOOL_KEY = re.compile(r'"(?:tool|name|function|tool_name)"\s*:\s*"([^"]+)"')
+_ARGS_KEY = re.compile(r'"(?:args|arguments|parameters|input|kwargs)"\s*:\s*')
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+class PartialResponseDecoder:
+    """
+    Incrementally extract user-visible text from a streamed agent response.
+
+    Agents answer with JSON ({"answer": "..."} or {"tool": ..., "args": {...}}), so raw
+    tokens are not presentable as-is. The decoder is fed each token chunk and returns
+    the new displayable pieces as (field, text) tuples:
+
+    - ("answer", text): decoded characters of the "answer" string value
+    - ("tool", name):   the tool name, emitted once as soon as it is complete
+    - ("args", text):   raw JSON text of the tool arguments as it arrives
+    - ("text", text):   plain text when the model did not answer in JSON
+    - ("plan", text):   raw planner output (fmt="text")
+
+    Work per chunk is proportional to the chunk size once the response shape is known.
+    """
+
+    def __init__(self, fmt: str = "json"):
+        self.fmt = fmt
+        self.buffer = ""
+        self.mode = "plan" if fmt == "text" else None
+        self._scan = 0           # start of the value being decoded (answer string / args object)
+        self._sent = 0           # args: buffer index already forwarded
+        self._closed = False     # answer string fully decoded
+        self._tool_sent = False
+
+    def feed(self, chunk: str) -> list[tuple[str, str]]:
+        if not chunk:
+            return []
+        self.buffer += chunk
+
+        if self.mode in ("plan", "text"):
+            return [(self.mode, chunk)]
+
+        events = []
+        if self.mode is None:
+            self._detect_mode(events)
+            if self.mode is None:
+                return events
+            if self.mode == "text":
+                return events + [("text", self.buffer)]
+
+        if self.mode == "answer":
+            if not self._closed:
+                text = self._decode_string()
+                if text:
+                    events.append(("answer", text))
+        elif self.mode == "tool":
+            if not self._scan:
+                self._detect_mode(events)
+            if self._scan:
+                text = self.buffer[max(self._scan, self._sent):]
+                self._sent = len(self.buffer)
+                if text:
+                    events.append(("args", text))
+        return events
+
+    def _detect_mode(self, events: list):
+        buf = self.buffer
+        if self.mode is None:
+            head = buf.lstrip()
+            if head and head[0] not in "{[`<":
+                self.mode = "text"
+                return
+            match = _ANSWER_KEY.search(buf)
+            if match:
+                self.mode = "answer"
+                self._scan = match.end()
+                return
+
+        tool = _TOOL_KEY.search(buf)
+        if tool and not self._tool_sent:
+            self.mode = "tool"
+            self._tool_sent = True
+            events.append(("tool", tool.group(1)))
+        if self.mode == "tool" and not self._scan:
+            args = _ARGS_KEY.search(buf)
+            if args:
+                self._scan = args.end()
+
+    def _decode_string(self) -> str:
+        """Decode the JSON string value from _scan, stopping on an incomplete escape."""
+        buf = self.buffer
+        out = []
+        i = self._scan
+        while i < len(buf):
+            c = buf[i]
+            if c == "\\":
+                if i + 1 >= len(buf):
+                    break
+                esc = buf[i + 1]
+                if esc == "u":
+                    if i + 6 > len(buf):
+                        break
+                    try:
+                        out.append(chr(int(buf[i + 2:i + 6], 16)))
+                    except ValueError:
+                        pass
+                    i += 6
+                    continue
+                out.append(_ESCAPES.get(esc, esc))
+                i += 2
+                continue
+            if c == '"':
+                self._closed = True
+                i += 1
+                break
+            out.append(c)
+            i += 1
+        self._scan = i
+        return "".join(out)
@@ -0,0 +1,110 @@
+"""
+Concurrent-session throughput: blocking (sync) graph vs async-native graph.
+
+The LLM is replaced by a fake chat model with a fixed latency so the numbers only
+reflect how the server event loop copes with N sessions in flight:
+
+- sync:  each session runs `graph_app.invoke` on the event loop thread, which is what
+         the blocking `llm.invoke` nodes amounted to inside the /ws handler.
+- async: each session runs `graph_app.ainvoke`; nodes await `llm.ainvoke`.
+
+A heartbeat task measures the worst event-loop stall (the /ws ping suffers the same).
+
+Usage:
+    python -m benchmarks.bench_concurrent_sessions --sessions 20 --latency 0.5
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+import app.graph.nodes as nodes
+from app.graph.graph import app as graph_app
+from app.state.dev_state import make_initial_state
+
+
+class SlowFakeChatModel(BaseChatModel):
+    """Answers immediately with a final JSON answer after `latency` seconds."""
+    latency: float = 0.5
+
+    @property
+    def _llm_type(self) -> str:
+        return "slow-fake"
+
+    def _result(self) -> ChatResult:
+        content = json.dumps({"answer": "done"})
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=content))])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self.latency)
+        return self._result()
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        return self._result()
+
+
+def _state():
+    # Short greeting → entry_router sends it straight to the generator (one LLM call)
+    return make_initial_state([HumanMessage(content="hello there")])
+
+
+async def _heartbeat(stop: asyncio.Event, lags: list):
+    interval = 0.05
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - start - interval)
+
+
+async def _run(mode: str, sessions: int) -> dict:
+    stop = asyncio.Event()
+    lags = []
+    ticker = asyncio.create_task(_heartbeat(stop, lags))
+    await asyncio.sleep(0)
+
+    async def one_session():
+        if mode == "sync":
+            return graph_app.invoke(_state())
+        return await graph_app.ainvoke(_state())
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one_session() for _ in range(sessions)))
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    await ticker
+    return {
+        "mode": mode,
+        "sessions": sessions,
+        "wall_s": elapsed,
+        "sessions_per_s": sessions / elapsed,
+        "max_loop_stall_s": max(lags) if lags else elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.5, help="fake LLM latency (s)")
+    args = parser.parse_args()
+
+    fake = SlowFakeChatModel(latency=args.latency)
+    nodes.get_llm_constrained = lambda *a, **kw: fake
+
+    print(f"{'mode':<6} {'sessions':>8} {'wall (s)':>9} {'sess/s':>8} {'max stall (s)':>14}")
+    for mode in ("sync", "async"):
+        r = asyncio.run(_run(mode, args.sessions))
+        print(f"{r['mode']:<6} {r['sessions']:>8} {r['wall_s']:>9.2f} {r['sessions_per_s']:>8.2f} {r['max_loop_stall_s']:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+HTML → text extraction: legacy pipeline vs byte-capped, early-stopping extraction.
+
+- legacy: the whole page goes through BeautifulSoup/html.parser, then the text is
+          truncated to WEB_PAGE_MAX_CHARS (what fetch_web_page used to do).
+- soup:   app.utils.html_text without lxml (html.parser, no early stop).
+- fast:   app.utils.html_text as used by the web tools: body capped at
+          WEB_FETCH_MAX_BYTES, lxml parse, text walk stops at WEB_EXTRACT_MAX_CHARS.
+
+Point --corpus at a directory of saved pages (*.html, e.g. "Save page as" from a
+browser). Without it, a synthetic corpus of documentation-like pages is generated.
+
+Usage:
+    python -m benchmarks.bench_html_extraction --corpus ~/saved_pages --repeat 5
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup
+
+from app.config import WEB_PAGE_MAX_CHARS, WEB_FETCH_MAX_BYTES
+from app.utils import html_text
+
+WORDS = (
+    "request response client server async await handler route token stream buffer "
+    "install configure module function parameter return value example error timeout"
+).split()
+
+
+def _legacy(html: bytes) -> str:
+    soup = BeautifulSoup(html, "html.parser")
+    for script in soup(["script", "style", "nav", "footer", "svg"]):
+        script.decompose()
+    text = soup.get_text(separator="\n")
+    lines = (line.strip() for line in text.splitlines())
+    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+    return "\n".join(chunk for chunk in chunks if chunk)[:WEB_PAGE_MAX_CHARS]
+
+
+def _soup(html: bytes) -> str:
+    has_lxml = html_text.HAS_LXML
+    html_text.HAS_LXML = False
+    try:
+        return html_text.extract_text(html)
+    finally:
+        html_text.HAS_LXML = has_lxml
+
+
+def _fast(html: bytes) -> str:
+    return html_text.extract_text(html[:WEB_FETCH_MAX_BYTES])
+
+
+def _synthetic_page(rng: random.Random, sections: int) -> str:
+    def sentence(n):
+        return " ".join(rng.choice(WORDS) for _ in range(n)).capitalize() + "."
+
+    nav = "".join(f"<li><a href='/p{i}'>{sentence(3)}</a></li>" for i in range(80))
+    body = []
+    for s in range(sections):
+        body.append(f"<h2 id='s{s}'>{sentence(4)}</h2>")
+        body.append("".join(f"<p>{sentence(rng.randint(12, 40))} <code>{rng.choice(WORDS)}()</code></p>" for _ in range(4)))
+        body.append(f"<pre><code>{sentence(20)}</code></pre>")
+        body.append(f"<script>var s{s} = {{'data': '{'x' * 200}'}};</script>")
+    return (
+        "<!DOCTYPE html><html><head><meta charset='utf-8'><title>Docs</title>"
+        f"<style>{'.c{color:red}' * 200}</style></head><body>"
+        f"<nav><ul>{nav}</ul></nav><main>{''.join(body)}</main>"
+        f"<footer>{sentence(30)}</footer></body></html>"
+    )
+
+
+def _make_corpus(directory: Path) -> list:
+    rng = random.Random(0)
+    paths = []
+    # Petites pages de doc, pages longues, et quelques pages de plusieurs Mo
+    for i, sections in enumerate([20] * 6 + [200] * 3 + [2000, 4000]):
+        path = directory / f"page_{i:02d}.html"
+        path.write_text(_synthetic_page(rng, sections), encoding="utf-8")
+        paths.append(path)
+    return paths
+
+
+def _bench(func, pages: list, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for html in pages:
+            func(html)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", type=Path, help="directory of saved *.html pages")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per pipeline (best is kept)")
+    args = parser.parse_args()
+
+    if args.corpus:
+        paths = sorted(args.corpus.glob("*.html"))
+        if not paths:
+            parser.error(f"no *.html file in {args.corpus}")
+    else:
+        paths = _make_corpus(Path(tempfile.mkdtemp(prefix="html_corpus_")))
+        print(f"(synthetic corpus: {paths[0].parent})")
+
+    pages = [p.read_bytes() for p in paths]
+    total_mb = sum(map(len, pages)) / 1e6
+    print(f"{len(pages)} pages, {total_mb:.1f} MB, lxml={'yes' if html_text.HAS_LXML else 'no'}\n")
+
+    results = {}
+    print(f"{'pipeline':<8} {'total (s)':>10} {'ms/page':>9} {'speedup':>8}")
+    for name, func in (("legacy", _legacy), ("soup", _soup), ("fast", _fast)):
+        results[name] = _bench(func, pages, args.repeat)
+        speedup = results["legacy"] / results[name]
+        print(f"{name:<8} {results[name]:>10.3f} {1000 * results[name] / len(pages):>9.1f} {speedup:>7.1f}x")
+
+    # Même texte en sortie, au moins sur la partie montrée au LLM
+    same = sum(_legacy(html)[:1000] == _fast(html)[:1000] for html in pages)
+    print(f"\nidentical first 1000 chars: {same}/{len(pages)} pages")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,11 +10,13 @@ type Log = {
   node: string
   content: string
   timestamp: string
+  streamId?: string
 }
 
 type ChatMessage = {
   role: 'user' | 'assistant'
   content: string
+  streaming?: boolean
 }
 
 // ── Main ─────────────────────────────────────────────────
@@ -50,6 +52,7 @@ function App() {
   const [userClosedPanel, setUserClosedPanel] = useState(false)
 
   const ws = useRef<WebSocket | null>(null)
+  const sessionId = useRef<string | null>(null)
   const inputRef = useRef<HTMLInputElement>(null)
 
   // Auto-open panel when processing starts (unless user closed it manually)
@@ -83,8 +86,16 @@ function App() {
       const data = JSON.parse(event.data)
       if (data.type === 'ping') { ws.current?.send(JSON.stringify({ type: 'pong' })); return }
       if (data.type === 'done') { setIsProcessing(false); return }
+      if (data.type === 'session') { sessionId.current = data.session_id; return }
+      if (data.type === 'token') { applyToken(data); return }
+      if (data.type === 'terminal') { applyTerminal(data); return }
       if (data.type === 'answer') {
-        setChat(prev => [...prev, { role: 'assistant', content: data.content }])
+        setChat(prev => {
+          // Replace the streamed draft (if any) with the final answer
+          const last = prev[prev.length - 1]
+          const base = last?.streaming ? prev.slice(0, -1) : prev
+          return [...base, { role: 'assistant', content: data.content }]
+        })
       } else {
         setLogs(prev => [...prev, {
           id: Date.now() + Math.random(), node: data.node,
@@ -95,6 +106,58 @@ function App() {
     }
   }
 
+  // ── Streaming tokens ───────────────────────────────────
+  // Answer tokens grow a draft assistant message; other fields (plan, tool args)
+  // grow one live log entry per node and graph step.
+  const applyToken = (data: { node: string; graph_step: number; field: string; content: string }) => {
+    if (data.field === 'answer' || (data.field === 'text' && data.node === 'generator')) {
+      setChat(prev => {
+        const last = prev[prev.length - 1]
+        if (last?.streaming) {
+          return [...prev.slice(0, -1), { ...last, content: last.content + data.content }]
+        }
+        return [...prev, { role: 'assistant', content: data.content, streaming: true }]
+      })
+      return
+    }
+    const id = `${data.node}:${data.graph_step}`
+    setLogs(prev => {
+      const last = prev[prev.length - 1]
+      if (last?.streamId === id) {
+        return [...prev.slice(0, -1), { ...last, content: last.content + data.content }]
+      }
+      const prefix = data.field === 'tool' ? '🤖 ACTION : ' : ''
+      return [...prev, {
+        id: Date.now() + Math.random(), node: data.node, streamId: id,
+        content: prefix + data.content + (data.field === 'tool' ? '\n' : ''),
+        timestamp: new Date().toLocaleTimeString([], { hour: '2-digit', minute: '2-digit', second: '2-digit' })
+      }]
+    })
+  }
+
+  // ── Terminal output ────────────────────────────────────
+  // Lines of a running command grow one live log entry; the final event replaces
+  // them with the compact summary the agent receives.
+  const applyTerminal = (data: { run_id: string; command: string; text: string; final: boolean; summary: string | null }) => {
+    const id = `terminal:${data.run_id}`
+    setLogs(prev => {
+      const index = prev.findIndex(log => log.streamId === id)
+      const header = `$ ${data.command}\n`
+      if (index === -1) {
+        return [...prev, {
+          id: Date.now() + Math.random(), node: 'tools', streamId: id,
+          content: header + (data.final && data.summary ? data.summary : data.text),
+          timestamp: new Date().toLocaleTimeString([], { hour: '2-digit', minute: '2-digit', second: '2-digit' })
+        }]
+      }
+      const entry = prev[index]
+      const content = data.final && data.summary
+        ? header + data.summary
+        : entry.content + (data.text ? '\n' + data.text : '')
+      return [...prev.slice(0, index), { ...entry, content }, ...prev.slice(index + 1)]
+    })
+  }
+
   useEffect(() => { connectWebSocket(); return () => ws.current?.close() }, [])
 
   const sendMessage = () => {
@@ -103,14 +166,15 @@ function App() {
     setLogs([])
     setIsProcessing(true)
     setUserClosedPanel(false) // reset preference on new message
-    ws.current?.send(JSON.stringify({ message: input }))
+    ws.current?.send(JSON.stringify({ message: input, stream: true }))
     setInput('')
     inputRef.current?.focus()
   }
 
   const clearSandbox = async () => {
     try {
-      await fetch('http://localhost:8000/api/cleanup', { method: 'POST' })
+      const query = sessionId.current ? `?session_id=${encodeURIComponent(sessionId.current)}` : ''
+      await fetch(`http://localhost:8000/api/cleanup${query}`, { method: 'POST' })
       setLogs([])
     } catch {
       setLogs(prev => [...prev, {
@@ -20,20 +20,24 @@ type Props = {
 }
 
 function extractDiff(content: string) {
-  const beforeMatch = content.match(/\[DIFF_BEFORE\]([\s\S]*?)\[\/DIFF_BEFORE\]/)
-  const afterMatch = content.match(/\[DIFF_AFTER\]([\s\S]*?)\[\/DIFF_AFTER\]/)
-  const cleaned = content
-    .replace(/\[DIFF_BEFORE\][\s\S]*?\[\/DIFF_BEFORE\]/g, '')
-    .replace(/\[DIFF_AFTER\][\s\S]*?\[\/DIFF_AFTER\]/g, '')
-    .trim()
+  // Unified diff emitted by the write tools; the closing tag may be cut by log truncation
+  const diffMatch = content.match(/\[DIFF\]([\s\S]*?)(?:\[\/DIFF\]|$)/)
+  const cleaned = content.replace(/\[DIFF\][\s\S]*?(?:\[\/DIFF\]|$)/g, '').trim()
 
   return {
     cleaned,
-    before: beforeMatch?.[1] ?? '',
-    after: afterMatch?.[1] ?? '',
+    lines: diffMatch ? diffMatch[1].split('\n') : [],
   }
 }
 
+function diffLineColor(line: string) {
+  if (line.startsWith('+++') || line.startsWith('---')) return '#71717a'
+  if (line.startsWith('@@')) return '#60a5fa'
+  if (line.startsWith('+')) return '#4ade80'
+  if (line.startsWith('-')) return '#f87171'
+  return '#52525b'
+}
+
 export default function LogPanel({
   logs,
   panelOpen,
@@ -146,23 +150,18 @@ export default function LogPanel({
                   display: 'flex', flexDirection: 'column', gap: 6,
                 }}>
                   {diff.cleaned && <span>{diff.cleaned}</span>}
-                  {diff.before && (
-                    <pre style={{
-                      margin: 0, padding: '8px 10px',
-                      background: 'rgba(239,68,68,.08)',
-                      border: '1px solid rgba(239,68,68,.2)',
-                      borderRadius: 6, color: '#f87171',
-                      whiteSpace: 'pre-wrap', wordBreak: 'break-word',
-                    }}>{diff.before}</pre>
-                  )}
-                  {diff.after && (
+                  {diff.lines.length > 0 && (
                     <pre style={{
                       margin: 0, padding: '8px 10px',
-                      background: 'rgba(34,197,94,.08)',
-                      border: '1px solid rgba(34,197,94,.2)',
-                      borderRadius: 6, color: '#4ade80',
+                      background: 'rgba(24,24,27,.5)',
+                      border: '1px solid rgba(39,39,42,.6)',
+                      borderRadius: 6,
                       whiteSpace: 'pre-wrap', wordBreak: 'break-word',
-                    }}>{diff.after}</pre>
+                    }}>
+                      {diff.lines.map((line, i) => (
+                        <div key={i} style={{ color: diffLineColor(line) }}>{line || ' '}</div>
+                      ))}
+                    </pre>
                   )}
                 </div>
               </div>
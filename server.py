@@ -3,12 +3,21 @@ import sys
 import os
 import json
 import asyncio
-import shutil
-from pathlib import Path
+from contextlib import asynccontextmanager
+from typing import Optional
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from langchain_core.messages import HumanMessage, AIMessage, ToolMessage
+from langchain_core.messages import HumanMessage, AIMessage, AIMessageChunk, ToolMessage
 from app.config import SANDBOX_PATH
+from app.llm.llm_client import get_pool_stats
+from app.llm.response_cache import get_response_cache
+from app.utils.plan_cache import plan_cache
+from app.utils.plan_index import plan_index
+from app.utils.stream_decoder import PartialResponseDecoder
+from app.tools.page_cache import get_page_cache
+from app.tools.search_cache import search_cache
+from app.tools.http_pool import get_http_pool_stats, aclose_http_clients
+from app.tools.sandbox import create_session, find_session, clean_session, close_session
 from app.logger import get_logger
 
 # Configuration du path
@@ -18,7 +27,14 @@ playground_dir = SANDBOX_PATH
 os.makedirs(playground_dir, exist_ok=True)
 from app.graph.graph import app as graph_app
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Ferme le pool keep-alive des outils web
+    await aclose_http_clients()
+
+
+app = FastAPI(lifespan=lifespan)
 logger = get_logger("server")
 
 # Autoriser le frontend (CORS)
@@ -31,6 +47,16 @@ app.add_middleware(
 )
 
 
+# Nodes whose LLM tokens are forwarded in streaming mode → output format of their LLM
+STREAMED_NODES = {
+    "generator": "json",
+    "coder_agent": "json",
+    "research_agent": "json",
+    "parallel_step": "json",
+    "planner": "text",
+}
+
+
 async def safe_send(ws: WebSocket, data: dict) -> bool:
     """Returns False if connection is dead."""
     try:
@@ -41,20 +67,36 @@ async def safe_send(ws: WebSocket, data: dict) -> bool:
 
 
 @app.post("/api/cleanup")
-async def cleanup_sandbox():
-    """Delete all files in the sandbox."""
-    sandbox = Path(SANDBOX_PATH)
-    for item in sandbox.iterdir():
-        if item.is_dir():
-            shutil.rmtree(item)
-        else:
-            item.unlink()
-    return {"status": "ok", "message": "Sandbox cleaned"}
+async def cleanup_sandbox(session_id: Optional[str] = None):
+    """Delete all files in a session sandbox (the shared default sandbox if no session_id)."""
+    session = find_session(session_id or "default")
+    if session is None:
+        return {"status": "error", "message": f"Unknown session: {session_id}"}
+    await asyncio.to_thread(clean_session, session)
+    return {"status": "ok", "message": "Sandbox cleaned", "session_id": session.session_id}
+
+@app.get("/api/stats")
+async def get_stats():
+    """Runtime counters (LLM and web client pools, caches)."""
+    response_cache = get_response_cache()
+    page_cache = get_page_cache()
+    return {
+        "llm_pool": get_pool_stats(),
+        "llm_cache": response_cache.get_stats() if response_cache else None,
+        "plan_cache": plan_cache.get_stats(),
+        "plan_index": plan_index.get_stats(),
+        "web_pool": get_http_pool_stats(),
+        "web_cache": page_cache.get_stats() if page_cache else None,
+        "web_search": search_cache.get_stats(),
+    }
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
-    logger.info("🔌 Client connecté")
+    # Un sandbox (dossier + cwd terminal) par connexion
+    session = create_session()
+    logger.info(f"🔌 Client connecté (session {session.session_id})")
+    await safe_send(websocket, {"type": "session", "session_id": session.session_id})
 
     async def heartbeat():
         try:
@@ -67,6 +109,7 @@ async def websocket_endpoint(websocket: WebSocket):
     heartbeat_task = asyncio.create_task(heartbeat())
 
     conversation_history = []
+    events = None  # flux du graphe en cours : fermé si le client part (plus d'appels LLM)
     
     try:
         while True:
@@ -77,11 +120,14 @@ async def websocket_endpoint(websocket: WebSocket):
             if not user_input:
                 continue
 
+            # Opt-in : {"message": "...", "stream": true} → tokens LLM envoyés au fil de l'eau
+            streaming = bool(message_data.get("stream"))
+
             conversation_history.append(HumanMessage(content=user_input))
 
             initial_state = {
                 "messages": list(conversation_history),
-                "root_dir": str(SANDBOX_PATH),
+                "root_dir": str(session.root),
                 "retry_count": 0,
                 "plan_steps": [],
                 "current_step": 0,
@@ -94,7 +140,40 @@ async def websocket_endpoint(websocket: WebSocket):
             last_sent_content = ""
             last_tool_output = ""  # Track last successful tool output for fallback
 
-            async for event in graph_app.astream(initial_state):
+            decoders = {}     # run id du message LLM → PartialResponseDecoder
+            plan_step = 0     # index de l'étape du plan en cours (tag des tokens)
+            # "custom" : lignes des commandes terminal relayées pendant leur exécution
+            stream_mode = ["updates", "custom", "messages"] if streaming else ["updates", "custom"]
+
+            events = graph_app.astream(initial_state, stream_mode=stream_mode)
+            async for mode, event in events:
+                if mode == "custom":
+                    terminal = event.get("terminal") if isinstance(event, dict) else None
+                    if terminal and not await safe_send(websocket, {"type": "terminal", **terminal}):
+                        raise WebSocketDisconnect()
+                    continue
+
+                if mode == "messages":
+                    chunk, metadata = event
+                    node_name = metadata.get("langgraph_node", "")
+                    # Seuls les chunks de génération (pas les messages complets écrits dans l'état)
+                    if node_name not in STREAMED_NODES or not isinstance(chunk, AIMessageChunk):
+                        continue
+                    if not isinstance(chunk.content, str):
+                        continue
+                    decoder = decoders.setdefault(chunk.id, PartialResponseDecoder(STREAMED_NODES[node_name]))
+                    for field, text in decoder.feed(chunk.content):
+                        if not await safe_send(websocket, {
+                            "type": "token",
+                            "node": node_name,
+                            "step": plan_step,
+                            "graph_step": metadata.get("langgraph_step"),
+                            "field": field,
+                            "content": text,
+                        }):
+                            raise WebSocketDisconnect()
+                    continue
+
                 for node_name, node_content in event.items():
                     
                     response_data = {
@@ -109,8 +188,10 @@ async def websocket_endpoint(websocket: WebSocket):
                     elif node_name == "generator":
                         msg = node_content["messages"][-1]
                         if hasattr(msg, 'tool_calls') and msg.tool_calls:
-                            tool = msg.tool_calls[0]
-                            response_data["content"] = f"🤖 ACTION : {tool['name']}\nARGS: {json.dumps(tool['args'], indent=2)}"
+                            response_data["content"] = "\n".join(
+                                f"🤖 ACTION : {tool['name']}\nARGS: {json.dumps(tool['args'], indent=2)}"
+                                for tool in msg.tool_calls
+                            )
                         else:
                             response_data["type"] = "answer"
                             response_data["content"] = msg.content
@@ -128,9 +209,11 @@ async def websocket_endpoint(websocket: WebSocket):
                         response_data["content"] = f"💉 OPTIMIZER : {guidelines}"
                         
                     elif node_name == "tools":
-                        tool_msg = node_content["messages"][-1]
-                        tool_content = tool_msg.content
-                        response_data["content"] = f"🛠️ OUTIL RETOUR : {tool_content[:500]}..."
+                        tool_msgs = node_content["messages"]
+                        tool_content = tool_msgs[-1].content
+                        response_data["content"] = "\n".join(
+                            f"🛠️ OUTIL RETOUR : {m.content[:500]}..." for m in tool_msgs
+                        )
                         # Track successful tool outputs
                         if not any(kw in tool_content.lower() for kw in ["error", "erreur", "failed"]):
                             last_tool_output = tool_content[:300]
@@ -138,24 +221,41 @@ async def websocket_endpoint(websocket: WebSocket):
                     elif node_name == "dispatcher":
                         step = node_content.get("step_type", "?")
                         idx = node_content.get("current_step", 0)
-                        response_data["content"] = f"📍 STEP {idx + 1} → [{step.upper()}]"
+                        plan_step = idx
+                        batch = node_content.get("parallel_batch")
+                        if step == "parallel" and batch:
+                            response_data["content"] = f"⚡ STEPS {', '.join(str(i + 1) for i in batch)} → [PARALLEL]"
+                        else:
+                            response_data["content"] = f"📍 STEP {idx + 1} → [{step.upper()}]"
                     
                     elif node_name == "search_agent":
                         msg = node_content["messages"][-1]
                         if hasattr(msg, 'tool_calls') and msg.tool_calls:
-                            tool = msg.tool_calls[0]
-                            response_data["content"] = f"🔍 SEARCH: {tool['name']}({tool['args']})"
+                            response_data["content"] = "\n".join(
+                                f"🔍 SEARCH: {tool['name']}({tool['args']})" for tool in msg.tool_calls
+                            )
                     
                     elif node_name == "coder_agent":
                         msg = node_content["messages"][-1]
                         if hasattr(msg, 'tool_calls') and msg.tool_calls:
-                            tool = msg.tool_calls[0]
-                            response_data["content"] = f"💻 CODE: {tool['name']}({tool['args']})"
+                            response_data["content"] = "\n".join(
+                                f"💻 CODE: {tool['name']}({tool['args']})" for tool in msg.tool_calls
+                            )
                         else:
                             # Coder returned text instead of tool call — show it
                             if hasattr(msg, 'content') and msg.content:
                                 response_data["content"] = f"💻 CODER: {msg.content[:300]}"
                     
+                    elif node_name == "parallel_step":
+                        for result in node_content.get("parallel_results", []):
+                            msgs = result["messages"]
+                            tools = [tc["name"] for m in msgs for tc in (getattr(m, "tool_calls", None) or [])]
+                            summary = ", ".join(tools) if tools else msgs[-1].content[:200]
+                            response_data["content"] = f"⚡ STEP {result['step'] + 1} : {summary}"
+
+                    elif node_name == "join_steps":
+                        response_data["content"] = f"🔗 Étapes parallèles terminées, reprise à l'étape {node_content.get('current_step', 0) + 1}"
+
                     elif node_name == "advance_step":
                         response_data["content"] = "✅ Step terminé, passage au suivant..."
                     
@@ -163,7 +263,7 @@ async def websocket_endpoint(websocket: WebSocket):
                         response_data["content"] = "🚑 FALLBACK: Erreur détectée, correction en cours..."
 
                     if not await safe_send(websocket, response_data):
-                        break
+                        raise WebSocketDisconnect()
                     
             # ═══ FIX: Plus de "c'est bon" mensonger ═══
             if not sent_answer:
@@ -199,4 +299,7 @@ async def websocket_endpoint(websocket: WebSocket):
         except RuntimeError:
             pass
     finally:
-        heartbeat_task.cancel()
\ No newline at end of file
+        heartbeat_task.cancel()
+        if events is not None:
+            await events.aclose()  # client parti en cours de run : arrête le graphe
+        await asyncio.to_thread(close_session, session.session_id)
\ No newline at end of file
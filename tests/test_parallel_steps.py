@@ -0,0 +1,40 @@
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from app.graph import graph
+
+
+def _call(name, args=None, id="c1"):
+    return AIMessage(content="", tool_calls=[{"name": name, "args": args or {}, "id": id}])
+
+
+def _branch(idx=0):
+    return {"messages": [HumanMessage(content="go")], "root_dir": "", "plan_steps": ["READ:a", "READ:b"],
+            "current_step": idx, "step_type": "read"}
+
+
+def test_branch_write_call_is_requeued_without_running(monkeypatch):
+    ran = []
+    monkeypatch.setitem(graph.PARALLEL_AGENTS, "read", (lambda s: {"messages": [_call("write_file")]}, None))
+    monkeypatch.setattr(graph, "reviewer_node", lambda s: {"code_quality_score": 10})
+    monkeypatch.setattr(graph, "tool_node_with_counter", lambda s: ran.append(s) or {"messages": []})
+    result = graph.parallel_step_node(_branch(1))["parallel_results"][0]
+    assert result == {"step": 1, "messages": [], "requeue": True}
+    assert ran == []
+
+
+def test_join_requeues_step_sequentially():
+    ok = [_call("read_file_content"), ToolMessage(content="x = 1", tool_call_id="c1", name="read_file_content")]
+    state = {"messages": [], "parallel_batch": [0, 1, 2], "current_step": 0, "plan_steps": ["READ:a"] * 3,
+             "parallel_results": [{"step": 0, "messages": ok}, {"step": 1, "messages": [], "requeue": True},
+                                  {"step": 2, "messages": []}]}
+    out = graph.join_parallel_node(state)
+    assert out["current_step"] == 1 and out["sequential_steps"] == [1] and out["messages"] == ok
+    assert graph._parallel_batch({**state, **out}) == []
+
+
+def test_join_routes_branch_tool_error_to_fallback():
+    err = [_call("web_search"), ToolMessage(content="Error: search timed out", tool_call_id="c1", name="web_search")]
+    state = {"messages": [], "parallel_batch": [0, 1], "current_step": 0,
+             "parallel_results": [{"step": 0, "messages": err}, {"step": 1, "messages": []}]}
+    out = graph.join_parallel_node(state)
+    assert out["current_step"] == 0
+    assert graph.route_after_join({"messages": out["messages"]}) == "fallback"
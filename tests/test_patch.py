@@ -0,0 +1,86 @@
+from app.tools.patch import apply_patch_text, format_report, parse_patch
+
+
+def _apply(tmp_path, name, text, patch):
+    (tmp_path / name).write_text(text)
+    files, written = apply_patch_text(patch, lambda p: tmp_path / p)
+    applied = all(not fp.error and all(h.ok for h in fp.hunks) for fp in files)
+    return files, written, format_report(files, applied)
+
+
+def test_removed_sql_comment_is_not_a_file_header(tmp_path):
+    patch = (
+        "--- a/schema.sql\n"
+        "+++ b/schema.sql\n"
+        "@@ -1,3 +1,2 @@\n"
+        " CREATE TABLE users (\n"
+        "--- legacy column\n"
+        "   id INTEGER PRIMARY KEY\n"
+    )
+    files, written, report = _apply(tmp_path, "schema.sql",
+                                    "CREATE TABLE users (\n-- legacy column\n  id INTEGER PRIMARY KEY\n", patch)
+    assert files[0].hunks[0].old[1] == "-- legacy column"
+    assert report.startswith("Success")
+    assert (tmp_path / "schema.sql").read_text() == "CREATE TABLE users (\n  id INTEGER PRIMARY KEY\n"
+
+
+def test_removed_and_added_lines_looking_like_headers(tmp_path):
+    patch = (
+        "--- a/notes.sql\n"
+        "+++ b/notes.sql\n"
+        "@@ -1,2 +1,2 @@\n"
+        " SELECT 1;\n"
+        "--- old note\n"
+        "+++ new note\n"
+    )
+    files, _, report = _apply(tmp_path, "notes.sql", "SELECT 1;\n-- old note\n", patch)
+    assert report.startswith("Success")
+    assert (tmp_path / "notes.sql").read_text() == "SELECT 1;\n++ new note\n"
+
+
+def test_hunks_of_two_files(tmp_path):
+    patch = (
+        "--- a/a.py\n+++ b/a.py\n@@ -1 +1 @@\n-x = 1\n+x = 2\n"
+        "\n"
+        "--- a/b.py\n+++ b/b.py\n@@ -1 +1 @@\n-y = 1\n+y = 2\n"
+    )
+    files = parse_patch(patch)
+    assert [fp.path for fp in files] == ["a.py", "b.py"]
+    assert [(h.old, h.new) for fp in files for h in fp.hunks] == [(["x = 1"], ["x = 2"]), (["y = 1"], ["y = 2"])]
+
+
+def test_patch_without_effect_is_an_error(tmp_path):
+    patch = "--- a/a.py\n+++ b/a.py\n@@ -1 +1 @@\n-x = 1\n+x = 1\n"
+    _, written, report = _apply(tmp_path, "a.py", "x = 1\n", patch)
+    assert written == []
+    assert report.startswith("Error") and "changed nothing" in report
+
+
+def test_drifted_context_keeps_the_file_lines(tmp_path):
+    text = "def run(a, b, c):\n    setup()\n    compute(a, b, c)\n    value = 1\n    report(value)\n    return value\n"
+    patch = (
+        "--- a/run.py\n+++ b/run.py\n@@ -1,6 +1,6 @@\n"
+        " def run(a, b, c):\n     setup()\n     compute(a, b)\n-    value = 1\n+    value = 2\n"
+        "     report(value)\n     return value\n"
+    )
+    files, _, report = _apply(tmp_path, "run.py", text, patch)
+    assert report.startswith("Success") and "fuzzy" in report
+    assert (tmp_path / "run.py").read_text() == text.replace("value = 1", "value = 2")
+
+
+def test_drifted_line_to_remove_fails_the_hunk(tmp_path):
+    text = "def run(a, b, c):\n    setup()\n    compute(a, b, c)\n    report()\n    return 1\n"
+    patch = (
+        "--- a/run.py\n+++ b/run.py\n@@ -1,5 +1,5 @@\n"
+        " def run(a, b, c):\n     setup()\n-    compute(a, b)\n+    compute(a)\n     report()\n     return 1\n"
+    )
+    _, written, report = _apply(tmp_path, "run.py", text, patch)
+    assert written == [] and report.startswith("Error") and "drifted" in report
+    assert (tmp_path / "run.py").read_text() == text
+
+
+def test_creating_an_existing_file_is_an_error(tmp_path):
+    patch = "--- /dev/null\n+++ b/a.py\n@@ -0,0 +1 @@\n+x = 2\n"
+    _, written, report = _apply(tmp_path, "a.py", "x = 1\n", patch)
+    assert written == [] and "file already exists" in report
+    assert (tmp_path / "a.py").read_text() == "x = 1\n"
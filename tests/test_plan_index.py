@@ -0,0 +1,49 @@
+from app.utils.plan_index import SemanticPlanIndex
+
+PLAN = {"plan": ["[CODE] step"]}
+
+
+def _index(*keys):
+    index = SemanticPlanIndex(dim=1024, maxsize=16, threshold=0.9)
+    for key in keys:
+        index.add(key, PLAN)
+    return index
+
+
+def test_paraphrase_reuses_plan():
+    index = _index("Create a Flask application with login")
+    plan, score, _ = index.lookup("please build a flask app with authentication")
+    assert plan is PLAN and score >= 0.9
+
+
+def test_different_technology_is_a_miss():
+    prefix = "create a command line tool that loads the settings file, validates every field, "
+    index = _index(prefix + "parse json in python and then write parser.py")
+    plan, score, _ = index.lookup(prefix + "parse yaml in python and then write parser.py")
+    assert score >= 0.9  # assez proches pour passer le seuil seul
+    assert plan is None
+
+
+def test_negation_is_a_miss():
+    index = _index("create app.py and test_app.py with unit tests")
+    plan, score, _ = index.lookup("create app.py and test_app.py without unit tests")
+    assert score >= 0.9
+    assert plan is None
+
+
+def test_different_filename_is_a_miss():
+    index = _index("create calc.py with add and sub functions")
+    plan, _, _ = index.lookup("create math.py with add and sub functions")
+    assert plan is None
+
+
+def test_extra_wording_still_reuses_plan():
+    index = _index("create a flask app with login and a dashboard page in app.py")
+    plan, score, _ = index.lookup("create a simple flask app with login and a dashboard page in app.py")
+    assert plan is PLAN and score >= 0.9
+
+
+def test_unrelated_request_is_a_miss():
+    index = _index("create a flask app with login and a dashboard page in app.py")
+    plan, score, _ = index.lookup("write a snake game with pygame")
+    assert plan is None and score < 0.9
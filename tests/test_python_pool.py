@@ -0,0 +1,31 @@
+import pytest
+from app.tools.python_pool import python_job, shell_expands
+
+
+@pytest.mark.parametrize("command", [
+    "pytest tests/*.py",
+    "python -m pytest tests/test_{a,b}.py",
+    "python script.py ~/data.csv",
+    "python script.py $INPUT",
+    "python -c \"print('$HOME')\"",
+])
+def test_commands_bash_would_expand_stay_in_the_shell(command):
+    assert shell_expands(command)
+
+
+@pytest.mark.parametrize("command", [
+    "pytest -q",
+    "python -c \"print([1, {2: 3}])\"",
+    "python -c 'print(\"$HOME\")'",
+    "python script.py \"a*b\" \\*",
+    "python -m pytest -k \"a or b\"",
+])
+def test_quoted_arguments_can_use_the_pool(command):
+    assert not shell_expands(command)
+
+
+def test_python_job_modes():
+    assert python_job(["python", "-m", "pip", "install", "x"]) is None
+    assert python_job(["python"]) is None
+    _, job = python_job(["python", "-u", "script.py", "a"])
+    assert job == {"mode": "script", "target": "script.py", "args": ["a"]}
@@ -0,0 +1,69 @@
+import threading
+from concurrent.futures import Future
+import pytest
+from app.tools.search_cache import SearchCache
+
+
+class InlineExecutor:
+    """Exécute l'appel dans submit : le Future est déjà terminé quand le cache le reçoit."""
+
+    def submit(self, fn, *args):
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+def _cache(search_fn, **kwargs):
+    cache = SearchCache(search_fn=search_fn, timeout=2, **kwargs)
+    cache._executor = InlineExecutor()
+    return cache
+
+
+def _in_thread(fn):
+    """Appelle fn dans un thread : un interblocage fait échouer le test au lieu de le figer."""
+    box = {}
+
+    def run():
+        try:
+            box["result"] = fn()
+        except Exception as e:
+            box["error"] = e
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(timeout=5)
+    assert not thread.is_alive(), "search() bloqué"
+    if "error" in box:
+        raise box["error"]
+    return box["result"]
+
+
+def test_synchronous_search_is_cached():
+    calls = []
+    cache = _cache(lambda q, n: calls.append(q) or [q])
+    assert _in_thread(lambda: cache.search("Python asyncio", 5)) == ["python asyncio"]
+    assert _in_thread(lambda: cache.search("python  asyncio?", 5)) == ["python asyncio"]
+    assert calls == ["python asyncio"]
+    assert cache.get_stats()["inflight"] == 0
+
+
+def test_failing_search_raises_and_is_not_cached():
+    def fail(q, n):
+        raise RuntimeError("upstream down")
+
+    cache = _cache(fail)
+    with pytest.raises(RuntimeError):
+        _in_thread(lambda: cache.search("python", 5))
+    stats = cache.get_stats()
+    assert stats["errors"] == 1 and stats["size"] == 0 and stats["inflight"] == 0
+
+
+def test_stale_refresh_with_synchronous_search():
+    calls = []
+    cache = _cache(lambda q, n: ["new" if calls.append(q) or len(calls) > 1 else "old"], ttl=0, stale_ttl=60)
+    assert _in_thread(lambda: cache.search("python", 5)) == ["old"]
+    assert _in_thread(lambda: cache.search("python", 5)) == ["old"]  # périmé : servi, puis rafraîchi
+    assert _in_thread(lambda: cache.search("python", 5)) == ["new"]
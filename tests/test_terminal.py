@@ -0,0 +1,29 @@
+import pytest
+from app.tools.sandbox import create_session, close_session, use_sandbox
+from app.tools.terminal import _validate_command
+
+
+@pytest.fixture
+def sandbox():
+    session = create_session()
+    (session.root / ".venv" / "bin").mkdir(parents=True)
+    (session.root / ".venv" / "bin" / "activate").write_text("")
+    (session.root / ".venv" / "pyvenv.cfg").write_text("home = /usr/bin\n")
+    (session.root / "x.sh").write_text("echo hi > f\n")
+    with use_sandbox(str(session.root)):
+        yield session
+    close_session(session.session_id)
+
+
+@pytest.mark.parametrize("command", ["source .venv/bin/activate", ". .venv/bin/activate", "alias ls='ls -l'", "alias"])
+def test_allowed(sandbox, command):
+    assert _validate_command(command)
+
+
+@pytest.mark.parametrize("command", [
+    "source x.sh", "source /etc/profile", "source .venv/bin/activate extra",
+    "alias ll=evil", "alias ll='source x.sh'",
+])
+def test_rejected(sandbox, command):
+    with pytest.raises(ValueError):
+        _validate_command(command)